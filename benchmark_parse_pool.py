@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Benchmark auction page parsing in the parse pool with 1 to N worker processes
+
+Usage: python benchmark_parse_pool.py [PAGES] [MAX_PROCESSES] [HTML_FILE]
+Defaults to 200 pages and one process per core. Pages are synthetic unless
+HTML_FILE is a saved auction page (e.g. curl https://sikoauktioner.se/auktion/<nr> > page.html).
+No network or MongoDB needed.
+"""
+
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from src.parse_pool import ParsePool
+from src.scraper import SikoScraper, parse_auction_page
+
+
+def random_text(rng, words):
+    return ' '.join(''.join(rng.choice(string.ascii_lowercase + 'åäö') for _ in range(rng.randint(3, 10)))
+                    for _ in range(words))
+
+
+def synthetic_page(rng, number):
+    """Roughly the shape of a sikoauktioner.se auction page: navigation, the auction, related cards"""
+    menu = ''.join(f'<li class="menu-item"><a href="/kategori/{i}">{random_text(rng, 2)}</a></li>' for i in range(150))
+    related = ''.join(
+        f'<div class="card"><a href="/auktion/{rng.randint(100000, 999999)}"><img src="/img/{i}.jpg">'
+        f'<span class="card-title">{random_text(rng, 5)}</span></a><p>{random_text(rng, 20)}</p></div>'
+        for i in range(60)
+    )
+    images = ''.join(
+        f'<img src="https://siko-im460.fra1.cdn.digitaloceanspaces.com/{number}_{i}.jpg">' for i in range(6)
+    )
+    return f"""<html><head><title>Siko Auktioner</title><style>{random_text(rng, 300)}</style>
+<script>{random_text(rng, 300)}</script></head><body>
+<nav><ul>{menu}</ul></nav>
+<main><h1>{random_text(rng, 4).capitalize()}</h1>
+<div class="auction">nr. {number}
+{random_text(rng, 60)}
+
+Anmärkningar: {random_text(rng, 10)}
+Om inget annat anges</div>
+<div class="gallery">{images}</div>
+<div class="bids">Aktuellt bud: {rng.randint(1, 90) * 100} kr Utropspris: 100 kr
+Avslutas om {rng.randint(1, 40)} tim {rng.randint(0, 59)} min</div>
+<div class="pickup">Hämtas i Kristianstad</div></main>
+<section class="related">{related}</section>
+<footer>{random_text(rng, 200)}</footer></body></html>"""
+
+
+def run(pool, pages):
+    """Parse every page through the pool; returns (seconds, auctions)"""
+    start = time.perf_counter()
+    futures = [pool.submit(parse_auction_page, page_html, url) for url, page_html in pages]
+    auctions = [future.result()[0] for future in futures]
+    return time.perf_counter() - start, auctions
+
+
+def main():
+    page_count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    max_processes = int(sys.argv[2]) if len(sys.argv) > 2 else (os.cpu_count() or 1)
+    rng = random.Random(42)
+
+    if len(sys.argv) > 3:
+        with open(sys.argv[3], encoding='utf-8') as f:
+            page_html = f.read()
+        pages = [(f"https://sikoauktioner.se/auktion/{100000 + i}", page_html) for i in range(page_count)]
+    else:
+        pages = [(f"https://sikoauktioner.se/auktion/{100000 + i}", synthetic_page(rng, 100000 + i))
+                 for i in range(page_count)]
+    average_kb = sum(len(page_html) for _, page_html in pages) / len(pages) / 1024
+
+    print(f"Benchmark: {page_count} auction pages (~{average_kb:.0f} KB each), up to {max_processes} processes")
+
+    # Reference results and the single-thread baseline (PARSE_PROCESSES=0)
+    scraper = SikoScraper()
+    start = time.perf_counter()
+    expected = [scraper.parse_auction_details(page_html, url)[0] for url, page_html in pages]
+    inline_time = time.perf_counter() - start
+    print(f"  {'Inline:':14s}{inline_time:7.2f} s  {page_count / inline_time:7.1f} pages/s")
+
+    for processes in range(1, max_processes + 1):
+        pool = ParsePool(processes=processes)
+        # Spawning workers and importing the scraper in them is a one-time cost per pool
+        start = time.perf_counter()
+        futures = [pool.submit(parse_auction_page, page_html, url) for url, page_html in pages[:processes]]
+        for future in futures:
+            future.result()
+        startup = time.perf_counter() - start
+
+        seconds, auctions = run(pool, pages)
+        pool.shutdown()
+        mismatches = sum(
+            1 for got, want in zip(auctions, expected)
+            if {k: v for k, v in got.items() if k not in ('scraped_at', 'ends_at')}
+            != {k: v for k, v in want.items() if k not in ('scraped_at', 'ends_at')}
+        )
+        label = f"{processes} process{'es' if processes > 1 else ''}:"
+        print(f"  {label:14s}{seconds:7.2f} s  {page_count / seconds:7.1f} pages/s"
+              f"  {inline_time / seconds:4.1f}x inline  (startup {startup:.1f} s, {mismatches} mismatches)")
+
+
+if __name__ == "__main__":
+    main()
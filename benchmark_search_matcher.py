@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Benchmark the compiled search word matcher against the per-word loop
+
+Usage: python benchmark_search_matcher.py [WORDS] [AUCTIONS]
+Defaults to 1000 search words x 10000 auctions (synthetic data, no MongoDB needed).
+"""
+
+import random
+import string
+import sys
+import os
+import time
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from src.search_matcher import SearchMatcher
+
+
+def baseline_matches_search_word(auction, search_word):
+    """SearchManager.matches_search_word before the compiled matcher (exclusion keywords came later)"""
+    search_word = search_word.strip()
+    if not search_word:
+        return False
+
+    searchable_fields = [
+        auction.get('title', ''),
+        auction.get('description', ''),
+        auction.get('location', ''),
+    ]
+    for item in auction.get('items', []):
+        searchable_fields.extend([
+            item.get('title', ''),
+            item.get('description', ''),
+        ])
+
+    if search_word.startswith('"') and search_word.endswith('"'):
+        exact_phrase = search_word[1:-1].lower().strip()
+        if not exact_phrase:
+            return False
+        return any(field_value and exact_phrase in field_value.lower() for field_value in searchable_fields)
+
+    search_words = search_word.lower().split()
+    for field_value in searchable_fields:
+        if not field_value:
+            continue
+        field_lower = field_value.lower()
+        if any(word in field_lower for word in search_words):
+            return True
+    return False
+
+
+def naive_match(auction, search_words):
+    """The old per-word loop: every search word checked with the baseline matcher"""
+    return [search_word for search_word in search_words if baseline_matches_search_word(auction, search_word)]
+
+
+def random_word(rng):
+    return ''.join(rng.choice(string.ascii_lowercase + 'åäö') for _ in range(rng.randint(4, 10)))
+
+
+def main():
+    word_count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    auction_count = int(sys.argv[2]) if len(sys.argv) > 2 else 10000
+    rng = random.Random(42)
+
+    vocabulary = [random_word(rng) for _ in range(5000)]
+    search_words = set()
+    while len(search_words) < word_count:
+        kind = rng.random()
+        if kind < 0.6:
+            search_words.add(rng.choice(vocabulary))
+        elif kind < 0.8:
+            search_words.add(f"{rng.choice(vocabulary)} {rng.choice(vocabulary)}")
+        else:
+            search_words.add(f'"{rng.choice(vocabulary)} {rng.choice(vocabulary)}"')
+    search_words = sorted(search_words)
+
+    auctions = [{
+        'title': ' '.join(rng.choice(vocabulary) for _ in range(6)).capitalize(),
+        'description': ' '.join(rng.choice(vocabulary) for _ in range(40)),
+        'location': rng.choice(['Kristianstad', 'Malmö', 'Stockholm']),
+        'items': [{'title': rng.choice(vocabulary), 'description': ' '.join(rng.choice(vocabulary) for _ in range(5))}]
+        if rng.random() < 0.2 else [],
+    } for _ in range(auction_count)]
+
+    print(f"Benchmark: {word_count} search words x {auction_count} auctions")
+
+    start = time.perf_counter()
+    matcher = SearchMatcher(search_words)
+    compile_time = time.perf_counter() - start
+    print(f"  Compile matcher:   {compile_time * 1000:8.1f} ms")
+
+    start = time.perf_counter()
+    compiled_results = [matcher.match(auction) for auction in auctions]
+    compiled_time = time.perf_counter() - start
+    print(f"  Compiled matcher:  {compiled_time:8.2f} s ({auction_count / compiled_time:,.0f} auctions/s)")
+
+    start = time.perf_counter()
+    naive_results = [naive_match(auction, search_words) for auction in auctions]
+    naive_time = time.perf_counter() - start
+    print(f"  Per-word loop:     {naive_time:8.2f} s ({auction_count / naive_time:,.0f} auctions/s)")
+
+    mismatches = sum(1 for a, b in zip(compiled_results, naive_results) if a != b)
+    matches = sum(1 for result in compiled_results if result)
+    print(f"  Speedup: {naive_time / compiled_time:.1f}x, {matches} matching auctions, {mismatches} mismatches")
+
+
+if __name__ == "__main__":
+    main()
@@ -47,7 +47,9 @@ def main():
         print("  unhide-auction ID - Unhide/unblacklist an auction by ID")
         print("  list-hidden      - List all hidden/blacklisted auctions")
         print("  cleanup-closed   - Remove closed auctions from database")
+        print("  profile-sync [N] [--sample] - Run N syncs (default 1) under the profiler")
         print("  start-web        - Start the web interface")
+        print("  sync-worker      - Run the background sync without the web server (web: WEB_RUNS_UPDATER=false)")
         print()
         print("Examples:")
         print("  python manage.py add-search vintage")
@@ -247,6 +249,42 @@ else:
         if result.returncode != 0:
             print("❌ Failed to cleanup closed auctions:", result.stderr.strip())
     
+    elif command == "profile-sync":
+        runs = int(sys.argv[2]) if len(sys.argv) > 2 and sys.argv[2].isdigit() else 1
+        mode = 'sample' if '--sample' in sys.argv else 'cprofile'
+        print(f"⏱️  Profiling {runs} sync(s) ({mode})...")
+        
+        # Create a simple script
+        # Guarded: parse pool processes (PARSE_PROCESSES) import the script again
+        script_content = f'''from src.auction_updater import AuctionUpdater
+from src.profiler import PROFILER
+if __name__ == "__main__":
+    updater = AuctionUpdater()
+    PROFILER.arm_sync({runs}, "{mode}")
+    for _ in range({runs}):
+        updater.sync_auctions(trigger="manual")
+    updater.notification_queue.stop()
+    for profile in PROFILER.list_profiles()[:{runs}]:
+        summary = PROFILER.get_summary(profile["name"])
+        print(f"{{profile['duration_seconds']:.1f}}s -> {{PROFILER.output_dir}}/{{profile['file']}}")
+        for row in summary["top_cumulative"][:15]:
+            cost = f"{{row['cumulative_seconds']:8.3f}}s" if "cumulative_seconds" in row else f"{{row['percent']:7.1f}}%"
+            print(f"  {{cost}}  {{row['function']}}")
+'''
+        with open('temp_profile_script.py', 'w', encoding='utf-8') as f:
+            f.write(script_content)
+        
+        result = run_command('temp_profile_script.py')
+        print(result.stdout.strip())
+        if result.returncode != 0:
+            print("❌ Profiling failed:", result.stderr.strip())
+        
+        # Clean up temp file
+        try:
+            os.remove('temp_profile_script.py')
+        except:
+            pass
+    
     elif command == "check-once":
         print("❌ Command 'check-once' is not available in this branch (mongodb-integration).")
         print("   This branch only supports the web interface.")
@@ -261,6 +299,15 @@ else:
         if result.returncode != 0:
             print("❌ Web interface failed:", result.stderr.strip())
     
+    elif command == "sync-worker":
+        print("Starting sync worker (scraping and notifications, no web server)")
+        print("Run the web interface with WEB_RUNS_UPDATER=false so it leaves syncing to this worker")
+        print("Press Ctrl+C to stop")
+        result = run_command('-m src.sync_worker')
+        print(result.stdout.strip())
+        if result.returncode != 0:
+            print("❌ Sync worker failed:", result.stderr.strip())
+    
     elif command == "start-monitor":
         print("❌ Command 'start-monitor' is not available in this branch (mongodb-integration).")
         print("   This branch only supports the web interface.")
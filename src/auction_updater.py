@@ -5,21 +5,44 @@ Background auction updater - Syncs auctions from sikoauktioner.se to MongoDB
 import logging
 import time
 import threading
-from typing import List, Dict
+import uuid
+from typing import List, Dict, Optional
 from .scraper import SikoScraper
 from .search_manager import SearchManager
 from .mongodb_cache import MongoDBCache
 from .blacklist_manager import BlacklistManager
 from .watchlist_manager import WatchlistManager
 from .home_assistant import HomeAssistantNotifier
+from .notification_queue import NotificationQueue
+from .ha_sensors import HomeAssistantSensorPublisher
+from .endgame_tracker import EndgameTracker
+from .notification_scheduler import NotificationScheduler
 from .mongodb_client import MongoDBClient
+from .mongodb_monitor import IndexUsageReporter
+from .metrics import PhaseTimer, SYNC_PHASE_DURATION
+from .sync_runs import SyncRun, SyncRunStore
+from .profiler import PROFILER
+from .memory_diagnostics import MEMORY
+from .leader_lease import LeaderLease
+from .updater_control import UpdaterCommandQueue, UpdaterStatusStore
+from .sync_tasks import SyncTaskQueue, SyncTaskWorker, GlobalRateLimiter
+from .parse_pool import PARSE_POOL
 from .config import get_config
 
 logger = logging.getLogger(__name__)
 
+# Request totals kept per search word in sync run reports
+REQUEST_FIELDS = ('requests', 'request_seconds', 'request_errors', 'request_retries', 'response_bytes')
+
 class AuctionUpdater:
     """Background service to sync auctions from sikoauktioner.se to MongoDB"""
     
+    COMMAND_POLL_SECONDS = 2
+    # Commands that take the sync lock run on threads of their own
+    SYNC_LOCK_COMMANDS = ('sync_search_word', 'detach_search_word')
+    STATUS_PUBLISH_SECONDS = 15
+    TASK_POLL_SECONDS = 2
+    
     def __init__(self):
         self.config = get_config()
         self.scraper = SikoScraper()
@@ -31,16 +54,45 @@ class AuctionUpdater:
             self.config.home_assistant_url,
             self.config.home_assistant_token
         )
+        # Notifications are queued and delivered by background workers, so a slow
+        # Home Assistant never stalls a sync
+        self.notification_queue = NotificationQueue(self.notifier)
+        self.sensor_publisher = HomeAssistantSensorPublisher(self.notifier)
+        self.sync_runs = SyncRunStore()  # Structured report of every sync
+        # Only the lease holder runs the update loop, schedulers and notification delivery
+        self.lease = LeaderLease('auction_updater', on_acquired=self._start_services, on_lost=self._stop_services)
+        # Web processes that don't run the updater send commands and read the published status
+        self.commands = UpdaterCommandQueue()
+        self.status_store = UpdaterStatusStore()
+        # With SYNC_TASK_WORKERS the leader's syncs become tasks run by every updater process,
+        # all sharing one request rate to sikoauktioner.se
+        self.sync_tasks = SyncTaskQueue()
+        self.task_worker = None
+        if self.config.sync_task_workers > 0:
+            self.scraper.use_rate_limiter(GlobalRateLimiter('sikoauktioner', self.config.scrape_rate_limit))
+            self.task_worker = SyncTaskWorker(self.sync_tasks, self.scraper, self._candidate_filter,
+                                              self.lease.owner, self.config.sync_task_workers,
+                                              after_term=self.blacklist_manager.flush_rule_hits)
         self.running = False
         self.thread = None
+        self.command_thread = None
+        self.status_thread = None
+        # Set when the current leadership period ends - its threads stop at the next check
+        self._stopped = threading.Event()
+        self._stopped.set()
         self.update_interval = self.config.check_interval_minutes * 60  # Convert minutes to seconds
         self.last_update = 0
+        self._sync_lock = threading.Lock()  # Full and single-term syncs never overlap
+        self._sync_requested = threading.Event()  # Set by the 'sync' command, the update loop runs the sync
+        self._urgent_lock = threading.Lock()  # Urgent alerts are claimed from several threads
         
         # Initialize MongoDB collections for tracking notifications
         mongo_client = MongoDBClient()
         self.processed_collection = mongo_client.get_collection('processed_auctions', self.config.mongodb_database)
         self.urgent_collection = mongo_client.get_collection('urgent_notifications', self.config.mongodb_database)
         self.pending_collection = mongo_client.get_collection('pending_notifications', self.config.mongodb_database)
+        # $indexStats report, refreshed after a sync once MONGODB_INDEX_REPORT_HOURS have passed
+        self.index_reporter = IndexUsageReporter(mongo_client.get_database(self.config.mongodb_database))
         
         # Load processed auctions and urgent notifications from MongoDB
         self.processed_auctions = set()
@@ -48,25 +100,91 @@ class AuctionUpdater:
         self._load_processed_auctions()
         self._load_urgent_notifications()
         
+        # Fires urgent notifications exactly when an auction crosses the threshold
+        self.urgent_scheduler = NotificationScheduler(self._fire_urgent_notification, name="UrgentNotificationScheduler")
+        # Releases notifications held during quiet hours the moment the allowed window opens
+        self.release_scheduler = NotificationScheduler(
+            lambda key, payload: self._send_pending_notifications(), name="PendingNotificationRelease"
+        )
+        
+        # Fast refresh of watched auctions near their end
+        self.endgame_tracker = EndgameTracker(self.scraper, self.watchlist_manager, self.notification_queue, self._claim_urgent_notification)
+        
+        # Structures reported by the memory diagnostics endpoint
+        MEMORY.register('updater.processed_auctions', lambda: self.processed_auctions)
+        MEMORY.register('updater.urgent_notifications_sent', lambda: self.urgent_notifications_sent, self._urgent_lock)
+        MEMORY.register('updater.urgent_schedule', lambda: self.urgent_scheduler._events, self.urgent_scheduler._condition)
+        MEMORY.register('updater.endgame_tracked', lambda: self.endgame_tracker._tracked, self.endgame_tracker._lock)
+        MEMORY.register('updater.watched_ids', lambda: self.watchlist_manager._watched_ids, self.watchlist_manager._lock)
+        MEMORY.register('updater.blacklisted_ids', lambda: self.blacklist_manager._blacklisted_ids)
+        MEMORY.register('scraper.last_search_stats', lambda: self.scraper.last_search_stats)
+        
         logger.info(f"AuctionUpdater initialized (check interval: {self.config.check_interval_minutes} minutes)")
         logger.info(f"Loaded {len(self.processed_auctions)} processed auctions, {len(self.urgent_notifications_sent)} urgent notifications")
     
     def start(self):
-        """Start the background updater thread"""
+        """Start competing for leadership - the background services run while this process holds the lease"""
+        self.lease.start()
+        if self.task_worker:
+            # Sync tasks run in every process, leader or not
+            self.task_worker.start()
+    
+    def stop(self):
+        """Stop the background services and release leadership"""
+        if self.task_worker:
+            self.task_worker.stop()
+        self.lease.stop()
+        PARSE_POOL.shutdown()
+    
+    @property
+    def is_leader(self) -> bool:
+        return self.lease.is_leader
+    
+    def _start_services(self):
+        """Start the update loop and background services (on becoming the leader)"""
         if self.running:
             logger.warning("AuctionUpdater already running")
             return
         
+        # Another process may have synced and notified while we were a follower
+        self._load_processed_auctions()
+        self._load_urgent_notifications()
         self.running = True
-        self.thread = threading.Thread(target=self._update_loop, daemon=True)
+        # Threads of an earlier period still finishing a sync keep their own (set) event
+        stopped = self._stopped = threading.Event()
+        self._sync_requested.clear()
+        self.notification_queue.start()
+        self.thread = threading.Thread(target=self._update_loop, args=(stopped,), daemon=True)
         self.thread.start()
+        self.command_thread = threading.Thread(target=self._command_loop, args=(stopped,), daemon=True, name="UpdaterCommands")
+        self.command_thread.start()
+        self.status_thread = threading.Thread(target=self._status_loop, args=(stopped,), daemon=True, name="UpdaterStatus")
+        self.status_thread.start()
+        self._restore_urgent_schedule()
+        self.urgent_scheduler.start()
+        self._schedule_pending_release()
+        self.release_scheduler.start()
+        if self.config.endgame_tracking_enabled:
+            self.endgame_tracker.start()
         logger.info("AuctionUpdater started")
     
-    def stop(self):
-        """Stop the background updater thread"""
+    def _stop_services(self):
+        """Stop the update loop and background services (on losing leadership)"""
+        if not self.running:
+            return
         self.running = False
+        self._stopped.set()
+        self._sync_requested.set()  # Wake the update loop
+        self.endgame_tracker.stop()
+        self.urgent_scheduler.stop()
+        self.release_scheduler.stop()
         if self.thread:
             self.thread.join(timeout=5)
+        if self.command_thread:
+            self.command_thread.join(timeout=5)
+        if self.status_thread:
+            self.status_thread.join(timeout=5)
+        self.notification_queue.stop()
         logger.info("AuctionUpdater stopped")
     
     def _load_processed_auctions(self):
@@ -112,6 +230,68 @@ class AuctionUpdater:
         except Exception as e:
             logger.error(f"Error saving urgent notification: {e}")
     
+    def _claim_urgent_notification(self, auction_id: str, auction_data: dict = None) -> bool:
+        """Record that an urgent notification is being sent for an auction
+        
+        Returns:
+            False if one was already sent (by the sync or the end-game tracker)
+        """
+        with self._urgent_lock:
+            if auction_id in self.urgent_notifications_sent:
+                return False
+            self.urgent_notifications_sent.add(auction_id)
+        self._save_urgent_notification(auction_id, auction_data)
+        return True
+    
+    def _schedule_urgent_notifications(self, auctions: List[Dict]):
+        """Schedule an urgent notification at each auction's threshold crossing"""
+        now = time.time()
+        threshold = self.config.urgent_notification_threshold_minutes * 60
+        scheduled = 0
+        for auction in auctions:
+            auction_id = auction.get('id')
+            ends_at = auction.get('ends_at')
+            if not auction_id or not ends_at or ends_at <= now or auction_id in self.urgent_notifications_sent:
+                continue
+            payload = {key: value for key, value in auction.items() if key not in ('_id', 'images')}
+            self.urgent_scheduler.schedule(auction_id, ends_at - threshold, payload)
+            scheduled += 1
+        if scheduled:
+            logger.debug(f"Scheduled {scheduled} urgent notifications")
+    
+    def _restore_urgent_schedule(self):
+        """Rebuild the urgent notification schedule from stored auctions (on startup)"""
+        try:
+            auctions = list(self.cache.collection.find(
+                {'ends_at': {'$gt': time.time()}},
+                {'_id': 0, 'images': 0, 'search_key': 0}
+            ))
+            self._schedule_urgent_notifications(auctions)
+            logger.info(f"Restored urgent notification schedule ({len(self.urgent_scheduler)} pending)")
+        except Exception as e:
+            logger.error(f"Error restoring urgent notification schedule: {e}")
+    
+    def _fire_urgent_notification(self, auction_id: str, auction: Dict):
+        """Send the urgent notification for an auction that just crossed the threshold"""
+        if self.blacklist_manager.is_blacklisted(auction_id):
+            return
+        # Skip auctions removed from storage since they were scheduled (search word removed, closed)
+        if self.cache.collection.find_one({'id': auction_id}, {'_id': 1}) is None:
+            return
+        
+        auction = dict(auction)
+        if auction.get('ends_at'):
+            seconds_left = max(0, int(auction['ends_at'] - time.time()))
+            auction['minutes_remaining'] = seconds_left // 60
+            auction['time_left'] = f"{seconds_left // 60}m, {seconds_left % 60}s"
+        
+        if not self._claim_urgent_notification(auction_id, auction):
+            return
+        
+        label = "⭐ Watchlist" if self.watchlist_manager.is_watched(auction_id) else "⚡ Urgent"
+        if self.notification_queue.enqueue('urgent', auction):
+            logger.info(f"{label} notification queued: {auction.get('title', 'Unknown')} ({auction.get('minutes_remaining')} min left)")
+    
     def _save_pending_notification(self, auction_data: dict):
         """Save a pending notification to MongoDB"""
         try:
@@ -128,6 +308,18 @@ class AuctionUpdater:
         except Exception as e:
             logger.error(f"Error saving pending notification: {e}")
     
+    def _schedule_pending_release(self):
+        """Schedule the drain of pending notifications for when the allowed window opens"""
+        try:
+            if self.pending_collection.count_documents({}, limit=1) == 0:
+                self.release_scheduler.cancel('release')
+                return
+            release_at = self.notifier.next_allowed_time()
+            self.release_scheduler.schedule('release', release_at.timestamp())
+            logger.info(f"Pending notifications will be released at {release_at.strftime('%Y-%m-%d %H:%M')}")
+        except Exception as e:
+            logger.error(f"Error scheduling pending notification release: {e}")
+    
     def _get_pending_notifications(self) -> List[Dict]:
         """Get all pending notifications from MongoDB"""
         try:
@@ -144,40 +336,125 @@ class AuctionUpdater:
         except Exception as e:
             logger.error(f"Error removing pending notification: {e}")
     
-    def _update_loop(self):
-        """Main update loop - runs in background thread"""
+    def _update_loop(self, stopped: threading.Event):
+        """Main update loop - runs in background thread until stopped is set"""
         # Do initial sync on startup
         logger.info("Running initial auction sync...")
-        self.sync_auctions()
+        self.sync_auctions(trigger='startup')
         
-        while self.running:
+        while not stopped.is_set():
             try:
-                # Wait until next update time
-                time_since_update = time.time() - self.last_update
-                if time_since_update < self.update_interval:
-                    # Sleep in small increments to allow quick shutdown
-                    remaining = self.update_interval - time_since_update
+                # Wait until next update time, or until a sync is requested
+                trigger = 'scheduled'
+                remaining = self.update_interval - (time.time() - self.last_update)
+                if remaining > 0:
                     logger.debug(f"Next update in {remaining/60:.1f} minutes")
-                    
-                    # Sleep in 10 second increments
-                    while remaining > 0 and self.running:
-                        sleep_time = min(10, remaining)
-                        time.sleep(sleep_time)
-                        remaining -= sleep_time
+                while remaining > 0 and not stopped.is_set():
+                    # Wait in 10 second increments to pick up interval changes
+                    if self._sync_requested.wait(min(10, remaining)):
+                        trigger = 'manual'
+                        break
+                    remaining = self.update_interval - (time.time() - self.last_update)
                 
-                if not self.running:
+                if stopped.is_set():
                     break
                 
-                # Time for update
-                logger.info("Running scheduled auction sync...")
-                self.sync_auctions()
+                # Requests arriving from here on get a sync of their own after this one
+                self._sync_requested.clear()
+                logger.info(f"Running {'requested' if trigger == 'manual' else 'scheduled'} auction sync...")
+                self.sync_auctions(trigger=trigger)
                 
             except Exception as e:
                 logger.error(f"Error in update loop: {e}")
-                time.sleep(60)  # Wait 1 minute before retrying
+                stopped.wait(60)  # Wait 1 minute before retrying
+    
+    def _command_loop(self, stopped: threading.Event):
+        """Run commands from web processes (while leader)"""
+        while not stopped.is_set():
+            try:
+                command = self.commands.claim(self.lease.owner)
+                if command is None:
+                    stopped.wait(self.COMMAND_POLL_SECONDS)
+                    continue
+                if command['command'] in self.SYNC_LOCK_COMMANDS:
+                    # These wait for a running sync - don't hold up the commands behind them
+                    threading.Thread(target=self._run_command, args=(command,), daemon=True,
+                                     name=f"UpdaterCommand-{command['command']}").start()
+                else:
+                    self._run_command(command)
+            except Exception as e:
+                logger.error(f"Error in updater command loop: {e}")
+                stopped.wait(10)
     
-    def sync_auctions(self):
-        """Sync auctions from sikoauktioner.se to MongoDB"""
+    def _status_loop(self, stopped: threading.Event):
+        """Publish status for web processes every STATUS_PUBLISH_SECONDS (while leader)"""
+        while not stopped.is_set():
+            try:
+                self._publish_status()
+            except Exception as e:
+                logger.error(f"Error publishing updater status: {e}")
+            stopped.wait(self.STATUS_PUBLISH_SECONDS)
+    
+    def _run_command(self, command: Dict):
+        name, args = command['command'], command.get('args') or {}
+        logger.info(f"Running updater command '{name}' {args or ''}")
+        try:
+            if name == 'sync':
+                # Run by the update loop; requests queued up to now are covered by the same sync
+                self._sync_requested.set()
+                self.commands.skip_pending('sync', command['started_at'])
+                result = None
+            elif name == 'sync_search_word':
+                result = self._sync_search_word(args['word'])
+            elif name == 'detach_search_word':
+                result = self._detach_search_word(args['word'])
+            elif name == 'update_monitoring':
+                for field, value in args.items():
+                    setattr(self.config, field, value)
+                self.update_interval_from_config()
+                result = None
+            elif name == 'update_notification_hours':
+                for field, value in args.items():
+                    setattr(self.config, field, value)
+                self.update_notification_hours(self.config)
+                result = None
+            elif name == 'refresh_watchlist':
+                self.refresh_watchlist()
+                result = None
+            elif name == 'report_index_usage':
+                self.report_index_usage()
+                self._publish_status()
+                result = None
+            else:
+                raise ValueError(f"Unknown updater command: {name}")
+            self.commands.complete(command, result=result)
+        except Exception as e:
+            logger.error(f"Error running updater command '{name}': {e}")
+            self.commands.complete(command, error=str(e))
+    
+    def _publish_status(self):
+        """Store status for web processes that don't run the updater"""
+        self.status_store.publish({
+            **self.get_status(),
+            'counts': self.get_counts(),
+            'index_usage': self.last_index_report,
+        })
+    
+    def sync_auctions(self, trigger: str = 'scheduled'):
+        """Sync auctions from sikoauktioner.se to MongoDB
+        
+        Args:
+            trigger: What started the sync ('startup', 'scheduled', 'manual') - stored in the run report
+        """
+        with self._sync_lock, PROFILER.profile_sync(trigger):
+            self._sync_all(trigger)
+        # Attribute memory growth to the sync (no-op unless tracemalloc is on)
+        MEMORY.snapshot(f"sync:{trigger}")
+        self.index_reporter.maybe_report()
+    
+    def _sync_all(self, trigger: str):
+        """Full sync of every search word (caller holds the sync lock)"""
+        run = None
         try:
             start_time = time.time()
             
@@ -189,170 +466,482 @@ class AuctionUpdater:
                 return
             
             logger.info(f"Syncing auctions for {len(search_words)} search words: {search_words}")
+            run = SyncRun(trigger, search_words).start()
+            phases = PhaseTimer(SYNC_PHASE_DURATION)
             
             # Fetch fresh auctions from sikoauktioner.se
-            all_auctions = []
-            for search_word in search_words:
-                logger.debug(f"Searching for: {search_word}")
-                auctions = self.scraper.search_auctions(search_word)
-                for auction in auctions:
-                    auction['found_via'] = search_word
-                all_auctions.extend(auctions)
+            if self.task_worker:
+                all_auctions = self._scrape_distributed(search_words, run)
+            else:
+                all_auctions = []
+                for search_word in search_words:
+                    logger.debug(f"Searching for: {search_word}")
+                    auctions = self._search_term(search_word)
+                    run.record_term(self.scraper.last_search_stats, len(auctions))
+                    all_auctions.extend(auctions)
+            phases.mark('scrape')
             
-            # Remove duplicates based on auction ID
-            seen_ids = set()
-            unique_auctions = []
+            # Remove duplicates based on auction ID (remember every term that found it)
+            unique_by_id = {}
             for auction in all_auctions:
                 auction_id = auction.get('id')
-                if auction_id and auction_id not in seen_ids:
-                    seen_ids.add(auction_id)
-                    unique_auctions.append(auction)
+                if not auction_id:
+                    continue
+                if auction_id not in unique_by_id:
+                    auction['search_terms'] = [auction['found_via']]
+                    unique_by_id[auction_id] = auction
+                elif auction['found_via'] not in unique_by_id[auction_id]['search_terms']:
+                    unique_by_id[auction_id]['search_terms'].append(auction['found_via'])
+            unique_auctions = list(unique_by_id.values())
             
             # Filter out blacklisted auctions
-            unique_auctions = self.blacklist_manager.filter_auctions(unique_auctions)
+            unique_auctions = self.blacklist_manager.filter_auctions(unique_auctions, count_hits=True)
+            self.blacklist_manager.flush_rule_hits()
             logger.info(f"After blacklist filtering: {len(unique_auctions)} auctions remaining")
+            phases.mark('filter')
             
             # Update MongoDB cache (this will download and store images too)
             if unique_auctions:
                 # Clear old cache for these search words
                 self.cache.cache_auctions(search_words, unique_auctions)
+                run.record_writes(self.cache.last_write_stats)
                 
                 elapsed = time.time() - start_time
                 logger.info(f"✓ Synced {len(unique_auctions)} unique auctions in {elapsed:.1f}s")
             else:
                 logger.info("No auctions found matching search words")
+            self.search_manager.mark_synced(search_words)
+            phases.mark('store')
             
             # Automatically clean up closed auctions
             try:
                 removed = self.cache.cleanup_closed_auctions()
+                run.record_writes({}, closed_removed=removed)
                 if removed > 0:
                     logger.info(f"🗑️  Automatically removed {removed} closed auctions")
             except Exception as e:
                 logger.error(f"Error during automatic cleanup of closed auctions: {e}")
+            phases.mark('cleanup')
             
-            # Check for urgent notifications FIRST (ending soon)
-            urgent_auctions = []
-            for auction in unique_auctions:
-                auction_id = auction.get('id', auction.get('url', ''))
-                
-                # Skip if we already sent urgent notification
-                if auction_id in self.urgent_notifications_sent:
-                    continue
+            if self.is_leader:
+                # Try to send pending notifications first (if we're in allowed time)
+                released = self._send_pending_notifications()
                 
-                # Check if auction is ending soon
-                minutes_remaining = auction.get('minutes_remaining')
-                if minutes_remaining is not None and minutes_remaining <= self.config.urgent_notification_threshold_minutes:
-                    urgent_auctions.append(auction)
-                    self.urgent_notifications_sent.add(auction_id)
-                    self._save_urgent_notification(auction_id, auction)
+                notifications = self._process_notifications(unique_auctions)
+                run.record_notifications({**notifications, 'released': released})
+                self._schedule_urgent_notifications(unique_auctions)
+            else:
+                # Leadership was lost during the sync - the new leader notifies
+                logger.warning("No longer the leader, skipping notifications for this sync")
+            phases.mark('notify')
+            self._publish_sensors(unique_auctions)
+            phases.mark('publish')
+            phases.finish()
+            run.close(phases.durations, len(unique_auctions))
+            
+            self.last_update = time.time()
             
-            # Process new auctions for notifications
-            new_auctions = []
-            for auction in unique_auctions:
-                auction_id = auction.get('id', auction.get('url', ''))
+        except Exception as e:
+            logger.error(f"Error syncing auctions: {e}")
+            import traceback
+            logger.error(traceback.format_exc())
+            if run:
+                run.fail(e)
+                run.close()
+        finally:
+            if run:
+                self.sync_runs.save(run)
+    
+    def sync_search_word(self, search_word: str) -> int:
+        """Scrape a single (newly added) search word and merge it into storage
+        
+        Only this term is fetched from sikoauktioner.se; auctions stored for
+        the other terms are left untouched. Notifications run for the
+        auctions this term found. Followers send the leader a command.
+        
+        Returns:
+            Number of auctions found for the search word (0 if sent to the leader)
+        """
+        if not self.is_leader:
+            self.commands.send('sync_search_word', word=search_word)
+            return 0
+        return self._sync_search_word(search_word)
+    
+    def _sync_search_word(self, search_word: str) -> int:
+        search_word = search_word.strip().lower()
+        if not search_word:
+            return 0
+        
+        with self._sync_lock:
+            run = SyncRun('search_word', [search_word]).start()
+            phases = PhaseTimer()
+            try:
+                start_time = time.time()
+                logger.info(f"Syncing auctions for new search word: '{search_word}'")
                 
-                # Skip if already processed
-                if auction_id in self.processed_auctions:
-                    continue
+                auctions = self._search_term(search_word)
+                run.record_term(self.scraper.last_search_stats, len(auctions))
+                unique_by_id = {}
+                for auction in auctions:
+                    auction_id = auction.get('id')
+                    if auction_id and auction_id not in unique_by_id:
+                        unique_by_id[auction_id] = auction
+                unique_auctions = self.blacklist_manager.filter_auctions(list(unique_by_id.values()), count_hits=True)
+                self.blacklist_manager.flush_rule_hits()
+                phases.mark('scrape')
                 
-                # Mark as processed
-                self.processed_auctions.add(auction_id)
-                self._save_processed_auction(auction_id, auction)
-                new_auctions.append(auction)
-            
-            # Try to send pending notifications first (if we're in allowed time)
-            pending_auctions = self._get_pending_notifications()
-            if pending_auctions and self.notifier._is_notification_time_allowed():
-                logger.info(f"Attempting to send {len(pending_auctions)} pending notifications...")
-                for auction in pending_auctions:
-                    try:
-                        auction_id = auction.get('id', auction.get('url', ''))
-                        success = self.notifier.send_notification(auction, urgent=False)
-                        if success:
-                            logger.info(f"✓ Pending notification sent: {auction.get('title', 'Unknown')}")
-                            self._remove_pending_notification(auction_id)
-                        else:
-                            logger.debug(f"Pending notification still blocked: {auction.get('title', 'Unknown')}")
-                    except Exception as e:
-                        logger.error(f"✗ Error sending pending notification for {auction.get('id', 'unknown')}: {e}")
-            
-            # Send notifications for new auctions
-            for auction in new_auctions:
-                try:
-                    success = self.notifier.send_notification(auction)
-                    if success:
-                        logger.info(f"✓ Notification sent: {auction.get('title', 'Unknown')} (found via '{auction.get('found_via', 'unknown')}')")
-                    elif not success and not self.notifier._is_notification_time_allowed():
-                        # Queue notification for later if blocked by time restrictions
-                        self._save_pending_notification(auction)
-                    else:
-                        logger.warning(f"✗ Failed to send notification: {auction.get('title', 'Unknown')}")
-                except Exception as e:
-                    logger.error(f"✗ Error sending notification for {auction.get('id', 'unknown')}: {e}")
-            
-            # Send urgent notifications (bypass time restrictions)
-            for auction in urgent_auctions:
-                try:
-                    success = self.notifier.send_notification(auction, urgent=True)
-                    if success:
-                        logger.info(f"⚡ Urgent notification sent: {auction.get('title', 'Unknown')} ({auction.get('minutes_remaining')} min left)")
-                    else:
-                        logger.error(f"✗ Failed to send urgent notification: {auction.get('title', 'Unknown')}")
-                except Exception as e:
-                    logger.error(f"✗ Error sending urgent notification for {auction.get('id', 'unknown')}: {e}")
-            
-            # Check for watchlist notifications (auctions user wants alerts for)
-            watched_ids = self.watchlist_manager.get_watched_auction_ids()
-            watchlist_notifications = []
-            for auction in unique_auctions:
-                auction_id = auction.get('id', auction.get('url', ''))
+                # The word was added through another SearchManager instance
+                self.search_manager.invalidate_cache()
+                search_words = self.search_manager.get_search_words()
+                if search_word not in search_words:
+                    # Removed again while we were scraping
+                    logger.info(f"Search word '{search_word}' no longer configured, discarding results")
+                    run.report['status'] = 'discarded'
+                    run.close(phases.durations)
+                    return 0
                 
-                # Check if auction is watched and if we haven't sent a notification yet
-                if auction_id in watched_ids and auction_id not in self.urgent_notifications_sent:
-                    # Check if auction is ending within threshold
-                    minutes_remaining = auction.get('minutes_remaining')
-                    if minutes_remaining is not None and minutes_remaining <= self.config.urgent_notification_threshold_minutes:
-                        watchlist_notifications.append(auction)
-                        self.urgent_notifications_sent.add(auction_id)
-                        self._save_urgent_notification(auction_id, auction)
+                if unique_auctions:
+                    self.cache.merge_term_auctions(search_word, search_words, unique_auctions)
+                    run.record_writes(self.cache.last_write_stats)
+                self.search_manager.mark_synced([search_word])
+                phases.mark('store')
+                
+                elapsed = time.time() - start_time
+                logger.info(f"✓ Synced {len(unique_auctions)} auctions for '{search_word}' in {elapsed:.1f}s")
+                
+                # If the lease moved while scraping, notifications are left to the new leader's next sync
+                if self.is_leader:
+                    run.record_notifications(self._process_notifications(unique_auctions))
+                    self._schedule_urgent_notifications(unique_auctions)
+                phases.mark('notify')
+                phases.finish()
+                run.close(phases.durations, len(unique_auctions))
+                return len(unique_auctions)
+                
+            except Exception as e:
+                logger.error(f"Error syncing search word '{search_word}': {e}")
+                import traceback
+                logger.error(traceback.format_exc())
+                run.fail(e)
+                run.close()
+                return 0
+            finally:
+                self.sync_runs.save(run)
+    
+    def _candidate_filter(self, search_word: str):
+        """Result-card filter for a search word: the reason to skip a result before its detail fetch, or None"""
+        def candidate_filter(candidate: Dict) -> Optional[str]:
+            reason = self.blacklist_manager.check_listing(candidate)
+            if reason:
+                return reason
+            return self.search_manager.check_listing(
+                search_word,
+                candidate.get('title', ''),
+                match_title=self.config.prefilter_listing_titles
+            )
+        return candidate_filter
+    
+    def _search_term(self, search_word: str) -> List[Dict]:
+        """Scrape one search word, skipping detail fetches for results we would drop"""
+        auctions = self.scraper.search_auctions(search_word, candidate_filter=self._candidate_filter(search_word))
+        
+        # Exclusion keywords may only show up in the full description
+        auctions = [a for a in auctions if not self.search_manager.is_excluded(a, search_word)]
+        for auction in auctions:
+            auction['found_via'] = search_word
+        return auctions
+    
+    def _scrape_distributed(self, search_words: List[str], run: SyncRun) -> List[Dict]:
+        """Scrape through the sync task queue and wait for the task workers of every process
+        
+        Each auction is fetched once per cycle however many search words
+        found it; its requests count towards the first word that found it.
+        
+        Returns:
+            Auctions per search word, as _search_term returns them
+        """
+        cycle = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+        self.sync_tasks.enqueue_terms(cycle, search_words)
+        logger.info(f"Queued sync cycle {cycle} ({len(search_words)} search words)")
+        deadline = time.time() + self.config.sync_cycle_timeout_minutes * 60
+        while True:
+            progress = self.sync_tasks.progress(cycle)
+            if not progress['pending'] and not progress['claimed']:
+                break
+            if time.time() >= deadline or not self.is_leader:
+                abandoned = self.sync_tasks.abandon(cycle)
+                logger.error(f"Sync cycle {cycle} stopped waiting with {abandoned} unfinished tasks")
+                break
+            time.sleep(self.TASK_POLL_SECONDS)
+        
+        term_tasks = {}
+        found = {search_word: [] for search_word in search_words}
+        detail_requests = {search_word: dict.fromkeys(REQUEST_FIELDS, 0) for search_word in search_words}
+        counts = {'term': {}, 'auction': {}}
+        workers = {}
+        for task in self.sync_tasks.tasks(cycle):
+            kind, status = task['kind'], task['status']
+            counts[kind][status] = counts[kind].get(status, 0) + 1
+            if status == 'done':
+                worker = task['owner'].split('/')[0]
+                workers[worker] = workers.get(worker, 0) + 1
+            if kind == 'term':
+                term_tasks[task['term']] = task
+                continue
+            if status != 'done':
+                # Worker errors are logged on the workers' threads - report them in this run too
+                logger.error(f"Detail fetch of {task['url']} {status}: {task.get('error', 'not finished')}")
+                continue
+            result = task['result']
+            first_term = task['terms'][0]
+            if first_term in detail_requests:
+                for field in REQUEST_FIELDS:
+                    detail_requests[first_term][field] += result.get(field, 0)
+            for search_word in task['terms']:
+                if search_word not in found:
+                    continue
+                auction = dict(result['auction'], search_term_used=search_word)
+                # Exclusion keywords may only show up in the full description
+                if self.search_manager.is_excluded(auction, search_word):
+                    continue
+                auction['found_via'] = search_word
+                found[search_word].append(auction)
+        
+        all_auctions = []
+        for search_word in search_words:
+            task = term_tasks.get(search_word, {})
+            stats = dict(task.get('result') or {'search_term': search_word})
+            if task.get('status') != 'done':
+                stats['error'] = task.get('error') or f"term task {task.get('status', 'missing')}"
+                logger.error(f"Error searching for '{search_word}': {stats['error']}")
+            for field in REQUEST_FIELDS:
+                stats[field] = stats.get(field, 0) + detail_requests[search_word][field]
+            run.record_term(stats, len(found[search_word]))
+            all_auctions.extend(found[search_word])
+        run.report['tasks'] = {'cycle': cycle, 'counts': counts, 'workers': workers}
+        logger.info(f"Sync cycle {cycle} finished: {counts} by {len(workers)} workers")
+        return all_auctions
+    
+    def detach_search_word(self, search_word: str) -> int:
+        """Detach a removed search word from stored auctions (no network activity)"""
+        if not self.is_leader:
+            self.commands.send('detach_search_word', word=search_word)
+            return 0
+        return self._detach_search_word(search_word)
+    
+    def _detach_search_word(self, search_word: str) -> int:
+        with self._sync_lock:
+            self.search_manager.invalidate_cache()
+            search_words = self.search_manager.get_search_words()
+            return self.cache.detach_search_term(search_word, search_words)
+    
+    def _send_pending_notifications(self) -> int:
+        """Release notifications held during quiet hours as one batch (if we're in allowed time)
+        
+        Returns:
+            Number of held notifications released
+        """
+        if not self.notifier._is_notification_time_allowed():
+            self._schedule_pending_release()
+            return 0
+        
+        pending_auctions = self._get_pending_notifications()
+        if not pending_auctions:
+            return 0
+        
+        queued = self.notification_queue.enqueue_many('match', pending_auctions)
+        auction_ids = [auction.get('id', auction.get('url', '')) for auction in pending_auctions]
+        try:
+            self.pending_collection.delete_many({'auction_id': {'$in': auction_ids}})
+        except Exception as e:
+            logger.error(f"Error removing pending notifications: {e}")
+        logger.info(f"✓ Released {len(pending_auctions)} pending notifications ({queued} queued)")
+        return len(pending_auctions)
+    
+    def _process_notifications(self, unique_auctions: List[Dict]) -> Dict[str, int]:
+        """Send new-match, urgent and watchlist notifications for synced auctions
+        
+        Returns:
+            Counts for the sync run report (new, held, queued, urgent, watchlist)
+        """
+        # Check for urgent notifications FIRST (ending soon)
+        urgent_auctions = []
+        for auction in unique_auctions:
+            auction_id = auction.get('id', auction.get('url', ''))
             
-            # Send watchlist notifications
-            for auction in watchlist_notifications:
-                try:
-                    success = self.notifier.send_notification(auction, urgent=True)
-                    if success:
-                        logger.info(f"⭐ Watchlist notification sent: {auction.get('title', 'Unknown')} ({auction.get('minutes_remaining')} min left)")
-                    else:
-                        logger.error(f"✗ Failed to send watchlist notification: {auction.get('title', 'Unknown')}")
-                except Exception as e:
-                    logger.error(f"✗ Error sending watchlist notification for {auction.get('id', 'unknown')}: {e}")
+            # Skip if we already sent urgent notification
+            if auction_id in self.urgent_notifications_sent:
+                continue
             
-            if new_auctions:
-                logger.info(f"Found {len(new_auctions)} new auctions, sent notifications")
-            if urgent_auctions:
-                logger.info(f"Sent {len(urgent_auctions)} urgent notifications")
-            if watchlist_notifications:
-                logger.info(f"Sent {len(watchlist_notifications)} watchlist notifications")
+            # Check if auction is ending soon
+            minutes_remaining = auction.get('minutes_remaining')
+            if minutes_remaining is not None and minutes_remaining <= self.config.urgent_notification_threshold_minutes:
+                if self._claim_urgent_notification(auction_id, auction):
+                    urgent_auctions.append(auction)
+        
+        # Process new auctions for notifications
+        new_auctions = []
+        for auction in unique_auctions:
+            auction_id = auction.get('id', auction.get('url', ''))
             
-            self.last_update = time.time()
+            # Skip if already processed
+            if auction_id in self.processed_auctions:
+                continue
             
+            # Mark as processed
+            self.processed_auctions.add(auction_id)
+            self._save_processed_auction(auction_id, auction)
+            new_auctions.append(auction)
+        
+        # Queue notifications for new auctions
+        allowed_now = self.notifier._is_notification_time_allowed()
+        queued = 0
+        for auction in new_auctions:
+            if not allowed_now:
+                # Keep notification for later if blocked by time restrictions
+                self._save_pending_notification(auction)
+            elif self.notification_queue.enqueue('match', auction):
+                queued += 1
+                logger.info(f"✓ Notification queued: {auction.get('title', 'Unknown')} (found via '{auction.get('found_via', 'unknown')}')")
+        if new_auctions and not allowed_now:
+            self._schedule_pending_release()
+        
+        # Queue urgent notifications (bypass time restrictions)
+        for auction in urgent_auctions:
+            if self.notification_queue.enqueue('urgent', auction):
+                queued += 1
+                logger.info(f"⚡ Urgent notification queued: {auction.get('title', 'Unknown')} ({auction.get('minutes_remaining')} min left)")
+        
+        # Check for watchlist notifications (auctions user wants alerts for)
+        watched_ids = self.watchlist_manager.get_watched_auction_ids()
+        watchlist_notifications = []
+        for auction in unique_auctions:
+            auction_id = auction.get('id', auction.get('url', ''))
+            
+            # Check if auction is watched and if we haven't sent a notification yet
+            if auction_id in watched_ids and auction_id not in self.urgent_notifications_sent:
+                # Check if auction is ending within threshold
+                minutes_remaining = auction.get('minutes_remaining')
+                if minutes_remaining is not None and minutes_remaining <= self.config.urgent_notification_threshold_minutes:
+                    if self._claim_urgent_notification(auction_id, auction):
+                        watchlist_notifications.append(auction)
+        
+        # Queue watchlist notifications
+        for auction in watchlist_notifications:
+            if self.notification_queue.enqueue('urgent', auction):
+                queued += 1
+                logger.info(f"⭐ Watchlist notification queued: {auction.get('title', 'Unknown')} ({auction.get('minutes_remaining')} min left)")
+        
+        if new_auctions:
+            logger.info(f"Found {len(new_auctions)} new auctions, queued notifications")
+        if urgent_auctions:
+            logger.info(f"Queued {len(urgent_auctions)} urgent notifications")
+        if watchlist_notifications:
+            logger.info(f"Queued {len(watchlist_notifications)} watchlist notifications")
+        
+        return {
+            'new': len(new_auctions),
+            'held': 0 if allowed_now else len(new_auctions),
+            'urgent': len(urgent_auctions),
+            'watchlist': len(watchlist_notifications),
+            'queued': queued,
+        }
+    
+    def _publish_sensors(self, auctions: List[Dict]):
+        """Push matches and watched auctions to Home Assistant sensor entities"""
+        if not self.sensor_publisher.enabled:
+            return
+        try:
+            entries = self.watchlist_manager.get_watchlist()
+            auction_ids = [entry['auction_id'] for entry in entries]
+            latest = {
+                doc['id']: doc for doc in self.cache.collection.find(
+                    {'id': {'$in': auction_ids}},
+                    {'_id': 0, 'id': 1, 'title': 1, 'url': 1, 'current_bid': 1, 'ends_at': 1, 'time_left': 1}
+                )
+            }
+            watched = [{**entry, **latest.get(entry['auction_id'], {})} for entry in entries]
+            self.sensor_publisher.publish(auctions, watched)
         except Exception as e:
-            logger.error(f"Error syncing auctions: {e}")
-            import traceback
-            logger.error(traceback.format_exc())
+            logger.error(f"Error publishing Home Assistant sensors: {e}")
     
     def force_sync(self):
         """Force immediate sync (called when search words change)"""
+        if not self.is_leader:
+            # Another process runs the updater
+            self.commands.send('sync')
+            return
         logger.info("Force sync triggered (search words changed)")
-        self.sync_auctions()
+        self.sync_auctions(trigger='manual')
+    
+    def refresh_watchlist(self):
+        """Pick up watchlist changes in the end-game tracker right away"""
+        if not self.is_leader:
+            # The tracker runs in the leader
+            self.commands.send('refresh_watchlist')
+            return
+        self.endgame_tracker.refresh_watchlist()
     
-    def update_interval_from_config(self):
-        """Update the check interval from config (called when config changes)"""
+    def report_index_usage(self) -> Dict:
+        """Run the $indexStats report now"""
+        return self.index_reporter.report()
+    
+    @property
+    def last_index_report(self) -> Optional[Dict]:
+        return self.index_reporter.last_report
+    
+    def update_interval_from_config(self, source_config=None):
+        """Update the check interval from config (called when config changes)
+        
+        Args:
+            source_config: Config holding the new values (default: this updater's own)
+        """
+        if source_config is not None:
+            self.config.check_interval_minutes = source_config.check_interval_minutes
+            self.config.urgent_notification_threshold_minutes = source_config.urgent_notification_threshold_minutes
+        if not self.is_leader:
+            # Kept in our config for when we become the leader
+            self.commands.send(
+                'update_monitoring',
+                check_interval_minutes=self.config.check_interval_minutes,
+                urgent_notification_threshold_minutes=self.config.urgent_notification_threshold_minutes
+            )
+            return
+        # The notifier and end-game tracker read the threshold from their own config copies
+        for config in (self.notifier.config, self.endgame_tracker.config):
+            config.urgent_notification_threshold_minutes = self.config.urgent_notification_threshold_minutes
         new_interval = self.config.check_interval_minutes * 60
         if new_interval != self.update_interval:
             old_interval_min = self.update_interval / 60
             self.update_interval = new_interval
             logger.info(f"Check interval updated: {old_interval_min:.0f} min -> {self.config.check_interval_minutes} min")
+        
+        # The urgent threshold may have changed too
+        self._restore_urgent_schedule()
+    
+    def update_notification_hours(self, source_config):
+        """Apply new allowed notification hours (called when config changes)"""
+        for field in ('weekday_notification_start_hour', 'weekday_notification_end_hour',
+                      'weekend_notification_start_hour', 'weekend_notification_end_hour'):
+            setattr(self.notifier.config, field, getattr(source_config, field))
+        if not self.is_leader:
+            self.commands.send('update_notification_hours', **{
+                field: getattr(source_config, field)
+                for field in ('weekday_notification_start_hour', 'weekday_notification_end_hour',
+                              'weekend_notification_start_hour', 'weekend_notification_end_hour')
+            })
+            return
+        self._schedule_pending_release()
+    
+    def get_counts(self) -> Dict:
+        """Figures exported as metrics"""
+        queue_status = self.notification_queue.get_status()
+        return {
+            'processed_auctions': len(self.processed_auctions),
+            'urgent_scheduled': len(self.urgent_scheduler),
+            'notification_queue': {status: queue_status[status] for status in ('pending', 'sending', 'failed')},
+            'last_update': self.last_update,
+        }
     
     def get_status(self) -> Dict:
         """Get updater status"""
@@ -361,8 +950,17 @@ class AuctionUpdater:
         
         return {
             'running': self.running,
+            'leader': self.lease.get_status(),
             'last_update': self.last_update,
             'time_since_update_minutes': time_since_update / 60 if time_since_update else None,
             'next_update_minutes': next_update / 60 if next_update > 0 else 0,
-            'update_interval_minutes': self.update_interval / 60
+            'update_interval_minutes': self.update_interval / 60,
+            'endgame_tracker': self.endgame_tracker.get_status(),
+            'urgent_scheduler': self.urgent_scheduler.get_status(),
+            'pending_release': self.release_scheduler.get_status(),
+            'notification_queue': self.notification_queue.get_status(),
+            'notification_targets': self.notifier.get_target_stats(),
+            'ha_sensors': self.sensor_publisher.get_status(),
+            'sync_tasks': self.task_worker.get_status() if self.task_worker else None,
+            'parse_pool': PARSE_POOL.get_status(),
         }
@@ -5,27 +5,154 @@ Blacklist Manager - Manage hidden/blacklisted auctions
 
 import json
 import os
+import re
 import logging
+import threading
 import time
+import uuid
 from typing import List, Dict, Set, Optional
 from .config import get_config
 
 logger = logging.getLogger(__name__)
 
+# Supported rule types for rule-based blacklisting
+RULE_TYPES = ('keyword', 'regex', 'location', 'max_price')
+
+
+def parse_price(price: str) -> Optional[int]:
+    """Parse a price string like '1 200 kr' to an integer"""
+    if not price:
+        return None
+    digits = re.sub(r'[^\d]', '', str(price))
+    return int(digits) if digits else None
+
+
+class BlacklistRules:
+    """Blacklist rules compiled into a single fast predicate
+    
+    Keywords are joined into one case-insensitive regex alternation,
+    locations into a set and price ceilings reduced to the lowest one.
+    """
+    
+    def __init__(self, rules: List[Dict]):
+        self.rules = [rule for rule in rules if rule.get('enabled', True)]
+        self._keyword_rules: Dict[str, str] = {}
+        self._regex_rules = []
+        self._location_rules: Dict[str, str] = {}
+        self._price_rules = []
+        
+        for rule in self.rules:
+            rule_type, value, rule_id = rule.get('type'), rule.get('value'), rule.get('rule_id')
+            try:
+                if rule_type == 'keyword':
+                    self._keyword_rules.setdefault(str(value).lower().strip(), rule_id)
+                elif rule_type == 'regex':
+                    self._regex_rules.append((rule_id, re.compile(str(value), re.IGNORECASE)))
+                elif rule_type == 'location':
+                    self._location_rules.setdefault(str(value).lower().strip(), rule_id)
+                elif rule_type == 'max_price':
+                    self._price_rules.append((int(value), rule_id))
+            except (re.error, ValueError, TypeError) as e:
+                logger.error(f"Invalid blacklist rule {rule_id} ({rule_type}={value!r}): {e}")
+        
+        keywords = sorted((k for k in self._keyword_rules if k), key=len, reverse=True)
+        self._keyword_pattern = re.compile('|'.join(re.escape(k) for k in keywords)) if keywords else None
+        self._price_rules.sort()
+    
+    def __len__(self) -> int:
+        return len(self.rules)
+    
+    def match(self, auction: Dict) -> Optional[str]:
+        """Get the ID of the first rule matching an auction or listing, or None
+        
+        Works on parsed auctions and on search result cards (which only
+        have an id, url and title).
+        """
+        text = '\n'.join(auction.get(field) or '' for field in ('title', 'description')).lower()
+        
+        if self._keyword_pattern and text:
+            match = self._keyword_pattern.search(text)
+            if match:
+                return self._keyword_rules[match.group(0)]
+        
+        for rule_id, pattern in self._regex_rules:
+            if text and pattern.search(text):
+                return rule_id
+        
+        location = (auction.get('location') or '').lower().strip()
+        if location and location in self._location_rules:
+            return self._location_rules[location]
+        
+        if self._price_rules:
+            price = parse_price(auction.get('current_bid')) or parse_price(auction.get('reserve_price'))
+            if price is not None:
+                ceiling, rule_id = self._price_rules[0]
+                if price > ceiling:
+                    return rule_id
+        
+        return None
+
+
 class BlacklistManager:
     """Manages blacklisted/hidden auctions"""
     
+    # How often (seconds) to check whether another process changed the blacklist
+    VERSION_CHECK_INTERVAL = 10.0
+    
     def __init__(self):
         self.config = get_config()
         self._blacklisted_ids: Set[str] = set()
+        self._rules = BlacklistRules([])
+        self._pending_hits: Dict[str, int] = {}
+        self._hits_lock = threading.Lock()  # Sync task threads count hits concurrently
         
         # Initialize MongoDB collection
         from .mongodb_client import MongoDBClient
         mongo_client = MongoDBClient()
         self.mongo_collection = mongo_client.get_collection('blacklist', self.config.mongodb_database)
+        self.rules_collection = mongo_client.get_collection('blacklist_rules', self.config.mongodb_database)
+        self.state_collection = mongo_client.get_collection('app_state', self.config.mongodb_database)
+        self._version: Optional[int] = None
+        self._last_version_check = 0.0
         logger.info("BlacklistManager using MongoDB storage")
         
         self.load_blacklist()
+        self.load_rules()
+        self._version = self._get_version()
+        self._last_version_check = time.time()
+    
+    def _get_version(self) -> int:
+        """Get the blacklist version from MongoDB (bumped on every change)"""
+        try:
+            doc = self.state_collection.find_one({'_id': 'blacklist'}, {'version': 1})
+            return doc.get('version', 0) if doc else 0
+        except Exception as e:
+            logger.error(f"Error reading blacklist version: {e}")
+            return self._version or 0
+    
+    def _bump_version(self):
+        """Tell other processes (web app / updater) to reload the blacklist"""
+        try:
+            self.state_collection.update_one(
+                {'_id': 'blacklist'},
+                {'$inc': {'version': 1}, '$set': {'updated_at': time.time()}},
+                upsert=True
+            )
+            self._version = self._get_version()
+        except Exception as e:
+            logger.error(f"Error bumping blacklist version: {e}")
+    
+    def refresh_if_changed(self):
+        """Reload IDs and rules if another process changed them"""
+        now = time.time()
+        if now - self._last_version_check < self.VERSION_CHECK_INTERVAL:
+            return
+        self._last_version_check = now
+        version = self._get_version()
+        if version != self._version:
+            self._version = version
+            self.load_blacklist()
+            self.load_rules()
     
     def load_blacklist(self):
         """Load blacklisted auction IDs from MongoDB"""
@@ -68,6 +195,7 @@ class BlacklistManager:
             logger.info(f"Attempting to insert into MongoDB blacklist: {doc}")
             result = self.mongo_collection.insert_one(doc)
             logger.info(f"Successfully inserted into MongoDB, inserted_id: {result.inserted_id}")
+            self._bump_version()
         except Exception as e:
             logger.error(f"Error saving to MongoDB: {e}", exc_info=True)
         
@@ -92,6 +220,7 @@ class BlacklistManager:
         # Remove from MongoDB
         try:
             self.mongo_collection.delete_one({'auction_id': auction_id})
+            self._bump_version()
         except Exception as e:
             logger.error(f"Error removing from MongoDB: {e}")
         
@@ -141,17 +270,162 @@ class BlacklistManager:
         # Clear from MongoDB
         try:
             self.mongo_collection.delete_many({})
+            self._bump_version()
         except Exception as e:
             logger.error(f"Error clearing MongoDB blacklist: {e}")
         
         logger.info(f"Cleared {count} auctions from blacklist")
     
-    def filter_auctions(self, auctions: List[Dict]) -> List[Dict]:
+    def load_rules(self):
+        """Load blacklist rules from MongoDB and compile them"""
+        try:
+            rules = list(self.rules_collection.find({}, {'_id': 0}))
+            self._rules = BlacklistRules(rules)
+            logger.info(f"Loaded {len(self._rules)} blacklist rules from MongoDB")
+        except Exception as e:
+            logger.error(f"Error loading blacklist rules from MongoDB: {e}")
+    
+    def add_rule(self, rule_type: str, value, description: str = None) -> Optional[Dict]:
+        """
+        Add a rule-based blacklist entry
+        
+        Args:
+            rule_type: One of 'keyword', 'regex', 'location' or 'max_price'
+            value: Keyword/regex/location text, or price ceiling in kr
+            description: Optional note shown in the UI
+            
+        Returns:
+            The stored rule, or None if the rule is invalid
+        """
+        if rule_type not in RULE_TYPES:
+            logger.warning(f"Unknown blacklist rule type: {rule_type}")
+            return None
+        
+        try:
+            if rule_type == 'regex':
+                re.compile(str(value))
+            elif rule_type == 'max_price':
+                value = int(value)
+            else:
+                value = str(value).strip()
+            if value == '':
+                return None
+        except (re.error, ValueError, TypeError) as e:
+            logger.warning(f"Invalid blacklist rule value {value!r}: {e}")
+            return None
+        
+        rule = {
+            'rule_id': uuid.uuid4().hex[:12],
+            'type': rule_type,
+            'value': value,
+            'description': description,
+            'enabled': True,
+            'hits': 0,
+            'last_hit_at': None,
+            'added_at': time.time()
+        }
+        try:
+            self.rules_collection.insert_one(rule.copy())
+            self._bump_version()
+        except Exception as e:
+            logger.error(f"Error saving blacklist rule: {e}")
+            return None
+        
+        self.load_rules()
+        logger.info(f"Added blacklist rule {rule['rule_id']}: {rule_type}={value!r}")
+        return rule
+    
+    def remove_rule(self, rule_id: str) -> bool:
+        """Remove a rule-based blacklist entry"""
+        try:
+            result = self.rules_collection.delete_one({'rule_id': rule_id})
+            if result.deleted_count == 0:
+                logger.info(f"Blacklist rule {rule_id} not found")
+                return False
+            self._bump_version()
+        except Exception as e:
+            logger.error(f"Error removing blacklist rule: {e}")
+            return False
+        
+        with self._hits_lock:
+            self._pending_hits.pop(rule_id, None)
+        self.load_rules()
+        logger.info(f"Removed blacklist rule {rule_id}")
+        return True
+    
+    def get_rules(self) -> List[Dict]:
+        """Get all blacklist rules with their hit counters"""
+        try:
+            rules = list(self.rules_collection.find({}, {'_id': 0}).sort('added_at', 1))
+            # Include hits not yet flushed to MongoDB
+            with self._hits_lock:
+                pending = dict(self._pending_hits)
+            for rule in rules:
+                rule['hits'] = rule.get('hits', 0) + pending.get(rule['rule_id'], 0)
+            return rules
+        except Exception as e:
+            logger.error(f"Error getting blacklist rules: {e}")
+            return []
+    
+    def match_rule(self, auction: Dict, count_hit: bool = True) -> Optional[str]:
+        """
+        Check an auction (or search result card) against the blacklist rules
+        
+        Args:
+            auction: Auction dictionary or listing with id/url/title
+            count_hit: Count the hit on the matching rule
+            
+        Returns:
+            ID of the matching rule, or None
+        """
+        rule_id = self._rules.match(auction)
+        if rule_id and count_hit:
+            with self._hits_lock:
+                self._pending_hits[rule_id] = self._pending_hits.get(rule_id, 0) + 1
+        return rule_id
+    
+    def check_listing(self, listing: Dict) -> Optional[str]:
+        """Evaluate a search result card before its detail page is fetched
+        
+        Returns:
+            Reason the listing is blacklisted, or None
+        """
+        self.refresh_if_changed()
+        if self.is_blacklisted(listing.get('id', listing.get('url', ''))):
+            return 'blacklisted'
+        rule_id = self.match_rule(listing)
+        if rule_id:
+            return f"rule:{rule_id}"
+        return None
+    
+    def flush_rule_hits(self):
+        """Write accumulated rule hit counters to MongoDB"""
+        with self._hits_lock:
+            if not self._pending_hits:
+                return
+            hits, self._pending_hits = self._pending_hits, {}
+        try:
+            from pymongo import UpdateOne
+            now = time.time()
+            self.rules_collection.bulk_write([
+                UpdateOne({'rule_id': rule_id}, {'$inc': {'hits': count}, '$set': {'last_hit_at': now}})
+                for rule_id, count in hits.items()
+            ], ordered=False)
+            logger.debug(f"Flushed hit counters for {len(hits)} blacklist rules")
+        except Exception as e:
+            logger.error(f"Error saving blacklist rule hits: {e}")
+            # Keep the counts for the next flush
+            with self._hits_lock:
+                for rule_id, count in hits.items():
+                    self._pending_hits[rule_id] = self._pending_hits.get(rule_id, 0) + count
+    
+    def filter_auctions(self, auctions: List[Dict], count_hits: bool = False) -> List[Dict]:
         """
         Filter out blacklisted auctions from a list
         
         Args:
             auctions: List of auction dictionaries
+            count_hits: Count rule hits (used by the sync, not by page views)
             
         Returns:
             List of auctions with blacklisted ones removed
@@ -159,18 +433,25 @@ class BlacklistManager:
         if not auctions:
             return auctions
         
+        self.refresh_if_changed()
         filtered_auctions = []
         blacklisted_count = 0
+        rule_count = 0
         
         for auction in auctions:
             auction_id = auction.get('id', auction.get('url', ''))
-            if not self.is_blacklisted(auction_id):
-                filtered_auctions.append(auction)
-            else:
+            if self.is_blacklisted(auction_id):
                 blacklisted_count += 1
                 logger.debug(f"Filtered out blacklisted auction: {auction.get('title', auction_id)}")
+            elif self.match_rule(auction, count_hit=count_hits):
+                rule_count += 1
+                logger.debug(f"Filtered out auction matching blacklist rule: {auction.get('title', auction_id)}")
+            else:
+                filtered_auctions.append(auction)
         
         if blacklisted_count > 0:
             logger.info(f"Filtered out {blacklisted_count} blacklisted auctions")
+        if rule_count > 0:
+            logger.info(f"Filtered out {rule_count} auctions matching blacklist rules")
         
-        return filtered_auctions
\ No newline at end of file
+        return filtered_auctions
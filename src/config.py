@@ -14,21 +14,60 @@ class Config(BaseSettings):
     home_assistant_url: str = Field(default="http://homeassistant.local:8123", alias="HA_URL")
     home_assistant_token: str = Field(default="", alias="HA_TOKEN")
     home_assistant_service: str = Field(default="notify.mobile_app_your_iphone", alias="HA_SERVICE")
+    # Optional JSON list of notification targets with per-target kinds (overrides HA_SERVICE), e.g.
+    # [{"service": "notify.mobile_app_phone"}, {"service": "tts.speak", "kinds": ["urgent"], "data": {...}}]
+    notification_targets: str = Field(default="", alias="HA_NOTIFICATION_TARGETS")
+    # Sensor entities pushed to HA after each sync (sensor.<prefix>_auction_matches, ...)
+    ha_sensors_enabled: bool = Field(default=True, alias="HA_SENSORS_ENABLED")
+    ha_sensor_prefix: str = Field(default="siko", alias="HA_SENSOR_PREFIX")
     
     # Monitoring configuration (controls background sync interval)
     check_interval_minutes: int = Field(default=15, alias="CHECK_INTERVAL_MINUTES")
     max_auctions_per_check: int = Field(default=100, alias="MAX_AUCTIONS")
     urgent_notification_threshold_minutes: int = Field(default=15, alias="URGENT_NOTIFICATION_THRESHOLD_MINUTES")
     
+    # End-game tracking of watched auctions (refreshes faster as the end approaches)
+    endgame_tracking_enabled: bool = Field(default=True, alias="ENDGAME_TRACKING_ENABLED")
+    endgame_final_interval_seconds: int = Field(default=5, alias="ENDGAME_FINAL_INTERVAL_SECONDS")
+    
+    # Outbound notification queue (delivered by background workers with retries)
+    notification_workers: int = Field(default=2, alias="NOTIFICATION_WORKERS")
+    notification_max_attempts: int = Field(default=5, alias="NOTIFICATION_MAX_ATTEMPTS")
+    # New-match notifications are grouped into one digest per window (or per N items)
+    notification_digest_enabled: bool = Field(default=True, alias="NOTIFICATION_DIGEST_ENABLED")
+    notification_digest_window_seconds: int = Field(default=60, alias="NOTIFICATION_DIGEST_WINDOW_SECONDS")
+    notification_digest_max_items: int = Field(default=20, alias="NOTIFICATION_DIGEST_MAX_ITEMS")
+    
     # Web interface configuration
     web_host: str = "0.0.0.0"
     web_port: int = 5000
+    # Waitress worker threads; each open /api/logs/tail stream holds one for up to 30 s
+    web_threads: int = 8
     web_debug: bool = False
     
     # Scraping configuration
     user_agent: str = "Mozilla/5.0 (compatible; SikoAuctionMonitor/1.0)"
     request_timeout: int = 30
     request_delay: float = 1.0
+    # Skip detail pages of search results whose listing title doesn't match the search word.
+    # Lossy: the site search also matches descriptions, and those results (and their notifications) are dropped
+    prefilter_listing_titles: bool = Field(default=False, alias="PREFILTER_LISTING_TITLES")
+    # Worker processes parsing auction pages while the next ones are fetched (0 = parse in the fetching thread)
+    parse_processes: int = Field(default=0, alias="PARSE_PROCESSES")
+    # Outbound HTTP (scraper, image downloads, Home Assistant)
+    http_pool_size: int = Field(default=10, alias="HTTP_POOL_SIZE")  # Kept-alive connections per host
+    http_retries: int = Field(default=2, alias="HTTP_RETRIES")  # GET retries on connection errors and 502/503/504
+    http_debug_slow_ms: int = Field(default=0, alias="HTTP_DEBUG_SLOW_MS")  # Log requests slower than this (0 = off)
+    
+    # Only one process runs the updater; others take over within one lease period
+    leader_lease_seconds: int = Field(default=30, alias="LEADER_LEASE_SECONDS")
+    # false: the updater runs in `manage.py sync-worker` and web processes only read state and send commands
+    web_runs_updater: bool = Field(default=True, alias="WEB_RUNS_UPDATER")
+    # Distributed scraping: every updater process runs this many task threads (0 = the leader scrapes alone)
+    sync_task_workers: int = Field(default=0, alias="SYNC_TASK_WORKERS")
+    sync_task_lease_seconds: int = Field(default=120, alias="SYNC_TASK_LEASE_SECONDS")  # A dead worker's task is retried after this
+    sync_cycle_timeout_minutes: int = Field(default=30, alias="SYNC_CYCLE_TIMEOUT_MINUTES")  # Leader stops waiting for tasks
+    scrape_rate_limit: float = Field(default=1.0, alias="SCRAPE_RATE_LIMIT")  # Requests/second to sikoauktioner.se across all workers
     
     # Storage configuration (legacy, kept for compatibility)
     search_words_file: str = "config/search_words.json"
@@ -41,6 +80,27 @@ class Config(BaseSettings):
     
     # Logging configuration
     log_level: str = "INFO"
+    # Log records older than this are removed by a TTL index (0 keeps them forever)
+    log_retention_days: int = Field(default=30, alias="LOG_RETENTION_DAYS")
+    # Logs are written to MongoDB in batches from a background thread
+    log_batch_size: int = Field(default=100, alias="LOG_BATCH_SIZE")
+    log_flush_interval_seconds: float = Field(default=2.0, alias="LOG_FLUSH_INTERVAL_SECONDS")
+    # Sync run reports (sync_runs collection) older than this are removed (0 keeps them forever)
+    sync_run_retention_days: int = Field(default=90, alias="SYNC_RUN_RETENTION_DAYS")
+    
+    # On-demand profiling (armed through /api/profiling or manage.py profile-sync)
+    profile_dir: str = Field(default="profiles", alias="PROFILE_DIR")
+    profile_sample_interval_ms: float = Field(default=10.0, alias="PROFILE_SAMPLE_INTERVAL_MS")
+    
+    # Memory diagnostics - tracemalloc snapshots are diffed after every sync while tracing
+    tracemalloc_enabled: bool = Field(default=False, alias="TRACEMALLOC_ENABLED")
+    tracemalloc_frames: int = Field(default=1, alias="TRACEMALLOC_FRAMES")
+    tracemalloc_keep_diffs: int = Field(default=10, alias="TRACEMALLOC_KEEP_DIFFS")
+    
+    # MongoDB monitoring - commands slower than this are logged with their filter shape (0 disables)
+    mongodb_slow_ms: int = Field(default=100, alias="MONGODB_SLOW_MS")
+    # How often index usage ($indexStats) is reported (0 disables the periodic report)
+    mongodb_index_report_hours: float = Field(default=24, alias="MONGODB_INDEX_REPORT_HOURS")
     
     # Notification time restrictions (available for future features)
     weekday_notification_start_hour: int = Field(default=8, alias="WEEKDAY_NOTIFICATION_START_HOUR")
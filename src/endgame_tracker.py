@@ -0,0 +1,213 @@
+"""
+High-frequency end-game tracking for watched auctions
+"""
+
+import logging
+import threading
+import time
+from typing import Callable, Dict, Optional
+from .config import get_config
+
+logger = logging.getLogger(__name__)
+
+
+class EndgameTracker:
+    """Refresh watched auctions on an accelerating schedule as they near their end
+
+    Only the bid and time left are fetched (SikoScraper.fetch_bid_status),
+    so the final minutes can be polled every few seconds without the cost
+    of a full sync. Bid changes and the final-minutes alert are pushed as
+    soon as they are seen.
+    """
+
+    # (seconds remaining above, refresh interval) - checked in order
+    SCHEDULE = [
+        (2 * 3600, 15 * 60),
+        (30 * 60, 5 * 60),
+        (10 * 60, 60),
+        (3 * 60, 15),
+    ]
+    # Interval when the time left is unknown, or a fetch failed
+    FALLBACK_INTERVAL = 15 * 60
+    RETRY_INTERVAL = 30
+    # How often the set of watched auctions is re-read
+    WATCHLIST_REFRESH_INTERVAL = 30
+
+    def __init__(self, scraper, watchlist_manager, notification_queue, claim_urgent: Callable[[str, Dict], bool]):
+        """
+        Args:
+            scraper: SikoScraper used for bid/time-only fetches
+            watchlist_manager: WatchlistManager providing the watched auction IDs
+            notification_queue: NotificationQueue the alerts are delivered through
+            claim_urgent: Callback returning True if no urgent notification was
+                sent for the auction yet (and recording that one is sent now)
+        """
+        self.config = get_config()
+        self.scraper = scraper
+        self.watchlist_manager = watchlist_manager
+        self.notification_queue = notification_queue
+        self.claim_urgent = claim_urgent
+
+        self._tracked: Dict[str, Dict] = {}
+        self._lock = threading.Lock()  # _tracked is read by get_status from request threads
+        self._last_watchlist_refresh = 0.0
+        self._reload_watchlist = False
+        self._wake = threading.Event()
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        """Start the tracker thread"""
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._loop, daemon=True, name="EndgameTracker")
+        self.thread.start()
+        logger.info("EndgameTracker started")
+
+    def stop(self):
+        """Stop the tracker thread"""
+        self.running = False
+        self._wake.set()
+        if self.thread:
+            self.thread.join(timeout=5)
+        logger.info("EndgameTracker stopped")
+
+    def refresh_watchlist(self):
+        """Pick up watchlist changes right away (called after add/remove)"""
+        # The watchlist's in-memory ID set is only reconciled every minute - reload it
+        self._reload_watchlist = True
+        self._last_watchlist_refresh = 0.0
+        self._wake.set()
+
+    def next_interval(self, seconds_remaining: Optional[int]) -> float:
+        """Seconds until the next check of an auction with the given time left"""
+        if seconds_remaining is None:
+            return self.FALLBACK_INTERVAL
+
+        final_interval = max(1, self.config.endgame_final_interval_seconds)
+        interval = final_interval
+        for threshold, schedule_interval in self.SCHEDULE:
+            if seconds_remaining > threshold:
+                interval = schedule_interval
+                break
+
+        # Never sleep past the urgent threshold
+        until_urgent = seconds_remaining - self.config.urgent_notification_threshold_minutes * 60
+        if until_urgent > 0:
+            interval = min(interval, max(until_urgent, final_interval))
+
+        return interval
+
+    def _refresh_tracked(self):
+        """Sync the tracked auctions with the watchlist"""
+        if self._reload_watchlist:
+            self._reload_watchlist = False
+            self.watchlist_manager.reconcile()
+        watched_ids = self.watchlist_manager.get_watched_auction_ids()
+
+        with self._lock:
+            for auction_id in list(self._tracked):
+                if auction_id not in watched_ids:
+                    self._tracked.pop(auction_id, None)
+            new_ids = watched_ids - set(self._tracked)
+
+        if new_ids:
+            entries = {doc['auction_id']: doc for doc in self.watchlist_manager.get_watchlist() if doc.get('auction_id') in new_ids}
+            with self._lock:
+                for auction_id in new_ids:
+                    entry = entries.get(auction_id, {})
+                    self._tracked[auction_id] = {
+                        'id': auction_id,
+                        'title': entry.get('title') or f"Auction {auction_id}",
+                        'url': entry.get('url') or f"{self.scraper.base_url}/auktion/{auction_id}",
+                        'current_bid': None,
+                        'next_check_at': 0.0,
+                    }
+            logger.debug(f"EndgameTracker now tracking {len(self._tracked)} watched auctions")
+
+        self._last_watchlist_refresh = time.time()
+
+    def _loop(self):
+        """Tracker loop - checks due auctions, then sleeps until the next one is due"""
+        while self.running:
+            try:
+                if time.time() - self._last_watchlist_refresh >= self.WATCHLIST_REFRESH_INTERVAL:
+                    self._refresh_tracked()
+
+                now = time.time()
+                with self._lock:
+                    states = list(self._tracked.values())
+                for state in states:
+                    if not self.running:
+                        break
+                    if state['next_check_at'] <= now:
+                        self._check(state)
+
+                with self._lock:
+                    next_due = min((state['next_check_at'] for state in self._tracked.values()), default=None)
+                sleep_for = self.WATCHLIST_REFRESH_INTERVAL if next_due is None else next_due - time.time()
+                sleep_for = max(0.5, min(sleep_for, self.WATCHLIST_REFRESH_INTERVAL))
+                self._wake.wait(sleep_for)
+                self._wake.clear()
+
+            except Exception as e:
+                logger.error(f"Error in end-game tracker loop: {e}")
+                time.sleep(10)
+
+    def _check(self, state: Dict):
+        """Fetch bid/time for one auction and push alerts"""
+        status = self.scraper.fetch_bid_status(state['url'])
+        if status is None:
+            state['next_check_at'] = time.time() + self.RETRY_INTERVAL
+            return
+
+        auction_id = state['id']
+        if status['ended']:
+            logger.info(f"Watched auction ended: {state['title']} (final bid: {status.get('current_bid') or state.get('current_bid')})")
+            with self._lock:
+                self._tracked.pop(auction_id, None)
+            return
+
+        previous_bid = state.get('current_bid')
+        auction = {**state, **{key: value for key, value in status.items() if value not in (None, '')}}
+        auction['title'] = state['title']
+
+        if previous_bid and status['current_bid'] and status['current_bid'] != previous_bid:
+            logger.info(f"💰 Bid changed on watched auction {state['title']}: {previous_bid} -> {status['current_bid']}")
+            key = self.notification_queue.make_key('bid_change', auction, suffix=status['current_bid'])
+            self.notification_queue.enqueue('bid_change', auction, key=key, previous_bid=previous_bid)
+
+        minutes_remaining = status.get('minutes_remaining')
+        if (minutes_remaining is not None
+                and minutes_remaining <= self.config.urgent_notification_threshold_minutes
+                and self.claim_urgent(auction_id, auction)):
+            if self.notification_queue.enqueue('urgent', auction):
+                logger.info(f"⭐ Watchlist notification queued: {state['title']} ({minutes_remaining} min left)")
+
+        next_check_at = time.time() + self.next_interval(status['seconds_remaining'])
+        with self._lock:
+            state.update({
+                'current_bid': status['current_bid'] or previous_bid,
+                'time_left': status['time_left'],
+                'seconds_remaining': status['seconds_remaining'],
+                'checked_at': status['checked_at'],
+                'next_check_at': next_check_at,
+            })
+
+    def get_status(self) -> Dict:
+        """Get tracker status"""
+        now = time.time()
+        with self._lock:
+            states = [dict(state) for state in self._tracked.values()]
+        return {
+            'running': self.running,
+            'tracked_auctions': len(states),
+            'auctions': [{
+                'id': state['id'],
+                'title': state['title'],
+                'current_bid': state.get('current_bid'),
+                'time_left': state.get('time_left'),
+                'next_check_seconds': max(0, round(state['next_check_at'] - now)),
+            } for state in sorted(states, key=lambda s: s['next_check_at'])]
+        }
@@ -0,0 +1,161 @@
+"""
+Push auction state to Home Assistant as sensor entities
+"""
+
+import logging
+import re
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Set
+from .blacklist_manager import parse_price
+from .config import get_config
+
+logger = logging.getLogger(__name__)
+
+
+def _iso_time(timestamp: Optional[float]) -> Optional[str]:
+    """Local, timezone-aware ISO time (what HA expects for timestamp sensors)"""
+    if not timestamp:
+        return None
+    return datetime.fromtimestamp(timestamp).astimezone().isoformat(timespec='seconds')
+
+
+class HomeAssistantSensorPublisher:
+    """Publish compact auction state through the HA REST API (POST /api/states)
+
+    Entities (with the default 'siko' prefix):
+        sensor.siko_auction_matches     - number of matching auctions, soonest ending in attributes
+        sensor.siko_next_auction_ending - end time of the next auction to end
+        sensor.siko_watch_<auction_id>  - one per watched auction: current bid, end time
+
+    HA dashboards render from these entities, so nothing polls the monitor.
+    """
+
+    # Auctions listed in the matches sensor attributes
+    MAX_LISTED = 10
+
+    def __init__(self, notifier):
+        """
+        Args:
+            notifier: HomeAssistantNotifier - its URL, token and pooled session are reused
+        """
+        self.config = get_config()
+        self.notifier = notifier
+        self.prefix = re.sub(r'[^a-z0-9_]', '_', self.config.ha_sensor_prefix.lower())
+        self._watch_entities: Optional[Set[str]] = None  # Unknown until the first publish
+        self.last_published = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.config.ha_sensors_enabled and bool(self.notifier.ha_token)
+
+    def _entity_id(self, name: str) -> str:
+        return f"sensor.{self.prefix}_{name}"
+
+    def _watch_entity_id(self, auction_id: str) -> str:
+        return self._entity_id(f"watch_{re.sub(r'[^a-z0-9_]', '_', str(auction_id).lower())}")
+
+    def _set_state(self, entity_id: str, state, attributes: Dict) -> bool:
+        """Create or update one entity"""
+        try:
+            response = self.notifier.session.post(
+                f"{self.notifier.ha_url}/api/states/{entity_id}",
+                json={'state': state if state is not None else 'unknown', 'attributes': attributes},
+                timeout=(5, 10),
+                operation='sensor_state'
+            )
+            response.raise_for_status()
+            return True
+        except Exception as e:
+            logger.error(f"Error updating Home Assistant entity {entity_id}: {e}")
+            return False
+
+    def _remove_state(self, entity_id: str):
+        """Remove an entity that is no longer needed"""
+        try:
+            self.notifier.session.delete(f"{self.notifier.ha_url}/api/states/{entity_id}", timeout=(5, 10),
+                                        operation='sensor_remove')
+        except Exception as e:
+            logger.error(f"Error removing Home Assistant entity {entity_id}: {e}")
+
+    def _load_watch_entities(self) -> Set[str]:
+        """Watch entities left in HA from a previous run"""
+        try:
+            response = self.notifier.session.get(f"{self.notifier.ha_url}/api/states", timeout=(5, 30), operation='states')
+            response.raise_for_status()
+            prefix = self._entity_id('watch_')
+            return {state['entity_id'] for state in response.json() if state.get('entity_id', '').startswith(prefix)}
+        except Exception as e:
+            logger.error(f"Error reading Home Assistant states: {e}")
+            return set()
+
+    def publish(self, auctions: List[Dict], watched: List[Dict]) -> bool:
+        """Push the current state after a sync
+
+        Args:
+            auctions: Current matching auctions (after blacklist filtering)
+            watched: Watched auctions - watchlist entries merged with the latest auction data
+        """
+        if not self.enabled:
+            return False
+
+        now = time.time()
+        upcoming = sorted((a for a in auctions if a.get('ends_at') and a['ends_at'] > now), key=lambda a: a['ends_at'])
+
+        ok = self._set_state(self._entity_id('auction_matches'), len(auctions), {
+            'friendly_name': 'Siko auction matches',
+            'icon': 'mdi:gavel',
+            'unit_of_measurement': 'auctions',
+            'ending_soon': [{
+                'title': auction.get('title'),
+                'current_bid': auction.get('current_bid'),
+                'ends_at': _iso_time(auction['ends_at']),
+                'url': auction.get('url'),
+            } for auction in upcoming[:self.MAX_LISTED]],
+            'last_sync': _iso_time(now),
+        })
+
+        next_auction = upcoming[0] if upcoming else {}
+        ok &= self._set_state(self._entity_id('next_auction_ending'), _iso_time(next_auction.get('ends_at')), {
+            'friendly_name': 'Next Siko auction ending',
+            'icon': 'mdi:timer-sand',
+            'device_class': 'timestamp',
+            'title': next_auction.get('title'),
+            'current_bid': next_auction.get('current_bid'),
+            'location': next_auction.get('location'),
+            'url': next_auction.get('url'),
+        })
+
+        if self._watch_entities is None:
+            self._watch_entities = self._load_watch_entities()
+
+        published = set()
+        for auction in watched:
+            entity_id = self._watch_entity_id(auction['auction_id'])
+            published.add(entity_id)
+            ok &= self._set_state(entity_id, parse_price(auction.get('current_bid')), {
+                'friendly_name': auction.get('title') or f"Auction {auction['auction_id']}",
+                'icon': 'mdi:star',
+                'unit_of_measurement': 'kr',
+                'auction_id': auction['auction_id'],
+                'current_bid': auction.get('current_bid'),
+                'end_time': _iso_time(auction.get('ends_at')) or auction.get('end_date'),
+                'time_left': auction.get('time_left'),
+                'url': auction.get('url'),
+            })
+
+        for entity_id in self._watch_entities - published:
+            self._remove_state(entity_id)
+        self._watch_entities = published
+
+        self.last_published = now
+        logger.debug(f"Published {2 + len(published)} Home Assistant entities")
+        return ok
+
+    def get_status(self) -> Dict:
+        """Get publisher status"""
+        return {
+            'enabled': self.enabled,
+            'watch_entities': len(self._watch_entities or ()),
+            'last_published': self.last_published,
+        }
@@ -2,16 +2,31 @@
 Home Assistant integration for sending notifications
 """
 
+import json
 import requests
 import logging
-from typing import Dict, Optional
-from datetime import datetime, time
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+from datetime import datetime, timedelta
 from .config import get_config
+from .metrics import NOTIFICATIONS_SENT, NOTIFICATION_DURATION
+from .http_client import InstrumentedSession
 
 logger = logging.getLogger(__name__)
 
+# Notification kinds a target can subscribe to (digests count as 'match')
+NOTIFICATION_KINDS = ('match', 'urgent', 'bid_change')
+
 class HomeAssistantNotifier:
-    """Send notifications to Home Assistant"""
+    """Send notifications to Home Assistant
+    
+    Notifications go to one or more targets (HA services). Each target lists
+    the notification kinds it receives; without HA_NOTIFICATION_TARGETS the
+    single HA_SERVICE receives everything.
+    """
     
     def __init__(self, ha_url: str = None, ha_token: str = None):
         self.config = get_config()
@@ -27,28 +42,114 @@ class HomeAssistantNotifier:
             'Authorization': f'Bearer {self.ha_token}',
             'Content-Type': 'application/json',
         }
+        
+        self.targets = self._load_targets()
+        self._targets_by_name = {target['name']: target for target in self.targets}
+        self._stats_lock = threading.Lock()
+        self._target_stats = {target['name']: {'sent': 0, 'failed': 0, 'latencies': deque(maxlen=100)}
+                              for target in self.targets}
+        # Shared by all targets so one slow target doesn't hold up the others
+        self._executor = ThreadPoolExecutor(max_workers=max(2, len(self.targets)), thread_name_prefix="HANotify")
+        
+        # One pooled session - connections to Home Assistant are reused across sends and targets
+        pool_size = max(1, self.config.notification_workers, len(self.targets))
+        self.session = InstrumentedSession('home_assistant', pool_size=pool_size)
+        self.session.headers.update(self.headers)
+    
+    def _load_targets(self) -> List[Dict]:
+        """Parse HA_NOTIFICATION_TARGETS (JSON list), falling back to HA_SERVICE
+        
+        Each target: {"service": "notify.mobile_app_x", "name": "...",
+        "kinds": ["match", "urgent", "bid_change"], "data": {...}}.
+        'data' is merged into the service call (e.g. entity_id for TTS).
+        A bare "notify.x" string is a target for every kind; other entries
+        that aren't objects are logged and skipped.
+        """
+        targets = []
+        specs = []
+        if self.config.notification_targets:
+            try:
+                specs = json.loads(self.config.notification_targets)
+            except ValueError as e:
+                logger.error(f"Invalid HA_NOTIFICATION_TARGETS (expected a JSON list): {e}")
+            if not isinstance(specs, list):
+                logger.error(f"Invalid HA_NOTIFICATION_TARGETS: expected a JSON list, got {type(specs).__name__}")
+                specs = []
+        
+        for spec in specs:
+            if isinstance(spec, str):
+                spec = {'service': spec}  # A bare service name
+            if not isinstance(spec, dict):
+                logger.error(f"Invalid notification target {spec!r}: expected an object with a 'service'")
+                continue
+            service = spec.get('service')
+            if not isinstance(service, str) or len(service.split('.')) != 2:
+                logger.error(f"Invalid service format: {service}. Expected 'domain.service'")
+                continue
+            kinds = spec.get('kinds') or NOTIFICATION_KINDS
+            if not isinstance(kinds, (list, tuple)):
+                kinds = [kinds]
+            data = spec.get('data') or {}
+            if not isinstance(data, dict):
+                logger.error(f"Ignoring 'data' of notification target {service}: expected an object")
+                data = {}
+            targets.append({
+                'name': str(spec.get('name') or service),
+                'service': service,
+                'kinds': [kind for kind in kinds if kind in NOTIFICATION_KINDS],
+                'data': data,
+            })
+        
+        if not targets:
+            targets.append({'name': self.ha_service, 'service': self.ha_service, 'kinds': list(NOTIFICATION_KINDS), 'data': {}})
+        return targets
+    
+    def get_targets(self, kind: str) -> List[str]:
+        """Names of the targets that receive a kind of notification"""
+        return [target['name'] for target in self.targets if kind in target['kinds']]
+    
+    def get_target_stats(self) -> List[Dict]:
+        """Per-target delivery counts and latency"""
+        stats = []
+        with self._stats_lock:
+            for target in self.targets:
+                target_stats = self._target_stats[target['name']]
+                latencies = sorted(target_stats['latencies'])
+                stats.append({
+                    'name': target['name'],
+                    'service': target['service'],
+                    'kinds': target['kinds'],
+                    'sent': target_stats['sent'],
+                    'failed': target_stats['failed'],
+                    'avg_latency_ms': round(sum(latencies) / len(latencies) * 1000) if latencies else None,
+                    'p95_latency_ms': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000) if latencies else None,
+                })
+        return stats
+    
+    def _get_allowed_hours(self, day: datetime):
+        """Allowed (start_hour, end_hour) for a day - end hour is inclusive"""
+        if day.weekday() >= 5:  # Saturday = 5, Sunday = 6
+            return self.config.weekend_notification_start_hour, self.config.weekend_notification_end_hour
+        return self.config.weekday_notification_start_hour, self.config.weekday_notification_end_hour
+    
+    def _is_allowed_at(self, moment: datetime) -> bool:
+        """Check if a moment is within the allowed notification hours"""
+        start_hour, end_hour = self._get_allowed_hours(moment)
+        if start_hour <= end_hour:
+            return start_hour <= moment.hour <= end_hour
+        # Window wraps past midnight (e.g. 22-02)
+        return moment.hour >= start_hour or moment.hour <= end_hour
     
     def _is_notification_time_allowed(self) -> bool:
         """Check if current time is within allowed notification hours"""
         try:
             now = datetime.now()
-            current_time = now.time()
-            is_weekend = now.weekday() >= 5  # Saturday = 5, Sunday = 6
-            
-            if is_weekend:
-                # Weekends: 10:00 - 00:00 (midnight)
-                start_time = time(10, 0)  # 10 AM
-                end_time = time(23, 59, 59)  # Just before midnight
-            else:
-                # Weekdays: 08:00 - 00:00 (midnight)
-                start_time = time(8, 0)   # 8 AM
-                end_time = time(23, 59, 59)  # Just before midnight
-            
-            is_allowed = start_time <= current_time <= end_time
+            is_allowed = self._is_allowed_at(now)
             
             if not is_allowed:
-                day_type = "weekend" if is_weekend else "weekday"
-                logger.info(f"Notification blocked - current time {current_time} is outside {day_type} allowed hours ({start_time}-{end_time})")
+                day_type = "weekend" if now.weekday() >= 5 else "weekday"
+                start_hour, end_hour = self._get_allowed_hours(now)
+                logger.info(f"Notification blocked - current time {now.time()} is outside {day_type} allowed hours ({start_hour:02d}:00-{end_hour:02d}:59)")
             
             return is_allowed
             
@@ -56,13 +157,28 @@ class HomeAssistantNotifier:
             logger.error(f"Error checking notification time: {e}")
             return True  # Default to allowing notifications if check fails
     
+    def next_allowed_time(self, now: datetime = None) -> datetime:
+        """Earliest moment (>= now) at which regular notifications are allowed"""
+        now = now or datetime.now()
+        if self._is_allowed_at(now):
+            return now
+        
+        # The window opens at the start hour of today or one of the next days
+        for day_offset in range(8):
+            day = now + timedelta(days=day_offset)
+            start_hour, _ = self._get_allowed_hours(day)
+            opens_at = day.replace(hour=start_hour, minute=0, second=0, microsecond=0)
+            if opens_at > now:
+                return opens_at
+        return now
+    
     def test_connection(self) -> bool:
         """Test connection to Home Assistant"""
         try:
-            response = requests.get(
+            response = self.session.get(
                 f"{self.ha_url}/api/",
-                headers=self.headers,
-                timeout=10
+                timeout=10,
+                operation='test_connection'
             )
             response.raise_for_status()
             
@@ -73,8 +189,8 @@ class HomeAssistantNotifier:
             logger.error(f"Failed to connect to Home Assistant: {e}")
             return False
     
-    def send_notification(self, auction: Dict, urgent: bool = False) -> bool:
-        """Send notification about a matching auction"""
+    def send_notification(self, auction: Dict, urgent: bool = False, target: str = None) -> bool:
+        """Send notification about a matching auction (to one target, or all that want it)"""
         try:
             if not self.ha_token:
                 logger.error("Home Assistant token not configured")
@@ -94,7 +210,8 @@ class HomeAssistantNotifier:
             message = self._format_message(auction, urgent)
             
             # Send notification via Home Assistant service
-            success = self._send_via_service(title, message, auction, urgent)
+            kind = 'urgent' if urgent else 'match'
+            success = self._send_via_service(title, message, auction, urgent, kind=kind, target=target)
             
             if success:
                 notification_type = "urgent" if urgent else "regular"
@@ -108,6 +225,84 @@ class HomeAssistantNotifier:
             logger.error(f"Error sending notification: {e}")
             return False
     
+    def is_urgent_bid_change(self, auction: Dict) -> bool:
+        """Bid changes are urgent (sent during quiet hours too) only inside the urgent threshold"""
+        minutes_remaining = auction.get('minutes_remaining')
+        return minutes_remaining is not None and minutes_remaining <= self.config.urgent_notification_threshold_minutes
+    
+    def send_bid_change_notification(self, auction: Dict, previous_bid: str, target: str = None) -> bool:
+        """Send notification that the bid on a watched auction changed"""
+        try:
+            if not self.ha_token:
+                logger.error("Home Assistant token not configured")
+                return False
+            
+            title = f"💰 New bid: {auction.get('current_bid', '?')} - {auction.get('title', 'Unknown')}"
+            lines = [f"💰 Bid: {previous_bid or '-'} → {auction.get('current_bid', '?')}"]
+            if auction.get('time_left'):
+                lines.append(f"⏰ Time left: {auction['time_left']}")
+            if auction.get('url'):
+                lines.append(f"🔗 View auction: {auction['url']}")
+            
+            # Bid changes in the final minutes are as time-sensitive as urgent alerts
+            urgent = self.is_urgent_bid_change(auction)
+            success = self._send_via_service(title, "\n".join(lines), auction, urgent=urgent, kind='bid_change', target=target)
+            if success:
+                logger.info(f"Bid change notification sent for auction: {auction.get('title', 'Unknown')}")
+            return success
+            
+        except Exception as e:
+            logger.error(f"Error sending bid change notification: {e}")
+            return False
+    
+    def send_digest_notification(self, auctions: List[Dict], target: str = None) -> bool:
+        """Send one grouped notification for several new matching auctions"""
+        try:
+            if not self.ha_token:
+                logger.error("Home Assistant token not configured")
+                return False
+            
+            title = f"🔨 {len(auctions)} new auction matches"
+            message = self._format_digest_message(auctions)
+            
+            # The digest itself links to the auctions page rather than a single auction
+            digest = {
+                'id': f"digest_{int(datetime.now().timestamp())}",
+                'url': f"{self.ha_url.replace(':8123', ':5000')}/auctions",
+            }
+            success = self._send_via_service(title, message, digest, kind='match', target=target)
+            
+            if success:
+                logger.info(f"Digest notification sent for {len(auctions)} auctions")
+            else:
+                logger.error(f"Failed to send digest notification for {len(auctions)} auctions")
+            
+            return success
+            
+        except Exception as e:
+            logger.error(f"Error sending digest notification: {e}")
+            return False
+    
+    def _format_digest_message(self, auctions: List[Dict], max_listed: int = 10) -> str:
+        """Format the digest message: summary per search word, then one line + link per auction"""
+        counts = Counter(auction.get('matched_search_word') or auction.get('found_via') or '?' for auction in auctions)
+        lines = ["🔍 " + ", ".join(f"'{word}' ({count})" for word, count in counts.most_common())]
+        
+        for auction in auctions[:max_listed]:
+            details = [auction.get('title', 'Unknown')]
+            if auction.get('current_bid'):
+                details.append(auction['current_bid'])
+            if auction.get('location'):
+                details.append(auction['location'])
+            lines.append(f"• {' - '.join(details)}")
+            if auction.get('url'):
+                lines.append(f"  {auction['url']}")
+        
+        if len(auctions) > max_listed:
+            lines.append(f"... and {len(auctions) - max_listed} more")
+        
+        return "\n".join(lines)
+    
     def _format_message(self, auction: Dict, urgent: bool = False) -> str:
         """Format the notification message"""
         try:
@@ -170,78 +365,131 @@ class HomeAssistantNotifier:
             logger.error(f"Error formatting message: {e}")
             return f"New auction match found: {auction.get('title', 'Unknown')}"
     
-    def _send_via_service(self, title: str, message: str, auction: Dict, urgent: bool = False) -> bool:
-        """Send notification via Home Assistant service call"""
-        try:
-            # Parse service domain and name
-            service_parts = self.ha_service.split('.')
-            if len(service_parts) != 2:
-                logger.error(f"Invalid service format: {self.ha_service}. Expected 'domain.service'")
+    def _send_via_service(self, title: str, message: str, auction: Dict, urgent: bool = False,
+                          kind: str = 'match', target: str = None) -> bool:
+        """Send notification to one target, or concurrently to every target that receives this kind
+        
+        Returns:
+            True if every target it was sent to accepted it
+        """
+        if target is not None:
+            if target not in self._targets_by_name:
+                logger.error(f"Unknown notification target: {target}")
                 return False
-            
-            domain, service = service_parts
-            
-            # Prepare service call data
+            return self._call_service(self._targets_by_name[target], title, message, auction, urgent)
+        
+        targets = [self._targets_by_name[name] for name in self.get_targets(kind)]
+        if not targets:
+            logger.debug(f"No notification targets for '{kind}' notifications")
+            return True
+        if len(targets) == 1:
+            return self._call_service(targets[0], title, message, auction, urgent)
+        
+        futures = [self._executor.submit(self._call_service, t, title, message, auction, urgent) for t in targets]
+        return all([future.result() for future in futures])
+    
+    def _build_service_data(self, target: Dict, title: str, message: str, auction: Dict, urgent: bool) -> Dict:
+        """Build the service call payload for a target"""
+        domain, service = target['service'].split('.')
+        
+        if domain == 'tts':
+            # Speakers get the short title only
+            service_data = {"message": title}
+        elif domain == 'persistent_notification' or service == 'persistent_notification':
             service_data = {
                 "title": title,
                 "message": message,
+                "notification_id": f"auction_{auction.get('id', 'unknown')}",
+            }
+        else:
+            service_data = {
+                "title": title,
+                "message": message,
+            }
+        
+        # Add additional data for mobile notifications
+        if "mobile_app" in domain or "mobile_app" in service:
+            notification_data = {
+                "url": "homeassistant://navigate/siko-akutioner/0",  # Deep link to HA dashboard in companion app
+                "group": "auction_notifications",
+                "tag": f"auction_{auction.get('id', 'unknown')}",
+                "actions": [
+                    {
+                        "action": "view_auction",
+                        "title": "View Auction",
+                        "url": auction.get('url', '')
+                    },
+                    {
+                        "action": "view_auctions_dashboard",
+                        "title": "Open Auctions Dashboard",
+                        "url": "homeassistant://navigate/siko-akutioner/0"
+                    },
+                    {
+                        "action": "view_web_auctions",
+                        "title": "View Web Auctions",
+                        "url": f"{self.ha_url.replace(':8123', ':5000')}/auctions"
+                    }
+                ]
             }
             
-            # Add additional data for mobile notifications
-            if "mobile_app" in domain or "mobile_app" in service:
-                notification_data = {
-                    "url": "homeassistant://navigate/siko-akutioner/0",  # Deep link to HA dashboard in companion app
-                    "group": "auction_notifications",
-                    "tag": f"auction_{auction.get('id', 'unknown')}",
-                    "actions": [
-                        {
-                            "action": "view_auction",
-                            "title": "View Auction",
-                            "url": auction.get('url', '')
-                        },
-                        {
-                            "action": "view_auctions_dashboard",
-                            "title": "Open Auctions Dashboard",
-                            "url": "homeassistant://navigate/siko-akutioner/0"
-                        },
-                        {
-                            "action": "view_web_auctions",
-                            "title": "View Web Auctions",
-                            "url": f"{self.ha_url.replace(':8123', ':5000')}/auctions"
-                        }
-                    ]
-                }
-                
-                # Set priority based on urgency
-                if urgent:
-                    notification_data["priority"] = "time-sensitive"
-                    notification_data["sound"] = "default"
-                    notification_data["interruption-level"] = "time-sensitive"
-                else:
-                    notification_data["priority"] = "high"
-                
-                service_data["data"] = notification_data
+            # Set priority based on urgency
+            if urgent:
+                notification_data["priority"] = "time-sensitive"
+                notification_data["sound"] = "default"
+                notification_data["interruption-level"] = "time-sensitive"
+            else:
+                notification_data["priority"] = "high"
+            
+            service_data["data"] = notification_data
+        
+        # Target-specific fields (entity_id, media_player_entity_id, ...)
+        service_data.update(target['data'])
+        return service_data
+    
+    def _call_service(self, target: Dict, title: str, message: str, auction: Dict, urgent: bool = False) -> bool:
+        """Send notification via one Home Assistant service call"""
+        started = time.time()
+        success = False
+        try:
+            # Parse service domain and name
+            service_parts = target['service'].split('.')
+            if len(service_parts) != 2:
+                logger.error(f"Invalid service format: {target['service']}. Expected 'domain.service'")
+                return False
+            
+            domain, service = service_parts
+            service_data = self._build_service_data(target, title, message, auction, urgent)
             
             # Make service call
             url = f"{self.ha_url}/api/services/{domain}/{service}"
             
-            response = requests.post(
+            response = self.session.post(
                 url,
                 json=service_data,
-                headers=self.headers,
-                timeout=30
+                timeout=(5, 30),
+                operation='notify'
             )
             
             response.raise_for_status()
-            logger.debug(f"Service call successful: {response.status_code}")
+            logger.debug(f"Service call to {target['name']} successful: {response.status_code}")
+            success = True
             return True
             
         except requests.exceptions.RequestException as e:
-            logger.error(f"HTTP error sending notification: {e}")
+            logger.error(f"HTTP error sending notification to {target['name']}: {e}")
             return False
         except Exception as e:
-            logger.error(f"Error sending via service: {e}")
+            logger.error(f"Error sending via service {target['name']}: {e}")
             return False
+        finally:
+            elapsed = time.time() - started
+            NOTIFICATIONS_SENT.inc(target=target['name'], result='success' if success else 'failure')
+            NOTIFICATION_DURATION.observe(elapsed, target=target['name'])
+            with self._stats_lock:
+                target_stats = self._target_stats.get(target['name'])
+                if target_stats is not None:
+                    target_stats['sent' if success else 'failed'] += 1
+                    target_stats['latencies'].append(elapsed)
     
     def send_test_notification(self) -> bool:
         """Send a test notification"""
@@ -269,10 +517,10 @@ class HomeAssistantNotifier:
     def get_services(self) -> Optional[Dict]:
         """Get available Home Assistant services"""
         try:
-            response = requests.get(
+            response = self.session.get(
                 f"{self.ha_url}/api/services",
-                headers=self.headers,
-                timeout=10
+                timeout=10,
+                operation='services'
             )
             response.raise_for_status()
             
@@ -0,0 +1,299 @@
+"""
+Shared instrumented HTTP client for the scraper, image downloads and Home Assistant
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
+from .config import get_config
+from .metrics import HTTP_REQUESTS, HTTP_DURATION, HTTP_PHASE_DURATION, HTTP_BYTES, HTTP_RETRIES
+
+logger = logging.getLogger(__name__)
+
+# Responses retried (as well as connection errors) when retries are enabled
+RETRY_STATUSES = (502, 503, 504)
+
+# Connection timings of the request running on this thread, and active tallies
+_local = threading.local()
+
+
+def _add_timing(phase: str, seconds: float):
+    timings = getattr(_local, 'timings', None)
+    if timings is not None:
+        timings[phase] += seconds
+
+
+class _TimedHTTPConnection(HTTPConnection):
+    """Records DNS lookup + TCP connect time of new connections"""
+
+    def _new_conn(self):
+        start = time.perf_counter()
+        try:
+            conn = super()._new_conn()
+        finally:
+            _add_timing('connect', time.perf_counter() - start)
+        _add_timing('connections_opened', 1)
+        return conn
+
+
+class _TimedHTTPSConnection(HTTPSConnection):
+    """Records DNS lookup + TCP connect and TLS handshake time of new connections"""
+
+    def _new_conn(self):
+        start = time.perf_counter()
+        try:
+            conn = super()._new_conn()
+        finally:
+            _add_timing('connect', time.perf_counter() - start)
+        _add_timing('connections_opened', 1)
+        return conn
+
+    def connect(self):
+        timings = getattr(_local, 'timings', None)
+        connect_before = timings['connect'] if timings else 0.0
+        start = time.perf_counter()
+        try:
+            super().connect()
+        finally:
+            # connect() = _new_conn() (timed above) + TLS handshake
+            connect_time = (timings['connect'] - connect_before) if timings else 0.0
+            _add_timing('tls', time.perf_counter() - start - connect_time)
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class _TimedAdapter(HTTPAdapter):
+    """Pooled adapter whose connections report their setup time"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {'http': _TimedHTTPConnectionPool, 'https': _TimedHTTPSConnectionPool}
+
+
+class HttpStats:
+    """Aggregated outbound request stats per client, host and operation, plus recent slow requests"""
+
+    KEEP_SLOW = 50
+
+    def __init__(self):
+        self.debug_slow_ms = get_config().http_debug_slow_ms
+        self._lock = threading.Lock()
+        self._stats: Dict[tuple, Dict] = {}
+        self.slow_requests = deque(maxlen=self.KEEP_SLOW)
+
+    def record(self, entry: Dict):
+        key = (entry['client'], entry['host'], entry['operation'])
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = {
+                    'client': entry['client'], 'host': entry['host'], 'operation': entry['operation'],
+                    'requests': 0, 'errors': 0, 'retries': 0, 'bytes': 0, 'connections_opened': 0,
+                    'statuses': {}, 'connect_seconds': 0.0, 'tls_seconds': 0.0, 'ttfb_seconds': 0.0,
+                    'total_seconds': 0.0, 'max_seconds': 0.0,
+                }
+            stats['requests'] += 1
+            stats['errors'] += 0 if entry['ok'] else 1
+            stats['retries'] += entry['retries']
+            stats['bytes'] += entry['bytes']
+            stats['connections_opened'] += entry['connections_opened']
+            stats['statuses'][entry['status']] = stats['statuses'].get(entry['status'], 0) + 1
+            for phase in ('connect', 'tls', 'ttfb', 'total'):
+                stats[f'{phase}_seconds'] += entry[f'{phase}_seconds']
+            stats['max_seconds'] = max(stats['max_seconds'], entry['total_seconds'])
+
+        if self.debug_slow_ms and entry['total_seconds'] * 1000 >= self.debug_slow_ms:
+            self.slow_requests.append(entry)
+            logger.warning(
+                f"Slow {entry['client']} request {entry['method']} {entry['url']} ({entry['operation']}): "
+                f"{entry['total_seconds'] * 1000:.0f} ms total, connect {entry['connect_seconds'] * 1000:.0f} ms, "
+                f"TLS {entry['tls_seconds'] * 1000:.0f} ms, TTFB {entry['ttfb_seconds'] * 1000:.0f} ms, "
+                f"status {entry['status']}, {entry['bytes']} bytes, {entry['retries']} retries"
+            )
+
+    def get_stats(self) -> List[Dict]:
+        """Totals per client/host/operation with average phase timings"""
+        with self._lock:
+            rows = [dict(stats, statuses=dict(stats['statuses'])) for stats in self._stats.values()]
+        for row in rows:
+            count = row['requests'] or 1
+            for phase in ('connect', 'tls', 'ttfb', 'total'):
+                row[f'avg_{phase}_ms'] = round(row.pop(f'{phase}_seconds') / count * 1000, 1)
+            row['max_ms'] = round(row.pop('max_seconds') * 1000, 1)
+        return sorted(rows, key=lambda row: (row['client'], row['host'], row['operation']))
+
+
+HTTP_STATS = HttpStats()
+
+
+class Tally:
+    """Request totals of everything sent from this thread while active
+
+    Tallies nest: a sync run and the search word inside it both count the
+    same requests.
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.bytes = 0
+        self.seconds = 0.0
+        self.by_operation: Dict[str, Dict] = {}
+
+    def add(self, entry: Dict):
+        self.requests += 1
+        self.errors += 0 if entry['ok'] else 1
+        self.retries += entry['retries']
+        self.bytes += entry['bytes']
+        self.seconds += entry['total_seconds']
+        operation = self.by_operation.setdefault(f"{entry['client']}.{entry['operation']}", {
+            'requests': 0, 'errors': 0, 'retries': 0, 'bytes': 0, 'seconds': 0.0,
+        })
+        operation['requests'] += 1
+        operation['errors'] += 0 if entry['ok'] else 1
+        operation['retries'] += entry['retries']
+        operation['bytes'] += entry['bytes']
+        operation['seconds'] += entry['total_seconds']
+
+    def start(self) -> 'Tally':
+        if not hasattr(_local, 'tallies'):
+            _local.tallies = []
+        _local.tallies.append(self)
+        return self
+
+    def stop(self):
+        tallies = getattr(_local, 'tallies', [])
+        if self in tallies:
+            tallies.remove(self)
+
+    def summary(self) -> Dict:
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'retries': self.retries,
+            'bytes': self.bytes,
+            'seconds': round(self.seconds, 3),
+            'by_operation': {name: dict(stats, seconds=round(stats['seconds'], 3))
+                             for name, stats in sorted(self.by_operation.items())},
+        }
+
+
+@contextmanager
+def track():
+    """Tally the requests sent from this thread inside the with-block"""
+    tally = Tally().start()
+    try:
+        yield tally
+    finally:
+        tally.stop()
+
+
+class InstrumentedSession(requests.Session):
+    """requests.Session with connection pooling, optional retries and per-request timing
+
+    Every request records connect (DNS + TCP), TLS, time to first byte and
+    total time, response size, status and retries - into the Prometheus
+    metrics, HTTP_STATS and any active Tally. Pass operation= to name the
+    logical operation (e.g. 'search', 'detail', 'notify').
+    """
+
+    def __init__(self, client: str, pool_size: int = 10, retries: int = 0, backoff_factor: float = 0.5):
+        """
+        Args:
+            client: Name of the client in metrics and stats ('scraper', 'images', 'home_assistant')
+            pool_size: Connections kept open per host
+            retries: Retries on connection errors and 502/503/504 (idempotent methods only)
+        """
+        super().__init__()
+        self.client = client
+        max_retries = Retry(
+            total=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=RETRY_STATUSES,
+            raise_on_status=False,
+        ) if retries else Retry(0, read=False)  # requests default: no retries
+        adapter = _TimedAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=max_retries)
+        self.mount('http://', adapter)
+        self.mount('https://', adapter)
+
+    def request(self, method, url, *args, operation: str = None, **kwargs):
+        timings = {'connect': 0.0, 'tls': 0.0, 'connections_opened': 0}
+        _local.timings = timings
+        start = time.perf_counter()
+        response = None
+        try:
+            response = super().request(method, url, *args, **kwargs)
+            return response
+        finally:
+            total = time.perf_counter() - start
+            _local.timings = None
+            self._record(method, url, operation or method.lower(), response, total, timings, kwargs.get('stream'))
+
+    def _record(self, method: str, url: str, operation: str, response: Optional[requests.Response],
+                total: float, timings: Dict, stream: bool):
+        try:
+            status = str(response.status_code) if response is not None else 'error'
+            if response is None:
+                size = 0
+            elif stream:
+                size = int(response.headers.get('content-length') or 0)
+            else:
+                size = len(response.content or b'')
+            retries = 0
+            if response is not None and getattr(response.raw, 'retries', None) is not None:
+                retries = len(response.raw.retries.history)
+            setup = timings['connect'] + timings['tls']
+            ttfb = max(0.0, response.elapsed.total_seconds() - setup) if response is not None else 0.0
+
+            host = urlparse(url).hostname or ''
+            labels = {'client': self.client, 'operation': operation}
+            HTTP_REQUESTS.inc(host=host, status=status, **labels)
+            HTTP_DURATION.observe(total, **labels)
+            HTTP_BYTES.inc(size, **labels)
+            if retries:
+                HTTP_RETRIES.inc(retries, **labels)
+            if timings['connections_opened']:
+                HTTP_PHASE_DURATION.observe(timings['connect'], client=self.client, phase='connect')
+                if timings['tls']:
+                    HTTP_PHASE_DURATION.observe(timings['tls'], client=self.client, phase='tls')
+            HTTP_PHASE_DURATION.observe(ttfb, client=self.client, phase='ttfb')
+
+            entry = {
+                'at': datetime.now().isoformat(),
+                'client': self.client,
+                'host': host,
+                'operation': operation,
+                'method': method.upper(),
+                'url': url,
+                'status': status,
+                'ok': response is not None and response.ok,
+                'bytes': size,
+                'retries': retries,
+                'connections_opened': timings['connections_opened'],
+                'connect_seconds': timings['connect'],
+                'tls_seconds': timings['tls'],
+                'ttfb_seconds': ttfb,
+                'total_seconds': total,
+            }
+            HTTP_STATS.record(entry)
+            for tally in getattr(_local, 'tallies', ()):
+                tally.add(entry)
+        except Exception as e:
+            logger.debug(f"Error recording HTTP request metrics: {e}")
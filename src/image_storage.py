@@ -7,6 +7,8 @@ import requests
 from typing import Optional, Dict
 from io import BytesIO
 from PIL import Image
+from .config import get_config
+from .http_client import InstrumentedSession
 
 logger = logging.getLogger(__name__)
 
@@ -28,6 +30,8 @@ class ImageStorage:
         from gridfs import GridFS
         db = mongo_client.get_database(db_name)
         self.fs = GridFS(db, collection='images')
+        config = get_config()
+        self.session = InstrumentedSession('images', pool_size=config.http_pool_size, retries=config.http_retries)
         logger.info("ImageStorage initialized with GridFS")
     
     def download_and_store_image(self, image_url: str, auction_id: str, max_size_mb: int = 5) -> Optional[Dict]:
@@ -49,7 +53,7 @@ class ImageStorage:
             
             # Download image
             logger.debug(f"Downloading image: {image_url}")
-            response = requests.get(image_url, timeout=10, stream=True)
+            response = self.session.get(image_url, timeout=10, stream=True, operation='download')
             response.raise_for_status()
             
             # Check content type
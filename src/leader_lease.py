@@ -0,0 +1,174 @@
+"""
+MongoDB lease so only one process runs the background updater
+"""
+
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional
+from pymongo.errors import DuplicateKeyError
+from .mongodb_client import MongoDBClient
+from .config import get_config
+
+logger = logging.getLogger(__name__)
+
+
+class LeaderLease:
+    """Lease on one named role, held by at most one process at a time
+
+    A background thread tries to take the lease (a document in the `leases`
+    collection) while it is free or expired, then renews it every third of
+    the lease period. on_acquired runs when this process becomes the leader
+    and on_lost when it stops being one - after a failed renewal, or on
+    stop(), which also releases the lease so another process can take over
+    at its next attempt. A crashed leader's lease expires, so failover takes
+    at most one lease period.
+
+    Expiry times are written in UTC with each host's clock (local time
+    jumps at DST changes); hosts sharing a lease must keep their clocks in
+    sync (NTP).
+    """
+
+    def __init__(self, name: str, on_acquired: Callable[[], None], on_lost: Callable[[], None],
+                 lease_seconds: int = None):
+        """
+        Args:
+            name: Role the lease is for (document id, e.g. 'auction_updater')
+            on_acquired: Called on the lease thread after taking the lease
+            on_lost: Called on the lease thread (or by stop) after losing it
+            lease_seconds: Lease period (default LEADER_LEASE_SECONDS)
+        """
+        self.config = get_config()
+        self.name = name
+        self.on_acquired = on_acquired
+        self.on_lost = on_lost
+        self.lease_seconds = lease_seconds or self.config.leader_lease_seconds
+        self.heartbeat_seconds = self.lease_seconds / 3
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        mongo_client = MongoDBClient()
+        self.collection = mongo_client.get_collection('leases', self.config.mongodb_database)
+
+        self.is_leader = False
+        self.leader_since: Optional[datetime] = None  # UTC
+        self._expires_at = 0.0  # Local clock - when our lease runs out if not renewed
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self.thread = None
+
+    def start(self):
+        """Start competing for the lease"""
+        if self.thread and self.thread.is_alive():
+            return
+        self._stop.clear()
+        self.thread = threading.Thread(target=self._loop, daemon=True, name=f"LeaderLease-{self.name}")
+        self.thread.start()
+        logger.info(f"Competing for the '{self.name}' lease as {self.owner} ({self.lease_seconds}s lease)")
+
+    def stop(self):
+        """Stop, step down and release the lease"""
+        self._stop.set()
+        if self.thread:
+            self.thread.join(timeout=5)
+        self._step_down("stopping")
+        try:
+            self.collection.delete_one({'_id': self.name, 'owner': self.owner})
+        except Exception as e:
+            logger.error(f"Error releasing the '{self.name}' lease: {e}")
+
+    def _loop(self):
+        while not self._stop.is_set():
+            if self.is_leader:
+                self._renew()
+            else:
+                self._try_acquire()
+            self._stop.wait(self.heartbeat_seconds)
+
+    def _try_acquire(self):
+        now = datetime.utcnow()
+        try:
+            self.collection.update_one(
+                {'_id': self.name, '$or': [{'expires_at': {'$lt': now}}, {'owner': self.owner}]},
+                {'$set': {
+                    'owner': self.owner,
+                    'acquired_at': now,
+                    'renewed_at': now,
+                    'expires_at': now + timedelta(seconds=self.lease_seconds),
+                }},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            return  # Held by another process
+        except Exception as e:
+            logger.error(f"Error acquiring the '{self.name}' lease: {e}")
+            return
+
+        with self._lock:
+            if self._stop.is_set():
+                return
+            self.is_leader = True
+            self.leader_since = now
+            self._expires_at = time.time() + self.lease_seconds
+        logger.info(f"Acquired the '{self.name}' lease - this process is the leader")
+        try:
+            self.on_acquired()
+        except Exception as e:
+            logger.error(f"Error starting as '{self.name}' leader: {e}")
+
+    def _renew(self):
+        now = datetime.utcnow()
+        try:
+            result = self.collection.update_one(
+                {'_id': self.name, 'owner': self.owner},
+                {'$set': {'renewed_at': now, 'expires_at': now + timedelta(seconds=self.lease_seconds)}}
+            )
+            if result.matched_count:
+                self._expires_at = time.time() + self.lease_seconds
+                return
+            self._step_down("lease taken over by another process")
+        except Exception as e:
+            logger.error(f"Error renewing the '{self.name}' lease: {e}")
+            # Step down before another process may take the lease over
+            if time.time() >= self._expires_at - self.heartbeat_seconds:
+                self._step_down("lease could not be renewed")
+
+    def _step_down(self, reason: str):
+        with self._lock:
+            if not self.is_leader:
+                return
+            self.is_leader = False
+            self.leader_since = None
+        logger.warning(f"Gave up the '{self.name}' lease: {reason}")
+        try:
+            self.on_lost()
+        except Exception as e:
+            logger.error(f"Error stopping as '{self.name}' leader: {e}")
+
+    def get_leader(self) -> Optional[Dict]:
+        """Current lease holder as stored in MongoDB, times in UTC (None if free or expired)"""
+        try:
+            doc = self.collection.find_one({'_id': self.name, 'expires_at': {'$gte': datetime.utcnow()}})
+        except Exception as e:
+            logger.error(f"Error reading the '{self.name}' lease: {e}")
+            return None
+        if not doc:
+            return None
+        return {
+            'owner': doc['owner'],
+            'acquired_at': doc['acquired_at'].isoformat(),
+            'renewed_at': doc['renewed_at'].isoformat(),
+            'expires_at': doc['expires_at'].isoformat(),
+        }
+
+    def get_status(self) -> Dict:
+        return {
+            'name': self.name,
+            'owner': self.owner,
+            'is_leader': self.is_leader,
+            'leader_since': self.leader_since.isoformat() if self.leader_since else None,
+            'lease_seconds': self.lease_seconds,
+            'leader': self.get_leader(),
+        }
@@ -0,0 +1,166 @@
+"""
+Retention and indexed queries for the MongoDB logs collection
+"""
+
+import base64
+import json
+import logging
+import re
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from bson import ObjectId
+from pymongo.errors import OperationFailure
+from .mongodb_client import MongoDBClient
+from .config import get_config
+
+logger = logging.getLogger(__name__)
+
+LOG_LEVELS = ('DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL')
+
+# Newest first; _id breaks ties between records with the same timestamp
+SORT_ORDER = [('timestamp', -1), ('_id', -1)]
+
+# Compound indexes matching the /api/logs filters (all sorted newest first)
+LOG_INDEXES = [SORT_ORDER, [('level', 1)] + SORT_ORDER, [('logger', 1)] + SORT_ORDER]
+
+
+def ensure_log_indexes(collection, retention_days: int):
+    """Create the query indexes and apply the retention TTL to the logs collection
+
+    Args:
+        collection: The logs collection
+        retention_days: Days logs are kept (0 keeps them forever)
+    """
+    for keys in LOG_INDEXES:
+        collection.create_index(keys)
+
+    # TTL on the existing single-field timestamp index
+    ensure_ttl_index(collection, 'timestamp', retention_days)
+    logger.debug(f"Log indexes ensured (retention: {retention_days or 'unlimited'} days)")
+
+
+def ensure_ttl_index(collection, field: str, retention_days: int):
+    """Create a single-field index on a datetime field, expiring documents after retention_days
+    
+    An existing index on the field is converted in place (collMod), so the
+    retention can be changed without dropping it. 0 keeps documents forever.
+    """
+    expire_after = retention_days * 24 * 3600 if retention_days > 0 else None
+    try:
+        if expire_after:
+            collection.create_index(field, expireAfterSeconds=expire_after)
+        else:
+            collection.create_index(field)
+    except OperationFailure as e:
+        if e.code not in (85, 86):  # IndexOptionsConflict, IndexKeySpecsConflict
+            raise
+        # The index exists with other options - change its TTL in place
+        collection.database.command('collMod', collection.name, index={
+            'keyPattern': {field: 1},
+            # A very long TTL when retention is turned off (collMod can't remove the option)
+            'expireAfterSeconds': expire_after or 100 * 365 * 24 * 3600,
+        })
+
+
+def encode_cursor(doc: Dict) -> str:
+    """Opaque pagination cursor pointing at a log record"""
+    payload = json.dumps({'t': doc['timestamp'].isoformat(), 'id': str(doc['_id'])})
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, ObjectId]:
+    """Decode a pagination cursor (raises ValueError if malformed)"""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+        return datetime.fromisoformat(payload['t']), ObjectId(payload['id'])
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {e}")
+
+
+class LogStore:
+    """Query the logs written by MongoDBHandler"""
+
+    MAX_LIMIT = 500
+
+    def __init__(self):
+        self.config = get_config()
+        mongo_client = MongoDBClient()
+        self.collection = mongo_client.get_collection('logs', self.config.mongodb_database)
+
+    def ensure_indexes(self):
+        """Apply indexes and retention (safe to call on every start)"""
+        try:
+            ensure_log_indexes(self.collection, self.config.log_retention_days)
+        except Exception as e:
+            logger.error(f"Error ensuring log indexes: {e}")
+
+    def build_filter(self, levels: List[str] = None, logger_name: str = None,
+                     since: datetime = None, until: datetime = None) -> Dict:
+        """Build the MongoDB filter for the query parameters
+
+        Args:
+            levels: Level names to include (e.g. ['WARNING', 'ERROR'])
+            logger_name: Logger name or prefix ('src.scraper' also matches 'src.scraper.x')
+            since: Only records at or after this time
+            until: Only records before this time
+        """
+        query: Dict = {}
+        if levels:
+            query['level'] = {'$in': [level.upper() for level in levels]}
+        if logger_name:
+            # Anchored prefix regex - can use the logger index
+            query['logger'] = {'$regex': f"^{re.escape(logger_name)}(\\.|$)"}
+        if since or until:
+            query['timestamp'] = {}
+            if since:
+                query['timestamp']['$gte'] = since
+            if until:
+                query['timestamp']['$lt'] = until
+        return query
+
+    def query(self, query: Dict, cursor: str = None, limit: int = 100) -> Tuple[List[Dict], Optional[str]]:
+        """Get one page of log records, newest first
+
+        Returns:
+            (records, next_cursor) - next_cursor is None on the last page
+        """
+        limit = max(1, min(limit, self.MAX_LIMIT))
+        if cursor:
+            timestamp, object_id = decode_cursor(cursor)
+            query = {'$and': [query, {'$or': [
+                {'timestamp': {'$lt': timestamp}},
+                {'timestamp': timestamp, '_id': {'$lt': object_id}},
+            ]}]}
+
+        docs = list(self.collection.find(query).sort(SORT_ORDER).limit(limit + 1))
+        next_cursor = encode_cursor(docs[limit - 1]) if len(docs) > limit else None
+        return [self.serialize(doc) for doc in docs[:limit]], next_cursor
+
+    def tail(self, query: Dict, after: Optional[Tuple[datetime, ObjectId]], limit: int = 200) -> List[Dict]:
+        """Get records newer than a position, oldest first (for live tailing)
+
+        Args:
+            after: (timestamp, _id) of the last record already sent, or None for the latest only
+        """
+        if after is None:
+            return []
+        timestamp, object_id = after
+        query = {'$and': [query, {'$or': [
+            {'timestamp': {'$gt': timestamp}},
+            {'timestamp': timestamp, '_id': {'$gt': object_id}},
+        ]}]}
+        return list(self.collection.find(query).sort([('timestamp', 1), ('_id', 1)]).limit(limit))
+
+    def latest_position(self, query: Dict) -> Optional[Tuple[datetime, ObjectId]]:
+        """Position of the newest record matching a filter"""
+        doc = self.collection.find_one(query, {'timestamp': 1}, sort=SORT_ORDER)
+        return (doc['timestamp'], doc['_id']) if doc else (datetime.fromtimestamp(0), ObjectId('0' * 24))
+
+    @staticmethod
+    def serialize(doc: Dict) -> Dict:
+        """JSON-friendly copy of a log record"""
+        doc = dict(doc)
+        doc['id'] = str(doc.pop('_id'))
+        if isinstance(doc.get('timestamp'), datetime):
+            doc['timestamp'] = doc['timestamp'].isoformat()
+        return doc
@@ -0,0 +1,226 @@
+"""
+Memory accounting: process RSS, sizes of in-process structures and tracemalloc diffs
+"""
+
+import copy
+import gc
+import logging
+import sys
+import threading
+import tracemalloc
+from collections import deque
+from datetime import datetime
+from typing import Callable, ContextManager, Dict, List, Optional, Tuple
+from .config import get_config
+
+logger = logging.getLogger(__name__)
+
+# Allocation sites listed per snapshot diff
+TOP_ALLOCATIONS = 25
+
+# Frames that are the diagnostics themselves, not the application
+_IGNORED_FILES = (tracemalloc.__file__, '<frozen importlib._bootstrap>', '<frozen importlib._bootstrap_external>', '<unknown>')
+
+
+def read_rss() -> Dict[str, Optional[int]]:
+    """Current and peak resident set size of this process in bytes"""
+    result = {'rss_bytes': None, 'peak_rss_bytes': None}
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    result['rss_bytes'] = int(line.split()[1]) * 1024
+                elif line.startswith('VmHWM:'):
+                    result['peak_rss_bytes'] = int(line.split()[1]) * 1024
+    except OSError:
+        # Not Linux - peak only (kilobytes on Linux, bytes on macOS)
+        try:
+            import resource
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            result['peak_rss_bytes'] = peak if sys.platform == 'darwin' else peak * 1024
+        except Exception:
+            pass
+    return result
+
+
+def deep_sizeof(obj, max_objects: int = 200000) -> int:
+    """Approximate size of an object and the containers/strings it holds
+
+    Stops after max_objects objects so large structures can't stall a request.
+    """
+    seen = set()
+    stack = [obj]
+    size = 0
+    while stack and len(seen) < max_objects:
+        item = stack.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+        size += sys.getsizeof(item)
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset, deque)):
+            stack.extend(item)
+    return size
+
+
+class MemoryDiagnostics:
+    """Report memory use and attribute growth between syncs
+
+    Components register the in-process structures worth watching. When
+    tracemalloc is on, a snapshot is taken after every sync and diffed with
+    the previous one, so the top growing allocation sites can be read from
+    the recent diffs.
+    """
+
+    def __init__(self):
+        self.config = get_config()
+        self._structures: Dict[str, Tuple[Callable[[], object], Optional[ContextManager]]] = {}
+        self._lock = threading.Lock()
+        self._previous: Optional[tracemalloc.Snapshot] = None
+        self._previous_label: Optional[str] = None
+        self.diffs = deque(maxlen=self.config.tracemalloc_keep_diffs)
+        if self.config.tracemalloc_enabled:
+            self.start_tracing()
+
+    def register(self, name: str, getter: Callable[[], object], lock: ContextManager = None):
+        """Watch a structure (the getter returns it; a re-registered name replaces the old getter)
+
+        Args:
+            lock: Lock its owner holds while changing the structure - the copy
+                that is measured is taken under it
+        """
+        self._structures[name] = (getter, lock)
+
+    @staticmethod
+    def _measure(getter: Callable[[], object], lock: Optional[ContextManager]) -> Dict:
+        # Walk a copy: the owners keep changing their structures on other threads
+        if lock is None:
+            value = copy.copy(getter())
+        else:
+            with lock:
+                value = copy.copy(getter())
+        return {
+            'items': len(value) if hasattr(value, '__len__') else None,
+            'bytes': deep_sizeof(value),
+        }
+
+    def structure_sizes(self) -> Dict[str, Dict]:
+        """Item count and approximate deep size of each registered structure"""
+        sizes = {}
+        for name, (getter, lock) in sorted(self._structures.items()):
+            try:
+                try:
+                    sizes[name] = self._measure(getter, lock)
+                except RuntimeError:
+                    # Nested containers changed size while being walked - once more
+                    sizes[name] = self._measure(getter, lock)
+            except Exception as e:
+                sizes[name] = {'error': str(e)}
+        return sizes
+
+    @property
+    def tracing(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start_tracing(self, frames: int = None):
+        """Start tracemalloc (costs CPU and memory while on) and take the baseline snapshot"""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames or self.config.tracemalloc_frames)
+            logger.info(f"tracemalloc started ({frames or self.config.tracemalloc_frames} frames)")
+        with self._lock:
+            self._previous = self._take_snapshot()
+            self._previous_label = 'start'
+
+    def stop_tracing(self):
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+            logger.info("tracemalloc stopped")
+        with self._lock:
+            self._previous = None
+            self._previous_label = None
+
+    @staticmethod
+    def _take_snapshot() -> tracemalloc.Snapshot:
+        return tracemalloc.take_snapshot().filter_traces(
+            [tracemalloc.Filter(False, filename) for filename in _IGNORED_FILES]
+        )
+
+    def snapshot(self, label: str) -> Optional[Dict]:
+        """Snapshot now and diff with the previous snapshot (no-op unless tracing)
+
+        Args:
+            label: What just happened (e.g. 'sync:scheduled') - shown in the diff
+
+        Returns:
+            The diff, or None when tracemalloc is off
+        """
+        if not tracemalloc.is_tracing():
+            return None
+        try:
+            current = self._take_snapshot()
+            with self._lock:
+                previous, previous_label = self._previous, self._previous_label
+                self._previous, self._previous_label = current, label
+            if previous is None:
+                return None
+
+            stats = current.compare_to(previous, 'lineno')
+            traced, peak = tracemalloc.get_traced_memory()
+            diff = {
+                'label': label,
+                'since': previous_label,
+                'taken_at': datetime.now().isoformat(),
+                'traced_bytes': traced,
+                'traced_peak_bytes': peak,
+                'size_diff_bytes': sum(stat.size_diff for stat in stats),
+                'top_growth': [self._format_stat(stat) for stat in stats[:TOP_ALLOCATIONS]],
+                'rss_bytes': read_rss()['rss_bytes'],
+            }
+            self.diffs.append(diff)
+            logger.debug(f"tracemalloc diff after {label}: {diff['size_diff_bytes'] / 1024:+.0f} KiB")
+            return diff
+        except Exception as e:
+            logger.error(f"Error taking tracemalloc snapshot: {e}")
+            return None
+
+    @staticmethod
+    def _format_stat(stat: tracemalloc.StatisticDiff) -> Dict:
+        frame = stat.traceback[0]
+        return {
+            'site': f"{frame.filename}:{frame.lineno}",
+            'size_bytes': stat.size,
+            'size_diff_bytes': stat.size_diff,
+            'count': stat.count,
+            'count_diff': stat.count_diff,
+        }
+
+    def top_allocations(self, limit: int = TOP_ALLOCATIONS) -> List[Dict]:
+        """Largest live allocation sites right now (tracemalloc must be on)"""
+        if not tracemalloc.is_tracing():
+            return []
+        stats = self._take_snapshot().statistics('lineno')[:limit]
+        return [{
+            'site': f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+            'size_bytes': stat.size,
+            'count': stat.count,
+        } for stat in stats]
+
+    def get_report(self, include_structures: bool = True) -> Dict:
+        report = {
+            **read_rss(),
+            'gc_counts': gc.get_count(),
+            'tracemalloc': {
+                'tracing': self.tracing,
+                'traced_bytes': tracemalloc.get_traced_memory()[0] if self.tracing else None,
+                'diffs': len(self.diffs),
+            },
+        }
+        if include_structures:
+            report['structures'] = self.structure_sizes()
+        return report
+
+
+# Shared by the updater and the web app (same process)
+MEMORY = MemoryDiagnostics()
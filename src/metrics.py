@@ -0,0 +1,264 @@
+"""
+Prometheus-format metrics (counters, gauges, histograms) without extra dependencies
+"""
+
+import logging
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+# Seconds - from fast Mongo queries up to slow page fetches
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names: Iterable[str], values: Iterable) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Metric:
+    """Base class - one value (or histogram) per combination of label values"""
+
+    type_name = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple, object] = {}
+
+    def _key(self, labels: Dict) -> Tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in sorted(items):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Counter(Metric):
+    """Monotonically increasing value"""
+
+    type_name = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    """Value that goes up and down - set directly or read from a callback at scrape time"""
+
+    type_name = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 callback: Callable[[], Union[float, Dict[Tuple, float]]] = None, type_name: str = None):
+        """
+        Args:
+            callback: Returns the value, or {label values tuple: value} for labelled gauges
+            type_name: Reported type (e.g. 'counter' for a running total read from elsewhere)
+        """
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+        if type_name:
+            self.type_name = type_name
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def render(self) -> List[str]:
+        if self.callback:
+            try:
+                value = self.callback()
+            except Exception as e:
+                logger.debug(f"Error reading metric {self.name}: {e}")
+                return []
+            if value is None:
+                return []
+            values = value if isinstance(value, dict) else {(): value}
+            with self._lock:
+                self._values = {tuple(str(v) for v in key): val for key, val in values.items()}
+        return super().render()
+
+
+class Histogram(Metric):
+    """Distribution of observed values in cumulative buckets"""
+
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state['counts'][i] += 1
+                    break
+            state['sum'] += value
+            state['count'] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of a with-block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        with self._lock:
+            items = [(key, dict(state, counts=list(state['counts']))) for key, state in self._values.items()]
+        for key, state in sorted(items):
+            cumulative = 0
+            for bound, count in zip(self.buckets, state['counts']):
+                cumulative += count
+                labels = _format_labels(self.labelnames + ('le',), key + (_format_value(bound),))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(state['sum'])}")
+            lines.append(f"{self.name}_count{labels} {state['count']}")
+        return lines
+
+
+class Registry:
+    """Collection of metrics rendered together in the Prometheus text format"""
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        """Add a metric (an existing metric with the same name is kept and returned)"""
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def replace(self, metric: Metric) -> Metric:
+        """Add a metric, replacing one with the same name (callback gauges of a new app instance)"""
+        with self._lock:
+            self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def counter(name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+    return REGISTRY.register(Counter(name, documentation, labelnames))
+
+
+def histogram(name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+              buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+    return REGISTRY.register(Histogram(name, documentation, labelnames, buckets))
+
+
+def gauge_callback(name: str, documentation: str, callback: Callable, labelnames: Tuple[str, ...] = (),
+                   type_name: str = None) -> Gauge:
+    return REGISTRY.replace(Gauge(name, documentation, labelnames, callback=callback, type_name=type_name))
+
+
+# Outbound HTTP (src/http_client.py)
+HTTP_REQUESTS = counter('siko_http_requests_total', 'Outbound HTTP requests by client, host, operation and status',
+                        ('client', 'host', 'operation', 'status'))
+HTTP_DURATION = histogram('siko_http_request_duration_seconds', 'Outbound HTTP request latency by client and operation',
+                          ('client', 'operation'))
+HTTP_PHASE_DURATION = histogram('siko_http_phase_duration_seconds', 'Connect (DNS + TCP), TLS handshake and time to first byte',
+                                ('client', 'phase'))
+HTTP_BYTES = counter('siko_http_response_bytes_total', 'Outbound HTTP response bytes by client and operation', ('client', 'operation'))
+HTTP_RETRIES = counter('siko_http_retries_total', 'Outbound HTTP retries by client and operation', ('client', 'operation'))
+
+# Scraping
+PARSE_DURATION = histogram('siko_parse_duration_seconds', 'Time to parse a fetched page by page type', ('page',))
+EXTRACTOR_DURATION = histogram('siko_extractor_duration_seconds', 'Time spent in each field extractor', ('extractor',),
+                               buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25))
+
+# Storage
+MONGO_DURATION = histogram('siko_mongodb_command_duration_seconds', 'MongoDB command latency by collection and command',
+                           ('collection', 'command'))
+MONGO_FAILURES = counter('siko_mongodb_command_failures_total', 'Failed MongoDB commands by collection and command',
+                         ('collection', 'command'))
+MONGO_SLOW_OPS = counter('siko_mongodb_slow_commands_total', 'MongoDB commands slower than MONGODB_SLOW_MS by collection and command',
+                         ('collection', 'command'))
+
+# Background sync
+SYNC_PHASE_DURATION = histogram('siko_sync_phase_duration_seconds', 'Duration of each phase of a full sync', ('phase',),
+                                buckets=(0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800))
+SYNC_TASKS = counter('siko_sync_tasks_total', 'Distributed sync tasks run by this process by kind and result', ('kind', 'result'))
+SCRAPE_RATE_LIMIT_WAIT = histogram('siko_scrape_rate_limit_wait_seconds', 'Time a request waited for its slot in the shared rate limit')
+
+# Notifications
+NOTIFICATIONS_SENT = counter('siko_notifications_sent_total', 'Home Assistant service calls by target and result', ('target', 'result'))
+NOTIFICATION_DURATION = histogram('siko_notification_duration_seconds', 'Home Assistant service call latency by target', ('target',))
+
+# Web interface
+WEB_REQUESTS = counter('siko_web_requests_total', 'Web requests by route, method and status', ('route', 'method', 'status'))
+WEB_REQUEST_DURATION = histogram('siko_web_request_duration_seconds', 'Web request latency by route', ('route', 'method'))
+
+
+class PhaseTimer:
+    """Times consecutive phases of a run (into a histogram, if given)"""
+
+    def __init__(self, histogram: Optional[Histogram] = None):
+        self.histogram = histogram
+        self.durations: Dict[str, float] = {}
+        self.started = time.perf_counter()
+        self._phase_start = self.started
+
+    def mark(self, phase: str):
+        """End the current phase (started at the previous mark)"""
+        now = time.perf_counter()
+        duration = now - self._phase_start
+        self.durations[phase] = self.durations.get(phase, 0.0) + duration
+        if self.histogram:
+            self.histogram.observe(duration, phase=phase)
+        self._phase_start = now
+
+    def finish(self) -> float:
+        """Record the total duration and return it"""
+        total = time.perf_counter() - self.started
+        self.durations['total'] = total
+        if self.histogram:
+            self.histogram.observe(total, phase='total')
+        return total
+
@@ -2,6 +2,7 @@
 MongoDB-based auction data caching system
 """
 
+import re
 import time
 import logging
 from typing import Dict, List, Optional
@@ -21,6 +22,8 @@ class MongoDBCache:
         self.collection = self.mongo_client.get_collection('auctions', db_name)
         # Initialize image storage
         self.image_storage = ImageStorage(self.mongo_client, db_name)
+        # Write counts of the most recent cache_auctions/merge_term_auctions call
+        self.last_write_stats: Dict = {}
         # Note: Indexes are created by fix_mongodb.py or initialize_collections()
         logger.debug(f"MongoDBCache initialized (cache duration: {cache_duration_minutes} min)")
     
@@ -32,9 +35,16 @@ class MongoDBCache:
         """Get cached auctions for given search words"""
         try:
             cache_key = self._get_cache_key(search_words)
+            terms = self._normalize_terms(search_words)
             
-            # Find all cached auction documents for this search key
-            cached_entries = list(self.collection.find({'search_key': cache_key}))
+            # Find all cached auction documents for this search key, or any
+            # document attached to one of the terms by an incremental sync
+            cached_entries = list(self.collection.find({
+                '$or': [
+                    {'search_key': cache_key},
+                    {'search_terms': {'$in': terms}}
+                ]
+            }))
             
             if not cached_entries:
                 logger.debug(f"Cache MISS for search words: {search_words}")
@@ -74,59 +84,167 @@ class MongoDBCache:
             logger.error(f"Error retrieving from cache: {e}")
             return None
     
+    def _prepare_auction_doc(self, auction: Dict, cache_key: str, current_time: float) -> Dict:
+        """Build the document stored for one auction (downloads its image if needed)"""
+        cached_auction = auction.copy()
+        
+        # Download and store image if available
+        image_url = auction.get('image_url')
+        auction_id = auction.get('id') or auction.get('auction_id')
+        
+        if image_url and auction_id:
+            # Check if image already exists
+            if not self.image_storage.image_exists(auction_id):
+                image_metadata = self.image_storage.download_and_store_image(image_url, auction_id)
+                if image_metadata:
+                    cached_auction['image_file_id'] = image_metadata['file_id']
+                    cached_auction['image_stored'] = True
+                    logger.debug(f"Stored image for auction {auction_id}")
+            else:
+                cached_auction['image_stored'] = True
+                logger.debug(f"Image already exists for auction {auction_id}")
+        
+        # Search terms that found this auction (used for incremental add/remove)
+        terms = auction.get('search_terms') or ([auction['found_via']] if auction.get('found_via') else [])
+        cached_auction['search_terms'] = self._normalize_terms(terms)
+        
+        # Add cache metadata
+        cached_auction['search_key'] = cache_key
+        cached_auction['timestamp'] = current_time
+        cached_auction['cached_at'] = current_time
+        
+        # Keep time_left and minutes_remaining - they're updated by hourly background sync
+        
+        return cached_auction
+    
     def cache_auctions(self, search_words: List[str], auctions: List[Dict]):
         """Cache auctions for given search words (each auction as separate document)"""
         try:
             cache_key = self._get_cache_key(search_words)
             current_time = time.time()
             
-            # First, delete existing cached entries for this search key
-            self.collection.delete_many({'search_key': cache_key})
+            # First, delete existing cached entries for this search key (and any
+            # entries merged in for these terms since the last full sync)
+            self.last_write_stats = {'deleted': 0, 'inserted': 0, 'images_downloaded': 0}
+            result = self.collection.delete_many({
+                '$or': [
+                    {'search_key': cache_key},
+                    {'search_terms': {'$in': self._normalize_terms(search_words)}}
+                ]
+            })
+            self.last_write_stats['deleted'] = result.deleted_count
             
             # Insert each auction as a separate document
             if auctions:
-                auction_docs = []
-                for auction in auctions:
-                    cached_auction = auction.copy()
-                    
-                    # Download and store image if available
-                    image_url = auction.get('image_url')
-                    auction_id = auction.get('id') or auction.get('auction_id')
-                    
-                    if image_url and auction_id:
-                        # Check if image already exists
-                        if not self.image_storage.image_exists(auction_id):
-                            image_metadata = self.image_storage.download_and_store_image(image_url, auction_id)
-                            if image_metadata:
-                                cached_auction['image_file_id'] = image_metadata['file_id']
-                                cached_auction['image_stored'] = True
-                                logger.debug(f"Stored image for auction {auction_id}")
-                        else:
-                            cached_auction['image_stored'] = True
-                            logger.debug(f"Image already exists for auction {auction_id}")
-                    
-                    # Add cache metadata
-                    cached_auction['search_key'] = cache_key
-                    cached_auction['timestamp'] = current_time
-                    cached_auction['cached_at'] = current_time
-                    
-                    # Keep time_left and minutes_remaining - they're updated by hourly background sync
-                    
-                    auction_docs.append(cached_auction)
+                auction_docs = [self._prepare_auction_doc(auction, cache_key, current_time) for auction in auctions]
+                self.last_write_stats['images_downloaded'] = sum(1 for doc in auction_docs if 'image_file_id' in doc)
                 
                 # Insert all auction documents
-                self.collection.insert_many(auction_docs, ordered=False)
+                result = self.collection.insert_many(auction_docs, ordered=False)
+                self.last_write_stats['inserted'] = len(result.inserted_ids)
                 
                 logger.debug(f"Cached {len(auctions)} auctions (as separate documents) for search words: {search_words}")
         except Exception as e:
             logger.error(f"Error caching auctions: {e}")
     
+    def merge_term_auctions(self, search_word: str, search_words: List[str], auctions: List[Dict]):
+        """Merge auctions found for a single search word into the cache
+        
+        Existing documents keep their other search terms; the word is added to
+        their search_terms. Documents stored under the previous search key are
+        re-keyed to the current word set so they stay visible.
+        """
+        try:
+            term = search_word.lower().strip()
+            cache_key = self._get_cache_key(search_words)
+            current_time = time.time()
+            
+            # Re-key documents from the previous word set to the current one
+            previous_key = self._get_cache_key([w for w in search_words if w.lower().strip() != term])
+            if previous_key != cache_key:
+                self.collection.update_many({'search_key': previous_key}, {'$set': {'search_key': cache_key}})
+            
+            ids = [a.get('id') for a in auctions if a.get('id')]
+            existing_ids = set(doc['id'] for doc in self.collection.find({'id': {'$in': ids}}, {'id': 1}))
+            
+            new_count = 0
+            self.last_write_stats = {'upserted': 0, 'images_downloaded': 0}
+            for auction in auctions:
+                auction_id = auction.get('id')
+                if not auction_id:
+                    continue
+                
+                doc = self._prepare_auction_doc(auction, cache_key, current_time)
+                if 'image_file_id' in doc:
+                    self.last_write_stats['images_downloaded'] += 1
+                doc.pop('search_terms', None)
+                if auction_id in existing_ids:
+                    # Keep the term that originally found it
+                    doc.pop('found_via', None)
+                else:
+                    new_count += 1
+                
+                self.collection.update_one(
+                    {'id': auction_id},
+                    {'$set': doc, '$addToSet': {'search_terms': term}},
+                    upsert=True
+                )
+                self.last_write_stats['upserted'] += 1
+            
+            logger.debug(f"Merged {len(auctions)} auctions for search word '{term}' ({new_count} new)")
+        except Exception as e:
+            logger.error(f"Error merging auctions for '{search_word}': {e}")
+    
+    def detach_search_term(self, search_word: str, search_words: List[str]) -> int:
+        """Detach a removed search word from cached auctions (no scraping)
+        
+        Auctions that were only found via this word are deleted; the rest are
+        re-keyed to the remaining word set.
+        
+        Args:
+            search_word: The removed search word
+            search_words: The remaining search words
+            
+        Returns:
+            Number of auction documents removed
+        """
+        try:
+            term = search_word.lower().strip()
+            cache_key = self._get_cache_key(search_words)
+            old_key = self._get_cache_key(list(search_words) + [term])
+            
+            # Legacy documents stored before search_terms existed
+            self.collection.update_many(
+                {'search_key': old_key, 'search_terms': {'$exists': False}, 'found_via': {'$exists': True}},
+                [{'$set': {'search_terms': [{'$toLower': '$found_via'}]}}]
+            )
+            
+            self.collection.update_many({'search_terms': term}, {'$pull': {'search_terms': term}})
+            result = self.collection.delete_many({'search_terms': {'$size': 0}})
+            
+            # Point found_via at a term that still matches
+            self.collection.update_many(
+                {'found_via': {'$regex': f'^{re.escape(term)}$', '$options': 'i'}},
+                [{'$set': {'found_via': {'$arrayElemAt': ['$search_terms', 0]}}}]
+            )
+            self.collection.update_many({'search_key': old_key}, {'$set': {'search_key': cache_key}})
+            
+            logger.info(f"Detached search word '{term}' from cached auctions ({result.deleted_count} removed)")
+            return result.deleted_count
+        except Exception as e:
+            logger.error(f"Error detaching search word '{search_word}': {e}")
+            return 0
+    
     def _get_cache_key(self, search_words: List[str]) -> str:
         """Generate cache key from search words"""
         # Sort search words to ensure consistent key regardless of order
         sorted_words = sorted([word.lower().strip() for word in search_words])
         return "|".join(sorted_words)
     
+    def _normalize_terms(self, search_words: List[str]) -> List[str]:
+        """Normalize search words the same way SearchManager stores them"""
+        return sorted(set(word.lower().strip() for word in search_words if word and word.strip()))
+    
     def clear_cache(self):
         """Clear all cached data"""
         try:
@@ -8,9 +8,57 @@ import ssl
 from pymongo.mongo_client import MongoClient
 from pymongo.server_api import ServerApi
 from typing import Optional
+from .mongodb_monitor import COMMAND_MONITOR
 
 logger = logging.getLogger(__name__)
 
+# Indexes created by initialize_collections: (collection, description, [(keys, options)])
+# The logs and sync_runs indexes are created by log_store / sync_runs
+COLLECTION_INDEXES = [
+    ('auctions', 'cache - one document per auction', [
+        # auction_id should be unique per auction (if present)
+        ('auction_id', {'unique': True, 'sparse': True}),
+        # search_key is non-unique now (multiple auctions can match same search)
+        ('search_key', {}),
+        ('search_terms', {}),  # Multikey - page loads and sync writes select by search word
+        ('timestamp', {}),
+        ('ends_at', {}),  # Restoring the urgent notification schedule
+        ([('timestamp', 1)], {'expireAfterSeconds': 300}),  # TTL index
+    ]),
+    ('search_words', None, [
+        ('word', {'unique': True}),
+    ]),
+    # Blacklisted auction IDs
+    ('blacklist', "auctions you don't want to see", [
+        ('auction_id', {'unique': True}),
+        ('added_at', {}),
+    ]),
+    # Keyword/regex/location/price rules
+    ('blacklist_rules', 'rule-based blacklist', [
+        ('rule_id', {'unique': True}),
+    ]),
+    # Which auctions we've sent notifications for
+    ('processed_auctions', None, [
+        ('auction_id', {'unique': True}),
+        ('processed_at', {}),
+    ]),
+    # Urgent notifications sent
+    ('urgent_notifications', None, [
+        ('auction_id', {'unique': True}),
+        ('sent_at', {}),
+    ]),
+    # Outbound notifications, _id is the idempotency key
+    ('notification_queue', None, [
+        ([('status', 1), ('next_attempt_at', 1)], {}),
+        ('created_at', {'expireAfterSeconds': 7 * 24 * 3600}),  # TTL index
+    ]),
+    # Auctions user wants to be notified about
+    ('watchlist', 'auctions you want notifications for', [
+        ('auction_id', {'unique': True}),
+        ('added_at', {}),
+    ]),
+]
+
 class MongoDBClient:
     """MongoDB client singleton for managing database connections"""
     
@@ -43,7 +91,8 @@ class MongoDBClient:
                 uri, 
                 server_api=ServerApi('1'),
                 tls=True,
-                tlsAllowInvalidCertificates=True
+                tlsAllowInvalidCertificates=True,
+                event_listeners=[COMMAND_MONITOR]  # Latency metrics and slow-operation log
             )
             
             # Test connection
@@ -94,60 +143,30 @@ class MongoDBClient:
                     else:
                         raise
             
-            # Create auctions collection with indexes
-            auctions_collection = db['auctions']
-            
             # Drop old conflicting indexes if they exist
             try:
-                auctions_collection.drop_index('search_key_1')
+                db['auctions'].drop_index('search_key_1')
                 logger.info("Dropped old search_key_1 unique index")
             except:
                 pass
             
-            # Each auction is now a separate document
-            # auction_id should be unique per auction (if present)
-            safe_create_index(auctions_collection, 'auction_id', unique=True, sparse=True)
-            # search_key is non-unique now (multiple auctions can match same search)
-            safe_create_index(auctions_collection, 'search_key')
-            safe_create_index(auctions_collection, 'timestamp')
-            safe_create_index(auctions_collection, [('timestamp', 1)], expireAfterSeconds=300)  # TTL index
-            logger.info("✓ 'auctions' collection initialized (cache - one document per auction)")
-            
-            # Create search_words collection
-            search_words_collection = db['search_words']
-            safe_create_index(search_words_collection, 'word', unique=True)
-            logger.info("✓ 'search_words' collection initialized")
-            
-            # Create blacklist collection (store blacklisted auction IDs)
-            blacklist_collection = db['blacklist']
-            safe_create_index(blacklist_collection, 'auction_id', unique=True)
-            safe_create_index(blacklist_collection, 'added_at')
-            logger.info("✓ 'blacklist' collection initialized (auctions you don't want to see)")
-            
-            # Create processed_auctions collection (track which auctions we've sent notifications for)
-            processed_collection = db['processed_auctions']
-            safe_create_index(processed_collection, 'auction_id', unique=True)
-            safe_create_index(processed_collection, 'processed_at')
-            logger.info("✓ 'processed_auctions' collection initialized")
-            
-            # Create urgent_notifications collection (track urgent notifications sent)
-            urgent_collection = db['urgent_notifications']
-            safe_create_index(urgent_collection, 'auction_id', unique=True)
-            safe_create_index(urgent_collection, 'sent_at')
-            logger.info("✓ 'urgent_notifications' collection initialized")
-            
-            # Create watchlist collection (auctions user wants to be notified about)
-            watchlist_collection = db['watchlist']
-            safe_create_index(watchlist_collection, 'auction_id', unique=True)
-            safe_create_index(watchlist_collection, 'added_at')
-            logger.info("✓ 'watchlist' collection initialized (auctions you want notifications for)")
+            for collection_name, description, indexes in COLLECTION_INDEXES:
+                for keys, options in indexes:
+                    safe_create_index(db[collection_name], keys, **options)
+                logger.info(f"✓ '{collection_name}' collection initialized{f' ({description})' if description else ''}")
             
             # Create logs collection for application logging
+            from .log_store import ensure_log_indexes
+            from .config import get_config
             logs_collection = db['logs']
-            safe_create_index(logs_collection, 'timestamp')
-            safe_create_index(logs_collection, 'level')
-            safe_create_index(logs_collection, [('timestamp', -1)])  # For efficient recent log queries
-            logger.info("✓ 'logs' collection initialized (application logs)")
+            retention_days = get_config().log_retention_days
+            ensure_log_indexes(logs_collection, retention_days)  # Query indexes + TTL retention
+            logger.info(f"✓ 'logs' collection initialized (application logs, retention: {f'{retention_days} days' if retention_days else 'unlimited'})")
+            
+            # Create sync_runs collection (one report per background sync)
+            from .sync_runs import ensure_sync_run_indexes
+            ensure_sync_run_indexes(db['sync_runs'], get_config().sync_run_retention_days)
+            logger.info("✓ 'sync_runs' collection initialized (sync run reports)")
             
             logger.info(f"\n✓ Successfully initialized all collections in database '{db_name}'")
             
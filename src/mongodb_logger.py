@@ -2,28 +2,65 @@
 MongoDB logging handler for centralized logging
 """
 
+import json
 import logging
+import os
+import sys
+import threading
+import time
+from collections import deque
 from datetime import datetime
-from typing import Optional
+from typing import Dict, List, Optional
+from pymongo.errors import BulkWriteError
 from .mongodb_client import MongoDBClient
 
 
 class MongoDBHandler(logging.Handler):
-    """Custom logging handler that writes logs to MongoDB"""
+    """Custom logging handler that writes logs to MongoDB
     
-    def __init__(self, collection_name: str = 'logs', db_name: str = 'siko_auctions'):
+    emit() only formats the record and appends it to a bounded buffer; a
+    background thread writes the buffer with insert_many when a batch is
+    full or the flush interval passes. When the buffer is full the oldest
+    records are dropped. Batches that can't be written (database
+    unreachable) go to a local JSON-lines file instead.
+    """
+    
+    # After a failed write, wait this long before trying MongoDB again
+    RETRY_INTERVAL = 30.0
+    
+    def __init__(self, collection_name: str = 'logs', db_name: str = 'siko_auctions',
+                 batch_size: int = 100, flush_interval: float = 2.0, max_buffer: int = 10000,
+                 fallback_file: str = 'logs/mongodb_fallback.log'):
         """
         Initialize MongoDB logging handler
         
         Args:
             collection_name: Name of the collection to store logs
             db_name: Name of the database
+            batch_size: Records per insert_many (a full batch is flushed right away)
+            flush_interval: Maximum seconds a record waits in the buffer
+            max_buffer: Buffered records kept before the oldest are dropped
+            fallback_file: File batches are appended to when MongoDB is unreachable
         """
         super().__init__()
         self.collection_name = collection_name
         self.db_name = db_name
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.fallback_file = fallback_file
         self._client: Optional[MongoDBClient] = None
         
+        self._buffer = deque(maxlen=max(self.batch_size, max_buffer))
+        self._condition = threading.Condition()
+        self._write_lock = threading.Lock()  # One writer at a time (flush thread or close)
+        self._retry_at = 0.0
+        self.dropped_count = 0
+        self.written_count = 0
+        self.fallback_count = 0
+        self._closed = False
+        self._thread = threading.Thread(target=self._flush_loop, daemon=True, name="MongoDBLogFlusher")
+        self._thread.start()
+        
     def get_collection(self):
         """Get or create MongoDB collection for logs"""
         if self._client is None:
@@ -32,7 +69,7 @@ class MongoDBHandler(logging.Handler):
     
     def emit(self, record: logging.LogRecord):
         """
-        Emit a log record to MongoDB
+        Buffer a log record for MongoDB (never blocks on the database)
         
         Args:
             record: The log record to emit
@@ -55,28 +92,108 @@ class MongoDBHandler(logging.Handler):
             if record.exc_info:
                 log_entry['exception'] = self.formatter.formatException(record.exc_info) if self.formatter else str(record.exc_info)
             
-            # Insert into MongoDB
-            collection = self.get_collection()
-            collection.insert_one(log_entry)
+            with self._condition:
+                if len(self._buffer) == self._buffer.maxlen:
+                    self.dropped_count += 1  # deque drops the oldest record
+                self._buffer.append(log_entry)
+                if len(self._buffer) >= self.batch_size:
+                    self._condition.notify()
             
+        except Exception:
+            self.handleError(record)
+    
+    def _take_batch(self) -> List[Dict]:
+        """Remove up to batch_size records from the buffer"""
+        with self._condition:
+            return [self._buffer.popleft() for _ in range(min(self.batch_size, len(self._buffer)))]
+    
+    def _flush_loop(self):
+        """Background flusher - writes when a batch is full or the interval passes"""
+        while True:
+            with self._condition:
+                if not self._closed and len(self._buffer) < self.batch_size:
+                    self._condition.wait(self.flush_interval)
+                if self._closed:
+                    return
+            self.flush()
+    
+    def flush(self):
+        """Write all buffered records"""
+        with self._write_lock:
+            while True:
+                batch = self._take_batch()
+                if not batch:
+                    return
+                self._write(batch)
+    
+    def _write(self, batch: List[Dict]):
+        """Write one batch to MongoDB, or to the fallback file if that fails"""
+        # Don't use logging here to avoid recursion
+        if time.time() >= self._retry_at:
+            try:
+                self.get_collection().insert_many(batch, ordered=False)
+                self.written_count += len(batch)
+                return
+            except BulkWriteError as e:
+                # The rest of the batch was stored - only the rejected records go to the file
+                failed = sorted({error['index'] for error in e.details.get('writeErrors', [])})
+                self.written_count += len(batch) - len(failed)
+                print(f"MongoDB rejected {len(failed)} log records, writing them to {self.fallback_file}: {e}", file=sys.stderr)
+                batch = [batch[index] for index in failed]
+                if not batch:
+                    return
+            except Exception as e:
+                self._retry_at = time.time() + self.RETRY_INTERVAL
+                print(f"Failed to log to MongoDB, writing to {self.fallback_file}: {e}", file=sys.stderr)
+        
+        try:
+            os.makedirs(os.path.dirname(self.fallback_file) or '.', exist_ok=True)
+            with open(self.fallback_file, 'a', encoding='utf-8') as f:
+                for entry in batch:
+                    entry.pop('_id', None)  # Set by a failed insert_many
+                    f.write(json.dumps(entry, default=str, ensure_ascii=False) + "\n")
+            self.fallback_count += len(batch)
         except Exception as e:
-            # Fallback to stderr if MongoDB logging fails
-            # Don't use logging here to avoid recursion
-            import sys
-            print(f"Failed to log to MongoDB: {e}", file=sys.stderr)
-            print(f"Original log message: {record.getMessage()}", file=sys.stderr)
+            print(f"Failed to write log fallback file: {e}", file=sys.stderr)
+            for entry in batch:
+                print(f"Original log message: {entry['message']}", file=sys.stderr)
+    
+    def close(self):
+        """Flush remaining records and stop the flusher (called by logging.shutdown)"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._thread.join(timeout=5)
+        self.flush()
+        super().close()
+    
+    def get_stats(self) -> Dict:
+        """Buffer and write counters"""
+        return {
+            'buffered': len(self._buffer),
+            'written': self.written_count,
+            'dropped': self.dropped_count,
+            'fallback': self.fallback_count,
+        }
 
 
-def setup_mongodb_logging(level: str = 'INFO', db_name: str = 'siko_auctions'):
+def setup_mongodb_logging(level: str = 'INFO', db_name: str = 'siko_auctions',
+                          batch_size: int = 100, flush_interval: float = 2.0) -> MongoDBHandler:
     """
     Setup MongoDB logging for the application
     
     Args:
         level: Logging level (DEBUG, INFO, WARNING, ERROR, CRITICAL)
         db_name: MongoDB database name
+        batch_size: Log records written per batch
+        flush_interval: Maximum seconds before buffered records are written
+    
+    Returns:
+        The MongoDB handler (for its stats)
     """
     # Create MongoDB handler
-    mongo_handler = MongoDBHandler(collection_name='logs', db_name=db_name)
+    mongo_handler = MongoDBHandler(collection_name='logs', db_name=db_name,
+                                   batch_size=batch_size, flush_interval=flush_interval)
     
     # Create formatter
     formatter = logging.Formatter(
@@ -100,4 +217,5 @@ def setup_mongodb_logging(level: str = 'INFO', db_name: str = 'siko_auctions'):
     root_logger.addHandler(mongo_handler)
     root_logger.addHandler(console_handler)
     
-    logging.info(f"MongoDB logging initialized (level: {level}, database: {db_name})")
+    logging.info(f"MongoDB logging initialized (level: {level}, database: {db_name}, batch size: {batch_size})")
+    return mongo_handler
@@ -0,0 +1,239 @@
+"""
+MongoDB command monitoring: latency metrics, slow-operation log and index checks
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from pymongo import monitoring
+from .config import get_config
+from .metrics import MONGO_DURATION, MONGO_FAILURES, MONGO_SLOW_OPS
+
+logger = logging.getLogger(__name__)
+
+# Where each command keeps its filter and sort
+_FILTER_FIELDS = {
+    'find': ('filter', 'sort'),
+    'count': ('query', None),
+    'distinct': ('query', None),
+    'findAndModify': ('query', 'sort'),
+}
+
+
+def filter_shape(value):
+    """Query structure with values replaced by their type names
+
+    {'ends_at': {'$gt': 1712345678.9}} -> {'ends_at': {'$gt': 'float'}}
+    Shapes group slow queries that differ only in their values.
+    """
+    if isinstance(value, dict):
+        return {key: filter_shape(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        # Operator lists ($or, $and) keep their clauses; value lists ($in) collapse to one type
+        if value and all(isinstance(item, dict) for item in value):
+            return [filter_shape(item) for item in value]
+        return f"[{type(value[0]).__name__}]" if value else '[]'
+    return type(value).__name__
+
+
+def command_filter(command_name: str, command) -> Tuple[Optional[Dict], Optional[Dict]]:
+    """Filter and sort of a command, if it has one"""
+    if command_name in _FILTER_FIELDS:
+        filter_field, sort_field = _FILTER_FIELDS[command_name]
+        return command.get(filter_field), command.get(sort_field) if sort_field else None
+    if command_name in ('delete', 'update'):
+        statements = command.get('deletes' if command_name == 'delete' else 'updates') or []
+        return (statements[0].get('q') if statements else None), None
+    if command_name == 'aggregate':
+        stages = command.get('pipeline') or []
+        match = next((stage['$match'] for stage in stages if '$match' in stage), None)
+        sort = next((stage['$sort'] for stage in stages if '$sort' in stage), None)
+        return match, sort
+    return None, None
+
+
+class CommandMonitor(monitoring.CommandListener):
+    """pymongo command listener installed by MongoDBClient
+
+    Records latency per collection and command for /metrics, and keeps
+    operations slower than MONGODB_SLOW_MS together with their filter shape.
+    """
+
+    # Handshake/session commands - not tied to a collection
+    IGNORED_COMMANDS = {'hello', 'ismaster', 'isMaster', 'ping', 'endSessions', 'saslStart', 'saslContinue',
+                        'buildInfo', 'getLastError', 'killCursors'}
+
+    # Slow operations kept for /api/diagnostics/mongodb
+    KEEP_SLOW_OPS = 100
+
+    def __init__(self):
+        config = get_config()
+        self.slow_ms = config.mongodb_slow_ms
+        self._pending: Dict[Tuple[int, object], Tuple[str, object]] = {}
+        self._lock = threading.Lock()
+        self.slow_ops = deque(maxlen=self.KEEP_SLOW_OPS)
+        self._slow_summary: Dict[Tuple[str, str, str], Dict] = {}
+
+    def started(self, event):
+        if event.command_name in self.IGNORED_COMMANDS:
+            return
+        target = event.command.get(event.command_name)
+        if event.command_name == 'getMore':
+            target = event.command.get('collection')
+        collection = target if isinstance(target, str) else event.database_name
+        # The command is only inspected if the operation turns out to be slow
+        self._pending[(event.request_id, event.connection_id)] = (collection, event.command)
+
+    def succeeded(self, event):
+        self._finish(event, failed=False)
+
+    def failed(self, event):
+        self._finish(event, failed=True)
+
+    def _finish(self, event, failed: bool):
+        pending = self._pending.pop((event.request_id, event.connection_id), None)
+        if pending is None:
+            return
+        collection, command = pending
+        seconds = event.duration_micros / 1e6
+        MONGO_DURATION.observe(seconds, collection=collection, command=event.command_name)
+        if failed:
+            MONGO_FAILURES.inc(collection=collection, command=event.command_name)
+        if self.slow_ms and seconds * 1000 >= self.slow_ms:
+            self._record_slow(collection, event.command_name, command, seconds)
+
+    def _record_slow(self, collection: str, command_name: str, command, seconds: float):
+        query, sort = command_filter(command_name, command)
+        shape = filter_shape(query) if query is not None else None
+        duration_ms = round(seconds * 1000, 1)
+        MONGO_SLOW_OPS.inc(collection=collection, command=command_name)
+
+        key = (collection, command_name, repr(shape))
+        with self._lock:
+            self.slow_ops.append({
+                'at': datetime.now().isoformat(),
+                'collection': collection,
+                'command': command_name,
+                'duration_ms': duration_ms,
+                'filter_shape': shape,
+                'sort': sort,
+            })
+            summary = self._slow_summary.setdefault(key, {
+                'collection': collection, 'command': command_name, 'filter_shape': shape,
+                'count': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+            })
+            summary['count'] += 1
+            summary['total_ms'] += duration_ms
+            summary['max_ms'] = max(summary['max_ms'], duration_ms)
+
+        # Log writes are excluded - logging them would write another log record
+        if collection != 'logs':
+            logger.warning(f"Slow MongoDB {command_name} on '{collection}' ({duration_ms:.0f} ms): filter {shape}, sort {sort}")
+
+    def get_slow_ops(self) -> Dict:
+        """Recent slow operations and totals per collection, command and filter shape"""
+        with self._lock:
+            recent = list(self.slow_ops)
+            summary = [dict(item, total_ms=round(item['total_ms'], 1)) for item in self._slow_summary.values()]
+        summary.sort(key=lambda item: item['total_ms'], reverse=True)
+        return {'threshold_ms': self.slow_ms, 'by_shape': summary, 'recent': list(reversed(recent))}
+
+
+# Installed on the client by MongoDBClient
+COMMAND_MONITOR = CommandMonitor()
+
+
+def _normalize_keys(keys) -> Tuple:
+    if isinstance(keys, str):
+        return ((keys, 1),)
+    return tuple((field, int(direction)) for field, direction in keys)
+
+
+def expected_indexes() -> Dict[str, List[Tuple]]:
+    """Key patterns of every index initialize_collections creates, per collection"""
+    from .mongodb_client import COLLECTION_INDEXES
+    from .log_store import LOG_INDEXES
+    from .sync_runs import SYNC_RUN_INDEXES
+    from .updater_control import UPDATER_COMMAND_INDEXES
+    from .sync_tasks import SYNC_TASK_INDEXES
+
+    expected = {name: [_normalize_keys(keys) for keys, options in indexes] for name, description, indexes in COLLECTION_INDEXES}
+    expected['logs'] = [_normalize_keys(keys) for keys in LOG_INDEXES] + [_normalize_keys('timestamp')]
+    expected['sync_runs'] = [_normalize_keys(keys) for keys in SYNC_RUN_INDEXES] + [_normalize_keys('started_at')]
+    expected['updater_commands'] = [_normalize_keys(keys) for keys in UPDATER_COMMAND_INDEXES] + [_normalize_keys('created_at')]
+    expected['sync_tasks'] = [_normalize_keys(keys) for keys in SYNC_TASK_INDEXES] + [_normalize_keys('created_at')]
+    return expected
+
+
+def check_indexes(db, warn: bool = True) -> Dict[str, List[Tuple]]:
+    """Warn about indexes from initialize_collections that are missing in the database
+    
+    Args:
+        warn: Log a warning per collection with missing indexes (startup check)
+
+    Returns:
+        {collection: [missing key patterns]} (empty if all are present)
+    """
+    missing = {}
+    for collection_name, key_patterns in expected_indexes().items():
+        try:
+            existing = {_normalize_keys(info['key']) for info in db[collection_name].index_information().values()}
+        except Exception as e:
+            logger.error(f"Error reading indexes of '{collection_name}': {e}")
+            continue
+        absent = [keys for keys in dict.fromkeys(key_patterns) if keys not in existing]
+        if absent:
+            missing[collection_name] = absent
+            if warn:
+                logger.warning(f"Missing indexes on '{collection_name}': {[dict(keys) for keys in absent]} - run init_mongodb.py")
+    if warn and not missing:
+        logger.info("✓ All expected MongoDB indexes are present")
+    return missing
+
+
+class IndexUsageReporter:
+    """Periodic $indexStats report - how often each index was used since the server started"""
+
+    def __init__(self, db):
+        self.db = db
+        self.interval = get_config().mongodb_index_report_hours * 3600
+        self.last_report: Optional[Dict] = None
+        self._last_run = 0.0
+
+    def maybe_report(self):
+        """Report if the interval has passed (called after each sync)"""
+        if self.interval and time.time() - self._last_run >= self.interval:
+            self.report()
+
+    def report(self) -> Dict:
+        self._last_run = time.time()
+        collections = {}
+        unused = []
+        for collection_name in expected_indexes():
+            try:
+                stats = list(self.db[collection_name].aggregate([{'$indexStats': {}}]))
+            except Exception as e:
+                logger.error(f"Error reading index stats of '{collection_name}': {e}")
+                collections[collection_name] = {'error': str(e)}
+                continue
+            indexes = []
+            for stat in stats:
+                ops = stat.get('accesses', {}).get('ops', 0)
+                since = stat.get('accesses', {}).get('since')
+                indexes.append({
+                    'name': stat.get('name'),
+                    'key': dict(stat.get('key', {})),
+                    'ops': ops,
+                    'since': since.isoformat() if isinstance(since, datetime) else since,
+                })
+                if ops == 0 and stat.get('name') != '_id_':
+                    unused.append(f"{collection_name}.{stat.get('name')}")
+            collections[collection_name] = sorted(indexes, key=lambda index: index['ops'], reverse=True)
+
+        self.last_report = {'generated_at': datetime.now().isoformat(), 'collections': collections, 'unused': unused}
+        if unused:
+            logger.info(f"MongoDB index usage: {len(unused)} unused indexes: {', '.join(unused)}")
+        return self.last_report
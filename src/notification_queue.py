@@ -0,0 +1,429 @@
+"""
+Persistent outbound notification queue - delivered by a small worker pool
+"""
+
+import logging
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime
+from typing import Dict, List, Optional
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from .mongodb_client import MongoDBClient
+from .home_assistant import NOTIFICATION_KINDS
+from .config import get_config
+
+logger = logging.getLogger(__name__)
+
+# Entry states
+PENDING = 'pending'
+SENDING = 'sending'
+SENT = 'sent'
+FAILED = 'failed'
+
+
+class NotificationQueue:
+    """Durable notification queue stored in the 'notification_queue' collection
+
+    Callers enqueue and return immediately; worker threads deliver through
+    the notifier, retrying failures with exponential backoff. Each entry's
+    _id is its idempotency key, so an alert that is enqueued twice (two
+    threads, a restart, the sync-time fallback) is only delivered once.
+
+    A notification becomes one entry per notifier target that receives its
+    kind, so targets are retried independently and a failing target never
+    causes a duplicate on the others. A target may occupy at most half of
+    the workers, so one slow target doesn't hold up the rest.
+
+    In digest mode new-match notifications are held for a short window and
+    sent as one grouped notification; urgent and bid alerts are never held.
+
+    If MongoDB can't be reached, urgent alerts are sent from the calling
+    thread; everything else is kept in memory and queued by the workers
+    once MongoDB is back, so quiet hours and digests still apply.
+    """
+
+    POLL_INTERVAL = 5.0
+    # Backoff: BASE * 2^(attempt - 1), capped
+    RETRY_BASE_SECONDS = 5
+    RETRY_MAX_SECONDS = 15 * 60
+    # Recent delivery latencies kept for the metrics
+    LATENCY_SAMPLES = 200
+    # Entries kept in memory while MongoDB is unreachable (the oldest are dropped beyond this)
+    MAX_UNQUEUED = 1000
+
+    def __init__(self, notifier, workers: int = None):
+        """
+        Args:
+            notifier: HomeAssistantNotifier that performs the actual delivery
+            workers: Number of delivery threads (defaults to NOTIFICATION_WORKERS)
+        """
+        self.config = get_config()
+        self.notifier = notifier
+        self.worker_count = max(1, workers or self.config.notification_workers)
+        self.max_attempts = max(1, self.config.notification_max_attempts)
+        self.digest_enabled = self.config.notification_digest_enabled
+        self.digest_window = max(0, self.config.notification_digest_window_seconds)
+        self.digest_max_items = max(2, self.config.notification_digest_max_items)
+
+        mongo_client = MongoDBClient()
+        self.collection = mongo_client.get_collection('notification_queue', self.config.mongodb_database)
+
+        self._condition = threading.Condition()
+        self._stats_lock = threading.Lock()
+        self._latencies = deque(maxlen=self.LATENCY_SAMPLES)
+        self.delivered_count = 0
+        self.retried_count = 0
+        self.failed_count = 0
+        self.duplicate_count = 0
+        self.digest_count = 0
+        self.running = False
+        self.threads: List[threading.Thread] = []
+        self._in_flight = Counter()
+        self.per_target_limit = max(1, self.worker_count // 2)
+        self._unqueued = deque(maxlen=self.MAX_UNQUEUED)
+        self._unqueued_lock = threading.Lock()
+
+    @staticmethod
+    def make_key(kind: str, auction: Dict, suffix: str = None) -> str:
+        """Default idempotency key: one notification of each kind per auction"""
+        key = f"{kind}:{auction.get('id', auction.get('url', ''))}"
+        return f"{key}:{suffix}" if suffix else key
+
+    def enqueue(self, kind: str, auction: Dict, key: str = None, **extra) -> bool:
+        """Queue a notification for delivery
+
+        Args:
+            kind: 'match', 'urgent' or 'bid_change'
+            auction: Auction data used to build the message
+            key: Idempotency key (defaults to kind:auction_id)
+            **extra: Extra delivery arguments (e.g. previous_bid)
+
+        Returns:
+            True if queued (or, with MongoDB unavailable, sent directly or held
+            in memory), False if the key was already queued/delivered or no
+            target receives this kind
+        """
+        if kind not in NOTIFICATION_KINDS:
+            raise ValueError(f"Unknown notification kind: {kind}")
+
+        held = kind == 'match' and self.digest_enabled
+        key = key or self.make_key(kind, auction)
+        entries = [self._make_entry(kind, auction, target, key, hold=held, **extra)
+                   for target in self.notifier.get_targets(kind)]
+        if not entries:
+            return False
+
+        try:
+            queued = self._insert(entries)
+        except Exception as e:
+            if not self._waits_for_allowed_hours(kind, auction):
+                # Urgent alerts can't wait for MongoDB - deliver them from this thread
+                logger.error(f"Error queueing notification {key}, sending directly: {e}")
+                entries = [entry for entry in entries if not self._deliver([entry])]
+                if not entries:
+                    return True
+            else:
+                logger.error(f"Error queueing notification {key}, holding it until MongoDB is reachable: {e}")
+            with self._unqueued_lock:
+                self._unqueued.extend(entries)
+            return True
+
+        if not queued:
+            logger.debug(f"Notification {key} already queued, skipping")
+            return False
+
+        if held:
+            self._release_full_digest()
+        with self._condition:
+            self._condition.notify_all()
+        return True
+
+    def enqueue_many(self, kind: str, auctions: List[Dict]) -> int:
+        """Queue several notifications at once, due immediately (no digest window)
+
+        Used to release a backlog in one go; in digest mode the workers still
+        group the matches into digests of up to NOTIFICATION_DIGEST_MAX_ITEMS.
+
+        Returns:
+            Number of notifications queued (already known keys are skipped)
+        """
+        if kind not in NOTIFICATION_KINDS:
+            raise ValueError(f"Unknown notification kind: {kind}")
+
+        targets = self.notifier.get_targets(kind)
+        entries = [self._make_entry(kind, auction, target) for auction in auctions for target in targets]
+        if not entries:
+            return 0
+
+        try:
+            queued = self._insert(entries)
+        except Exception as e:
+            logger.error(f"Error queueing {len(entries)} notifications: {e}")
+            return 0
+
+        with self._condition:
+            self._condition.notify_all()
+        return queued
+
+    def _requeue_unqueued(self):
+        """Queue the entries held in memory while MongoDB was unreachable"""
+        with self._unqueued_lock:
+            if not self._unqueued:
+                return
+            entries = list(self._unqueued)
+            self._unqueued.clear()
+        try:
+            queued = self._insert(entries)
+        except Exception as e:
+            logger.debug(f"MongoDB still unreachable, keeping {len(entries)} notifications in memory: {e}")
+            with self._unqueued_lock:
+                self._unqueued.extendleft(reversed(entries))
+            return
+        logger.info(f"Queued {queued} notifications held in memory while MongoDB was unreachable")
+
+    def _insert(self, entries: List[Dict]) -> int:
+        """Insert entries, skipping keys that already exist - returns the number inserted"""
+        try:
+            if len(entries) == 1:
+                self.collection.insert_one(entries[0])
+                return 1
+            return len(self.collection.insert_many(entries, ordered=False).inserted_ids)
+        except DuplicateKeyError:
+            queued = 0
+        except BulkWriteError as e:
+            queued = e.details.get('nInserted', 0)
+        with self._stats_lock:
+            self.duplicate_count += len(entries) - queued
+        return queued
+
+    def _make_entry(self, kind: str, auction: Dict, target: str, key: str = None, hold: bool = False, **extra) -> Dict:
+        """Build a queue entry for one target"""
+        now = time.time()
+        key = key or self.make_key(kind, auction)
+        return {
+            '_id': f"{key}@{target}",
+            'key': key,
+            'target': target,
+            'kind': kind,
+            'auction': {k: v for k, v in auction.items() if k not in ('_id', 'images')},
+            'extra': extra,
+            'status': PENDING,
+            'attempts': 0,
+            'enqueued_at': now,
+            # New matches wait for the digest window to collect more
+            'next_attempt_at': now + self.digest_window if hold else now,
+            'created_at': datetime.utcnow(),  # TTL - keys are remembered for a week
+        }
+
+    def _release_full_digest(self):
+        """Make held matches due right away once a full digest has collected"""
+        try:
+            held = {'kind': 'match', 'status': PENDING, 'next_attempt_at': {'$gt': time.time()}}
+            # Every match target holds the same matches, so counting one target is enough
+            count_query = {**held, 'target': self.notifier.get_targets('match')[0]}
+            if self.collection.count_documents(count_query, limit=self.digest_max_items) >= self.digest_max_items:
+                self.collection.update_many(held, {'$set': {'next_attempt_at': time.time()}})
+        except Exception as e:
+            logger.error(f"Error checking notification digest size: {e}")
+
+    def start(self):
+        """Start the delivery workers"""
+        if self.running:
+            return
+        self._recover_interrupted()
+        self.running = True
+        self.threads = []
+        for index in range(self.worker_count):
+            thread = threading.Thread(target=self._worker_loop, daemon=True, name=f"NotificationWorker-{index + 1}")
+            thread.start()
+            self.threads.append(thread)
+        logger.info(f"NotificationQueue started ({self.worker_count} workers)")
+
+    def stop(self):
+        """Stop the delivery workers (entries still pending are delivered after restart)"""
+        with self._condition:
+            self.running = False
+            self._condition.notify_all()
+        for thread in self.threads:
+            thread.join(timeout=5)
+        self._requeue_unqueued()
+        if self._unqueued:
+            logger.error(f"NotificationQueue stopped with {len(self._unqueued)} notifications that could not be queued")
+        logger.info("NotificationQueue stopped")
+
+    def _recover_interrupted(self):
+        """Fail entries a previous process was delivering when it stopped
+
+        Whether such a notification reached Home Assistant is unknown, so it
+        is not resent (at most once delivery).
+        """
+        try:
+            result = self.collection.update_many(
+                {'status': SENDING},
+                {'$set': {'status': FAILED, 'last_error': 'Interrupted during delivery'}}
+            )
+            if result.modified_count:
+                logger.warning(f"Marked {result.modified_count} interrupted notifications as failed")
+        except Exception as e:
+            logger.error(f"Error recovering notification queue: {e}")
+
+    def _claim(self, query: Dict) -> Optional[Dict]:
+        """Atomically claim the first pending entry matching a query"""
+        return self.collection.find_one_and_update(
+            {**query, 'status': PENDING},
+            {'$set': {'status': SENDING, 'claimed_at': time.time()}, '$inc': {'attempts': 1}},
+            sort=[('next_attempt_at', 1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    def _claim_next(self) -> Optional[List[Dict]]:
+        """Claim the next due entry - plus the target's other held matches when it starts a digest"""
+        query = {'next_attempt_at': {'$lte': time.time()}}
+        with self._stats_lock:
+            busy = [target for target, count in self._in_flight.items() if count >= self.per_target_limit]
+        if busy:
+            query['target'] = {'$nin': busy}
+
+        entry = self._claim(query)
+        if entry is None:
+            return None
+
+        entries = [entry]
+        if entry['kind'] == 'match' and self.digest_enabled:
+            while len(entries) < self.digest_max_items:
+                more = self._claim({'kind': 'match', 'target': entry.get('target')})
+                if more is None:
+                    break
+                entries.append(more)
+        return entries
+
+    def _worker_loop(self):
+        """Worker loop - deliver due entries, sleep when there are none"""
+        while self.running:
+            self._requeue_unqueued()
+            try:
+                entries = self._claim_next()
+            except Exception as e:
+                logger.error(f"Error claiming notification: {e}")
+                entries = None
+
+            if not entries:
+                with self._condition:
+                    if self.running:
+                        self._condition.wait(self.POLL_INTERVAL)
+                continue
+
+            target = entries[0].get('target')
+            with self._stats_lock:
+                self._in_flight[target] += 1
+            try:
+                self._process(entries)
+            finally:
+                with self._stats_lock:
+                    self._in_flight[target] -= 1
+
+    def _process(self, entries: List[Dict]):
+        """Deliver claimed entries (one notification) and record the outcome"""
+        keys = [entry['_id'] for entry in entries]
+        now = time.time()
+
+        # Held entries don't use up attempts
+        if (self._waits_for_allowed_hours(entries[0]['kind'], entries[0]['auction'])
+                and not self.notifier._is_notification_time_allowed()):
+            allowed_at = max(now, self.notifier.next_allowed_time().timestamp())
+            self._update(keys, {'status': PENDING, 'next_attempt_at': allowed_at}, {'attempts': -1})
+            return
+
+        if self._deliver(entries):
+            sent_at = time.time()
+            self._update(keys, {'status': SENT, 'sent_at': sent_at})
+            with self._stats_lock:
+                self.delivered_count += len(entries)
+                if len(entries) > 1:
+                    self.digest_count += 1
+                self._latencies.extend(sent_at - entry['enqueued_at'] for entry in entries)
+            return
+
+        attempts = max(entry['attempts'] for entry in entries)
+        if attempts >= self.max_attempts:
+            self._update(keys, {'status': FAILED, 'last_error': 'Delivery failed', 'failed_at': time.time()})
+            with self._stats_lock:
+                self.failed_count += len(entries)
+            logger.error(f"Giving up on notification {keys[0]} ({len(keys)} items) after {attempts} attempts")
+            return
+
+        delay = min(self.RETRY_BASE_SECONDS * 2 ** (attempts - 1), self.RETRY_MAX_SECONDS)
+        self._update(keys, {'status': PENDING, 'next_attempt_at': time.time() + delay, 'last_error': 'Delivery failed'})
+        with self._stats_lock:
+            self.retried_count += len(entries)
+        logger.warning(f"Notification {keys[0]} ({len(keys)} items) failed (attempt {attempts}/{self.max_attempts}), retrying in {delay}s")
+
+    def _waits_for_allowed_hours(self, kind: str, auction: Dict) -> bool:
+        """Regular notifications (and bid changes well before the end) wait for allowed hours"""
+        return kind == 'match' or (kind == 'bid_change' and not self.notifier.is_urgent_bid_change(auction))
+
+    def _update(self, keys: List[str], fields: Dict, increments: Dict = None):
+        """Update the state of entries"""
+        update = {'$set': fields}
+        if increments:
+            update['$inc'] = increments
+        try:
+            self.collection.update_many({'_id': {'$in': keys}}, update)
+        except Exception as e:
+            logger.error(f"Error updating notifications {keys}: {e}")
+
+    def _deliver(self, entries: List[Dict]) -> bool:
+        """Send entries through the notifier - several matches go out as one digest"""
+        entry = entries[0]
+        target = entry.get('target')
+        try:
+            if len(entries) > 1:
+                return self.notifier.send_digest_notification([e['auction'] for e in entries], target=target)
+            if entry['kind'] == 'bid_change':
+                return self.notifier.send_bid_change_notification(entry['auction'], entry['extra'].get('previous_bid'), target=target)
+            return self.notifier.send_notification(entry['auction'], urgent=entry['kind'] == 'urgent', target=target)
+        except Exception as e:
+            logger.error(f"Error delivering notification {entry['_id']}: {e}")
+            return False
+
+    def get_status(self) -> Dict:
+        """Queue depth and delivery metrics"""
+        depth = {}
+        oldest_pending_seconds = None
+        try:
+            for doc in self.collection.aggregate([{'$group': {'_id': '$status', 'count': {'$sum': 1}}}]):
+                depth[doc['_id']] = doc['count']
+            oldest = self.collection.find_one({'status': PENDING}, sort=[('enqueued_at', 1)])
+            if oldest:
+                oldest_pending_seconds = round(time.time() - oldest['enqueued_at'], 1)
+        except Exception as e:
+            logger.error(f"Error reading notification queue depth: {e}")
+
+        with self._stats_lock:
+            latencies = sorted(self._latencies)
+            status = {
+                'running': self.running,
+                'workers': self.worker_count,
+                'pending': depth.get(PENDING, 0),
+                'sending': depth.get(SENDING, 0),
+                'sent': depth.get(SENT, 0),
+                'failed': depth.get(FAILED, 0),
+                'oldest_pending_seconds': oldest_pending_seconds,
+                'delivered': self.delivered_count,
+                'retried': self.retried_count,
+                'gave_up': self.failed_count,
+                'duplicates_skipped': self.duplicate_count,
+                'unqueued': len(self._unqueued),
+                'digest_enabled': self.digest_enabled,
+                'digests_sent': self.digest_count,
+            }
+        if latencies:
+            status['latency_seconds'] = {
+                'avg': round(sum(latencies) / len(latencies), 3),
+                'p50': round(latencies[len(latencies) // 2], 3),
+                'p95': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 3),
+                'max': round(latencies[-1], 3),
+            }
+        return status
@@ -0,0 +1,145 @@
+"""
+Timer heap for notifications that must fire at an exact moment
+"""
+
+import heapq
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class NotificationScheduler:
+    """Fire a callback for each scheduled key at its due time
+
+    Events are kept in a heap ordered by due time and a single thread
+    sleeps until the earliest one. Rescheduling a key replaces its
+    previous event (stale heap entries are skipped when popped, and the
+    heap is rebuilt once they outnumber the live ones).
+    """
+
+    def __init__(self, callback: Callable[[str, Any], None], name: str = "NotificationScheduler"):
+        """
+        Args:
+            callback: Called as callback(key, payload) when an event is due
+            name: Thread name (shows up in logs)
+        """
+        self.callback = callback
+        self.name = name
+        self._heap: List[Tuple[float, int, str]] = []
+        self._events: Dict[str, Tuple[float, int, Any]] = {}
+        self._counter = 0
+        self._condition = threading.Condition()
+        self.running = False
+        self.thread = None
+        self.fired_count = 0
+
+    def start(self):
+        """Start the scheduler thread"""
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._loop, daemon=True, name=self.name)
+        self.thread.start()
+        logger.info(f"{self.name} started ({len(self._events)} events scheduled)")
+
+    def stop(self):
+        """Stop the scheduler thread"""
+        with self._condition:
+            self.running = False
+            self._condition.notify_all()
+        if self.thread:
+            self.thread.join(timeout=5)
+
+    def schedule(self, key: str, fire_at: float, payload: Any = None):
+        """Schedule (or reschedule) the event for a key"""
+        with self._condition:
+            current = self._events.get(key)
+            if current is not None and current[0] == fire_at:
+                # Same due time - keep its heap entry, only the payload changes
+                self._events[key] = (fire_at, current[1], payload)
+                return
+            self._counter += 1
+            self._events[key] = (fire_at, self._counter, payload)
+            heapq.heappush(self._heap, (fire_at, self._counter, key))
+            self._compact()
+            # Wake the thread if this is now the earliest event
+            if self._heap[0][2] == key:
+                self._condition.notify()
+
+    def cancel(self, key: str) -> bool:
+        """Cancel the event for a key"""
+        with self._condition:
+            cancelled = self._events.pop(key, None) is not None
+            self._compact()
+            return cancelled
+
+    def next_fire_at(self) -> Optional[float]:
+        """Due time of the earliest pending event"""
+        with self._condition:
+            self._discard_stale()
+            return self._heap[0][0] if self._heap else None
+
+    def __len__(self) -> int:
+        return len(self._events)
+
+    def _compact(self):
+        """Rebuild the heap from the live events once stale entries outnumber them (caller holds the condition)"""
+        if len(self._heap) - len(self._events) <= len(self._events):
+            return
+        self._heap = [(fire_at, counter, key) for key, (fire_at, counter, _) in self._events.items()]
+        heapq.heapify(self._heap)
+
+    def _discard_stale(self):
+        """Drop heap entries that were rescheduled or cancelled"""
+        while self._heap:
+            fire_at, counter, key = self._heap[0]
+            event = self._events.get(key)
+            if event is not None and event[1] == counter:
+                return
+            heapq.heappop(self._heap)
+
+    def _pop_due(self) -> Optional[Tuple[str, Any]]:
+        """Wait for the next due event (caller holds the condition)"""
+        while self.running:
+            self._discard_stale()
+            if not self._heap:
+                self._condition.wait()
+                continue
+
+            wait_for = self._heap[0][0] - time.time()
+            if wait_for > 0:
+                self._condition.wait(wait_for)
+                continue
+
+            _, _, key = heapq.heappop(self._heap)
+            _, _, payload = self._events.pop(key)
+            return key, payload
+        return None
+
+    def _loop(self):
+        """Scheduler loop - runs callbacks outside the lock"""
+        while self.running:
+            with self._condition:
+                due = self._pop_due()
+            if due is None:
+                break
+
+            key, payload = due
+            try:
+                self.callback(key, payload)
+                self.fired_count += 1
+            except Exception as e:
+                logger.error(f"{self.name}: error firing event {key}: {e}")
+
+    def get_status(self) -> Dict:
+        """Get scheduler status"""
+        next_fire_at = self.next_fire_at()
+        return {
+            'running': self.running,
+            'scheduled_events': len(self._events),
+            'fired_events': self.fired_count,
+            'next_event_in_seconds': max(0, round(next_fire_at - time.time())) if next_fire_at else None,
+        }
@@ -0,0 +1,101 @@
+"""
+Process pool for CPU-bound page parsing (BeautifulSoup) off the updater's threads
+"""
+
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict
+from .config import get_config
+
+logger = logging.getLogger(__name__)
+
+
+class ParsePool:
+    """Runs parse functions in worker processes, or inline when processes is 0
+
+    Parsing holds the GIL, so pages fetched by several threads are still
+    parsed one at a time; worker processes put the other cores to work.
+    Workers are spawned (not forked - the updater runs MongoDB and HTTP
+    threads) on the first submit and kept until shutdown(). Functions and
+    arguments cross a process boundary, so they must be picklable:
+    module-level functions taking raw HTML and returning plain dicts.
+    Spawned workers import the main script again, so scripts that scrape
+    with PARSE_PROCESSES set need an `if __name__ == "__main__":` guard.
+    """
+
+    def __init__(self, processes: int = None):
+        """
+        Args:
+            processes: Worker processes (default PARSE_PROCESSES; 0 = parse in the calling thread)
+        """
+        self.processes = get_config().parse_processes if processes is None else processes
+        if multiprocessing.parent_process() is not None:
+            self.processes = 0  # Pool workers parse inline, they never start pools of their own
+        self._executor = None
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.restarts = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.processes > 0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.processes,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+                logger.info(f"Started parse pool ({self.processes} processes)")
+            return self._executor
+
+    def submit(self, fn: Callable, *args) -> Future:
+        """Parse in a worker process (or right away if the pool is disabled)
+
+        Returns:
+            Future holding fn's result or exception
+        """
+        self.submitted += 1
+        if self.enabled:
+            try:
+                return self._get_executor().submit(fn, *args)
+            except (BrokenProcessPool, RuntimeError) as e:
+                # A worker died (e.g. killed for memory) - start fresh processes next time
+                logger.error(f"Parse pool unavailable, parsing inline: {e}")
+                self._reset()
+
+        future = Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def _reset(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+            self.restarts += 1
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self):
+        """Stop the worker processes (they start again on the next submit)"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def get_status(self) -> Dict:
+        return {
+            'processes': self.processes,
+            'started': self._executor is not None,
+            'submitted': self.submitted,
+            'restarts': self.restarts,
+        }
+
+
+PARSE_POOL = ParsePool()
@@ -0,0 +1,296 @@
+"""
+On-demand profiling of background syncs and web requests
+"""
+
+import cProfile
+import fnmatch
+import json
+import logging
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Optional
+from .config import get_config
+
+logger = logging.getLogger(__name__)
+
+PROFILE_MODES = ('cprofile', 'sample')
+
+# Functions listed in the JSON summaries
+TOP_FUNCTIONS = 30
+
+
+def _frame_label(code) -> str:
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+class _Sampler:
+    """Samples one thread's stack at a fixed interval
+
+    Produces collapsed stacks ("a;b;c count" lines), the input format of
+    flamegraph.pl, speedscope and similar tools.
+    """
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="ProfileSampler")
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+                self.samples += 1
+
+
+class _Capture:
+    """One profile being recorded on the current thread"""
+
+    def __init__(self, kind: str, label: str, mode: str, interval: float):
+        self.kind = kind
+        self.label = label
+        self.mode = mode
+        self.started_at = datetime.now()
+        self._start = time.perf_counter()
+        if mode == 'sample':
+            self._sampler = _Sampler(threading.get_ident(), interval)
+            self._sampler.start()
+        else:
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+
+    def stop(self) -> float:
+        if self.mode == 'sample':
+            self._sampler.stop()
+        else:
+            self._profile.disable()
+        return time.perf_counter() - self._start
+
+
+class Profiler:
+    """Records profiles of the next N syncs, or of requests matching a route
+
+    Nothing is recorded until armed; while disarmed the hooks only check a
+    counter and an empty dict. Each profile is written to the profile
+    directory as .pstats (cProfile) or .folded (sampling) plus a .json
+    summary of the top functions.
+    """
+
+    def __init__(self, output_dir: str = None):
+        self.config = get_config()
+        self.output_dir = output_dir or self.config.profile_dir
+        self.sample_interval = self.config.profile_sample_interval_ms / 1000
+        self._lock = threading.Lock()
+        self._sync_remaining = 0
+        self._sync_mode = 'cprofile'
+        self._routes: Dict[str, Dict] = {}  # Route pattern -> {'remaining', 'mode'}
+
+    def arm_sync(self, runs: int = 1, mode: str = 'cprofile'):
+        """Profile the next `runs` syncs"""
+        self._check_mode(mode)
+        with self._lock:
+            self._sync_remaining = max(0, runs)
+            self._sync_mode = mode
+        logger.info(f"Profiling armed for the next {runs} sync(s) ({mode})")
+
+    def arm_route(self, route: str, count: int = 1, mode: str = 'cprofile'):
+        """Profile the next `count` requests whose route or path matches a pattern
+
+        Args:
+            route: Flask rule ('/api/auctions') or path pattern ('/api/*')
+        """
+        self._check_mode(mode)
+        with self._lock:
+            if count > 0:
+                self._routes[route] = {'remaining': count, 'mode': mode}
+            else:
+                self._routes.pop(route, None)
+        logger.info(f"Profiling armed for the next {count} request(s) to {route} ({mode})")
+
+    def disarm(self):
+        with self._lock:
+            self._sync_remaining = 0
+            self._routes = {}
+
+    @staticmethod
+    def _check_mode(mode: str):
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Unknown profile mode: {mode} (use one of {', '.join(PROFILE_MODES)})")
+
+    @contextmanager
+    def profile_sync(self, label: str):
+        """Profile the wrapped sync if syncs are armed"""
+        if not self._sync_remaining:
+            yield
+            return
+        with self._lock:
+            if not self._sync_remaining:
+                mode = None
+            else:
+                self._sync_remaining -= 1
+                mode = self._sync_mode
+        if mode is None:
+            yield
+            return
+        capture = _Capture('sync', label, mode, self.sample_interval)
+        try:
+            yield
+        finally:
+            self._save(capture)
+
+    def start_request(self, rule: Optional[str], path: str) -> Optional[_Capture]:
+        """Start profiling a web request if its route is armed (call finish_request with the result)"""
+        if not self._routes:
+            return None
+        with self._lock:
+            for pattern, armed in self._routes.items():
+                if pattern == rule or fnmatch.fnmatchcase(path, pattern):
+                    armed['remaining'] -= 1
+                    if armed['remaining'] <= 0:
+                        del self._routes[pattern]
+                    return _Capture('request', f"{rule or path}", armed['mode'], self.sample_interval)
+        return None
+
+    def finish_request(self, capture: Optional[_Capture]):
+        if capture is not None:
+            self._save(capture)
+
+    def _save(self, capture: _Capture):
+        """Stop a capture and write its profile and summary files"""
+        duration = capture.stop()
+        try:
+            os.makedirs(self.output_dir, exist_ok=True)
+            slug = re.sub(r'[^A-Za-z0-9_.-]+', '_', capture.label).strip('_') or 'root'
+            name = f"{capture.started_at.strftime('%Y%m%d-%H%M%S-%f')}_{capture.kind}_{slug}"
+            summary = {
+                'name': name,
+                'kind': capture.kind,
+                'label': capture.label,
+                'mode': capture.mode,
+                'started_at': capture.started_at.isoformat(),
+                'duration_seconds': round(duration, 4),
+            }
+            if capture.mode == 'sample':
+                summary.update(self._write_samples(capture._sampler, name))
+            else:
+                summary.update(self._write_pstats(capture._profile, name))
+            with open(os.path.join(self.output_dir, f"{name}.json"), 'w', encoding='utf-8') as f:
+                json.dump(summary, f, indent=2)
+            logger.info(f"Saved {capture.mode} profile of {capture.kind} '{capture.label}' ({duration:.2f}s): {name}")
+        except Exception as e:
+            logger.error(f"Error saving profile: {e}")
+
+    def _write_pstats(self, profile: cProfile.Profile, name: str) -> Dict:
+        filename = f"{name}.pstats"
+        profile.dump_stats(os.path.join(self.output_dir, filename))
+        stats = pstats.Stats(profile)
+
+        def top(index: int) -> List[Dict]:
+            rows = sorted(stats.stats.items(), key=lambda item: item[1][index], reverse=True)[:TOP_FUNCTIONS]
+            return [{
+                'function': pstats.func_std_string(func),
+                'calls': nc,
+                'self_seconds': round(tt, 4),
+                'cumulative_seconds': round(ct, 4),
+            } for func, (cc, nc, tt, ct, callers) in rows]
+
+        return {
+            'file': filename,
+            'total_calls': stats.total_calls,
+            'top_cumulative': top(3),
+            'top_self': top(2),
+        }
+
+    def _write_samples(self, sampler: _Sampler, name: str) -> Dict:
+        filename = f"{name}.folded"
+        with open(os.path.join(self.output_dir, filename), 'w', encoding='utf-8') as f:
+            for stack, count in sampler.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+        self_samples: Counter = Counter()
+        inclusive: Counter = Counter()
+        for stack, count in sampler.stacks.items():
+            frames = stack.split(';')
+            self_samples[frames[-1]] += count
+            for frame in set(frames):
+                inclusive[frame] += count
+
+        def top(counter: Counter) -> List[Dict]:
+            return [{
+                'function': function,
+                'samples': count,
+                'percent': round(100 * count / sampler.samples, 1),
+            } for function, count in counter.most_common(TOP_FUNCTIONS)]
+
+        return {
+            'file': filename,
+            'samples': sampler.samples,
+            'interval_ms': round(sampler.interval * 1000, 2),
+            'top_cumulative': top(inclusive),
+            'top_self': top(self_samples),
+        }
+
+    def list_profiles(self) -> List[Dict]:
+        """Summaries of saved profiles, newest first (without the top function lists)"""
+        if not os.path.isdir(self.output_dir):
+            return []
+        profiles = []
+        for filename in sorted(os.listdir(self.output_dir), reverse=True):
+            if not filename.endswith('.json'):
+                continue
+            summary = self.get_summary(filename[:-5])
+            if summary:
+                profiles.append({k: v for k, v in summary.items() if not k.startswith('top_')})
+        return profiles
+
+    def get_summary(self, name: str) -> Optional[Dict]:
+        path = self.get_path(f"{name}.json")
+        if not path:
+            return None
+        try:
+            with open(path, encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.error(f"Error reading profile summary {name}: {e}")
+            return None
+
+    def get_path(self, filename: str) -> Optional[str]:
+        """Path of a file in the profile directory (None for other or missing paths)"""
+        if os.path.basename(filename) != filename:
+            return None
+        path = os.path.join(self.output_dir, filename)
+        return path if os.path.isfile(path) else None
+
+    def get_status(self) -> Dict:
+        with self._lock:
+            return {
+                'sync_runs_remaining': self._sync_remaining,
+                'sync_mode': self._sync_mode,
+                'routes': {route: dict(armed) for route, armed in self._routes.items()},
+                'output_dir': self.output_dir,
+            }
+
+
+# Shared by the updater and the web app (same process)
+PROFILER = Profiler()
@@ -2,30 +2,98 @@
 Web scraper for sikoauktioner.se
 """
 
+import html
 import requests
 import time
 import logging
 from bs4 import BeautifulSoup
-from typing import List, Dict, Optional
+from concurrent.futures import Future
+from typing import Callable, List, Dict, Optional, Tuple
 from urllib.parse import urljoin, urlparse
 from .config import get_config
+from .search_matcher import split_search_word
+from .http_client import InstrumentedSession, Tally, RETRY_STATUSES
+from .metrics import PARSE_DURATION, EXTRACTOR_DURATION
+from .parse_pool import PARSE_POOL
 
 logger = logging.getLogger(__name__)
 
+# Parser of parse_auction_page in parse pool processes (the extractors are SikoScraper methods)
+_page_parser = None
+
+
+def parse_auction_page(page_html: str, auction_url: str, scraped_at: float = None) -> Tuple[Dict, Dict[str, float]]:
+    """Parse a fetched auction page - module level so the parse pool can run it in a worker process
+
+    Returns:
+        The auction dict and the seconds spent in each extractor
+    """
+    global _page_parser
+    if _page_parser is None:
+        _page_parser = SikoScraper()
+    return _page_parser.parse_auction_details(page_html, auction_url, scraped_at)
+
+
 class SikoScraper:
     """Web scraper for Siko Auktioner website"""
     
     def __init__(self):
         self.config = get_config()
         self.base_url = "https://sikoauktioner.se"
-        self.session = requests.Session()
-        self.session.headers.update({
+        self.session = self._create_session(self.config.http_retries)
+        # Result/skip counts and request totals of the most recent search_auctions call
+        self.last_search_stats: Dict = {}
+        # Shared request budget across sync workers (set by AuctionUpdater when tasks are distributed)
+        self.rate_limiter = None
+    
+    def _create_session(self, retries: int) -> InstrumentedSession:
+        session = InstrumentedSession('scraper', pool_size=self.config.http_pool_size, retries=retries)
+        session.headers.update({
             'User-Agent': self.config.user_agent,
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
             'Accept-Language': 'sv-SE,sv;q=0.9,en;q=0.8',
             'Accept-Encoding': 'gzip, deflate, br',
             'Connection': 'keep-alive',
         })
+        return session
+    
+    def use_rate_limiter(self, rate_limiter):
+        """Send every request, retries included, through a shared rate limiter
+        
+        urllib3 retries inside the session would skip the limiter, so the
+        session is replaced by one without them and _fetch retries instead.
+        """
+        self.session.close()
+        self.session = self._create_session(0)
+        self.rate_limiter = rate_limiter
+    
+    def _fetch(self, url: str, kind: str) -> requests.Response:
+        """GET a page (raising for HTTP errors)
+        
+        Args:
+            url: Page URL
+            kind: Operation name for the request metrics ('listing', 'search', 'detail', 'bid_status')
+        """
+        if self.rate_limiter is None:
+            response = self.session.get(url, timeout=self.config.request_timeout, operation=kind)
+            response.raise_for_status()
+            return response
+        
+        # Retried here, each attempt taking a slot of the shared rate
+        attempts = 1 + max(0, self.config.http_retries)
+        for attempt in range(attempts):
+            self.rate_limiter.acquire()
+            last_attempt = attempt + 1 >= attempts
+            try:
+                response = self.session.get(url, timeout=self.config.request_timeout, operation=kind)
+            except (requests.ConnectionError, requests.Timeout):
+                if last_attempt:
+                    raise
+            else:
+                if response.status_code not in RETRY_STATUSES or last_attempt:
+                    response.raise_for_status()
+                    return response
+            time.sleep(0.5 * 2 ** attempt)
     
     def get_auction_urls(self) -> List[str]:
         """Get list of current auction URLs"""
@@ -33,11 +101,7 @@ class SikoScraper:
             logger.info("Fetching auction list from sikoauktioner.se")
             
             # Main homepage - auctions are displayed here
-            response = self.session.get(
-                f"{self.base_url}",
-                timeout=self.config.request_timeout
-            )
-            response.raise_for_status()
+            response = self._fetch(f"{self.base_url}", 'listing')
             
             # Ensure correct encoding
             response.encoding = 'utf-8'
@@ -76,37 +140,8 @@ class SikoScraper:
         """Scrape details from a single auction page"""
         try:
             logger.debug(f"Scraping auction: {auction_url}")
-            
-            response = self.session.get(auction_url, timeout=self.config.request_timeout)
-            response.raise_for_status()
-            
-            # Ensure correct encoding
-            response.encoding = 'utf-8'
-            
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            # Extract auction details - updated based on actual sikoauktioner.se structure
-            time_left = self._extract_time_left(soup)
-            images = self._extract_all_images(soup, auction_url)
-            auction = {
-                'id': self._extract_auction_id(auction_url),
-                'url': auction_url,
-                'title': self._extract_title(soup),
-                'description': self._extract_description(soup),
-                'current_bid': self._extract_current_bid(soup),
-                'reserve_price': self._extract_reserve_price(soup),
-                'time_left': time_left,
-                'minutes_remaining': self._parse_time_to_minutes(time_left),
-                'location': self._extract_location(soup),
-                'auction_number': self._extract_auction_number(soup),
-                'image_url': images[0] if images else '',  # First image for backwards compatibility
-                'images': images,  # All images for carousel
-                'items': [],  # Single items rather than collections for this site
-            }
-            
-            # Add timestamp
-            auction['scraped_at'] = time.time()
-            
+            page_html = self.fetch_auction_page(auction_url)
+            auction = self._parse_result(self._submit_parse(page_html, auction_url, time.time()))
             logger.debug(f"Scraped auction: {auction['title']}")
             return auction
             
@@ -114,6 +149,77 @@ class SikoScraper:
             logger.error(f"Error scraping auction {auction_url}: {e}")
             return None
     
+    def fetch_auction_page(self, auction_url: str) -> str:
+        """GET an auction page's HTML (raising for HTTP errors)"""
+        response = self._fetch(auction_url, 'detail')
+        
+        # Ensure correct encoding
+        response.encoding = 'utf-8'
+        return response.text
+    
+    def parse_auction_details(self, page_html: str, auction_url: str, scraped_at: float = None) -> Tuple[Dict, Dict[str, float]]:
+        """Parse a fetched auction page (CPU only, no network access)
+        
+        Args:
+            page_html: Page HTML from fetch_auction_page
+            auction_url: URL the page was fetched from
+            scraped_at: When the page was fetched (default now) - ends_at is counted from it
+        
+        Returns:
+            The auction dict and the seconds spent in each extractor
+        """
+        timings = {}
+        
+        def extract(name: str, extractor: Callable, *args):
+            start = time.perf_counter()
+            try:
+                return extractor(*args)
+            finally:
+                timings[name] = time.perf_counter() - start
+        
+        soup = extract('soup', BeautifulSoup, page_html, 'html.parser')
+        
+        # Extract auction details - updated based on actual sikoauktioner.se structure
+        time_left = extract('time_left', self._extract_time_left, soup)
+        images = extract('images', self._extract_all_images, soup, auction_url)
+        auction = {
+            'id': self._extract_auction_id(auction_url),
+            'url': auction_url,
+            'title': extract('title', self._extract_title, soup),
+            'description': extract('description', self._extract_description, soup),
+            'current_bid': extract('current_bid', self._extract_current_bid, soup),
+            'reserve_price': extract('reserve_price', self._extract_reserve_price, soup),
+            'time_left': time_left,
+            'minutes_remaining': self._parse_time_to_minutes(time_left),
+            'location': extract('location', self._extract_location, soup),
+            'auction_number': extract('auction_number', self._extract_auction_number, soup),
+            'image_url': images[0] if images else '',  # First image for backwards compatibility
+            'images': images,  # All images for carousel
+            'items': [],  # Single items rather than collections for this site
+        }
+        
+        # Add timestamp
+        auction['scraped_at'] = scraped_at or time.time()
+        
+        # Absolute end time, used to schedule notifications at the exact moment
+        seconds_remaining = self._parse_time_to_seconds(time_left)
+        auction['ends_at'] = auction['scraped_at'] + seconds_remaining if seconds_remaining is not None else None
+        return auction, timings
+    
+    def _submit_parse(self, page_html: str, auction_url: str, scraped_at: float) -> Future:
+        """Parse a page in the parse pool (PARSE_PROCESSES) or right away"""
+        if PARSE_POOL.enabled:
+            return PARSE_POOL.submit(parse_auction_page, page_html, auction_url, scraped_at)
+        return PARSE_POOL.submit(self.parse_auction_details, page_html, auction_url, scraped_at)
+    
+    def _parse_result(self, parse: Future) -> Dict:
+        """Wait for a parse and record its timings (worker processes have their own metrics)"""
+        auction, timings = parse.result()
+        for name, seconds in timings.items():
+            EXTRACTOR_DURATION.observe(seconds, extractor=name)
+        PARSE_DURATION.observe(sum(timings.values()), page='detail')
+        return auction
+    
     def get_auctions(self, search_terms: List[str] = None) -> List[Dict]:
         """Get current auctions, optionally filtered by search terms"""
         auctions = []
@@ -160,72 +266,110 @@ class SikoScraper:
         logger.info(f"Successfully scraped {len(unique_auctions)} unique auctions")
         return unique_auctions
     
-    def search_auctions(self, search_term: str) -> List[Dict]:
-        """Search for auctions using the site's search functionality"""
-        try:
-            logger.info(f"Searching for auctions with term: {search_term}")
-            
-            # URL encode the search term to handle spaces and special characters
-            # For "lego technic" it becomes "technic%20lego" (reversed for better results)
-            from urllib.parse import quote
-            
-            # Handle multi-word search terms - reverse order for better sikoauktioner.se results
-            words = search_term.strip().split()
-            if len(words) > 1:
-                # Reverse word order and join with space for sikoauktioner.se search
-                reversed_term = ' '.join(reversed(words))
-                encoded_term = quote(reversed_term.lower())
-            else:
-                encoded_term = quote(search_term.lower())
-            
-            search_url = f"{self.base_url}/sok/{encoded_term}/0/0"
-            
-            response = self.session.get(
-                search_url,
-                timeout=self.config.request_timeout
-            )
-            response.raise_for_status()
-            
-            # Ensure correct encoding
-            response.encoding = 'utf-8'
-            
+    def search_candidates(self, search_term: str, candidate_filter: Optional[Callable[[Dict], Optional[str]]] = None,
+                          stats: Optional[Dict] = None) -> List[Dict]:
+        """Fetch the search results page and return the result cards worth a detail fetch
+        
+        Raises on request errors (the caller decides how to report them).
+        
+        Args:
+            search_term: The search word to query the site with
+            candidate_filter: Optional callable evaluated for each result card
+                ({'id', 'url', 'title'}) before its detail page is fetched.
+                It returns a reason string to skip the result, or None to keep it.
+            stats: Dict updated with results/detail_fetched/skipped counts
+        """
+        logger.info(f"Searching for auctions with term: {search_term}")
+        
+        # URL encode the search term to handle spaces and special characters
+        # For "lego technic" it becomes "technic%20lego" (reversed for better results)
+        from urllib.parse import quote
+        
+        # Exclusion keywords (-word) are applied locally, not sent to the site
+        query_term, _ = split_search_word(search_term)
+        
+        # Handle multi-word search terms - reverse order for better sikoauktioner.se results
+        words = query_term.strip().split()
+        if len(words) > 1:
+            # Reverse word order and join with space for sikoauktioner.se search
+            reversed_term = ' '.join(reversed(words))
+            encoded_term = quote(reversed_term.lower())
+        else:
+            encoded_term = quote(query_term.lower())
+        
+        search_url = f"{self.base_url}/sok/{encoded_term}/0/0"
+        
+        response = self._fetch(search_url, 'search')
+        
+        # Ensure correct encoding
+        response.encoding = 'utf-8'
+        
+        with PARSE_DURATION.time(page='search'):
             soup = BeautifulSoup(response.text, 'html.parser')
+            # Extract result cards (URL, ID and title) from search results
+            candidates = self._parse_search_results(soup, response.text)
+        logger.info(f"Found {len(candidates)} auctions for search term '{search_term}'")
+        
+        # Drop results we would not keep before fetching their detail pages
+        skipped = {}
+        if candidate_filter:
+            kept = []
+            for candidate in candidates:
+                reason = candidate_filter(candidate)
+                if reason:
+                    skipped[reason] = skipped.get(reason, 0) + 1
+                    logger.debug(f"  Skipped '{candidate.get('title', '')}' (ID: {candidate['id']}): {reason}")
+                else:
+                    kept.append(candidate)
+            candidates = kept
+            if skipped:
+                logger.info(f"Skipped {sum(skipped.values())} results for '{search_term}' before detail fetch: {skipped}")
+        
+        if stats is not None:
+            stats.update({
+                'results': len(candidates) + sum(skipped.values()),
+                'detail_fetched': len(candidates),
+                'skipped': skipped,
+            })
+        return candidates
+    
+    def search_auctions(self, search_term: str, candidate_filter: Optional[Callable[[Dict], Optional[str]]] = None) -> List[Dict]:
+        """Search for auctions using the site's search functionality
+        
+        Args:
+            search_term: The search word to query the site with
+            candidate_filter: See search_candidates
+        """
+        # Requests are tallied per thread - the end-game tracker shares this scraper
+        tally = Tally().start()
+        self.last_search_stats = {'search_term': search_term, 'results': 0, 'detail_fetched': 0, 'skipped': {}}
+        try:
+            candidates = self.search_candidates(search_term, candidate_filter, self.last_search_stats)
             auctions = []
             
-            # Extract auction URLs from search results
-            auction_urls = []
-            auction_links = soup.find_all('a', href=True)
-            
-            for link in auction_links:
-                href = link.get('href')
-                if href and '/auktion/' in href:
-                    full_url = urljoin(self.base_url, href)
-                    if full_url not in auction_urls:
-                        auction_urls.append(full_url)
-            
-            # If no direct links, try to extract auction numbers from the search results page
-            if not auction_urls:
-                import re
-                auction_numbers = re.findall(r'nr\. (\d+)', response.text)
-                for number in auction_numbers:
-                    auction_url = f"{self.base_url}/auktion/{number}"
-                    auction_urls.append(auction_url)
-            
-            logger.info(f"Found {len(auction_urls)} auctions for search term '{search_term}'")
-            
-            # Scrape details for each auction
-            for i, url in enumerate(auction_urls):
+            # Fetch details for each auction - with a parse pool, pages are parsed while the next ones are fetched
+            parses = []
+            for i, candidate in enumerate(candidates):
+                url = candidate['url']
                 try:
                     if i > 0:
                         time.sleep(self.config.request_delay)
                     
-                    auction = self.scrape_auction_details(url)
-                    if auction:
-                        auction['search_term_used'] = search_term  # Track which search found this
-                        auctions.append(auction)
-                        # Log found auction details
-                        logger.info(f"  ✓ Scraped: '{auction.get('title', 'Unknown')}' (ID: {auction.get('id', 'N/A')}) - {auction.get('url', 'No URL')} - {auction.get('minutes_remaining', 'N/A')} min remaining")
-                        
+                    page_html = self.fetch_auction_page(url)
+                    parses.append((url, self._submit_parse(page_html, url, time.time())))
+                    
+                except Exception as e:
+                    logger.error(f"Error processing search result auction {url}: {e}")
+                    continue
+            
+            for url, parse in parses:
+                try:
+                    auction = self._parse_result(parse)
+                    auction['search_term_used'] = search_term  # Track which search found this
+                    auctions.append(auction)
+                    # Log found auction details
+                    logger.info(f"  ✓ Scraped: '{auction.get('title', 'Unknown')}' (ID: {auction.get('id', 'N/A')}) - {auction.get('url', 'No URL')} - {auction.get('minutes_remaining', 'N/A')} min remaining")
+                    
                 except Exception as e:
                     logger.error(f"Error processing search result auction {url}: {e}")
                     continue
@@ -234,7 +378,61 @@ class SikoScraper:
             
         except Exception as e:
             logger.error(f"Error searching for '{search_term}': {e}")
+            self.last_search_stats['error'] = str(e)
             return []
+        finally:
+            tally.stop()
+            self.last_search_stats.update({
+                'requests': tally.requests,
+                'request_seconds': tally.seconds,
+                'request_errors': tally.errors,
+                'request_retries': tally.retries,
+                'response_bytes': tally.bytes,
+            })
+    
+    def _parse_search_results(self, soup: BeautifulSoup, page_html: str) -> List[Dict]:
+        """Extract result cards (id, url, title) from a search results page"""
+        candidates = {}
+        
+        for link in soup.find_all('a', href=True):
+            href = link.get('href')
+            if not href or '/auktion/' not in href:
+                continue
+            
+            full_url = urljoin(self.base_url, href)
+            candidate = candidates.get(full_url)
+            if candidate is None:
+                candidate = {'id': self._extract_auction_id(full_url), 'url': full_url, 'title': ''}
+                candidates[full_url] = candidate
+            
+            # A card usually has several links (image + title); keep the most descriptive text
+            title = self._extract_card_title(link)
+            if len(title) > len(candidate['title']):
+                candidate['title'] = title
+        
+        # If no direct links, try to extract auction numbers from the search results page
+        if not candidates:
+            import re
+            for number in re.findall(r'nr\. (\d+)', page_html):
+                auction_url = f"{self.base_url}/auktion/{number}"
+                candidates.setdefault(auction_url, {'id': number, 'url': auction_url, 'title': ''})
+        
+        return list(candidates.values())
+    
+    def _extract_card_title(self, link) -> str:
+        """Get the title text of a search result link"""
+        text = link.get_text(' ', strip=True)
+        if len(text) > 3:
+            return text
+        
+        if link.get('title'):
+            return link['title'].strip()
+        
+        img = link.find('img', alt=True)
+        if img and len(img['alt'].strip()) > 3:
+            return img['alt'].strip()
+        
+        return ""
     
     def _extract_auction_id(self, url: str) -> str:
         """Extract auction ID from URL"""
@@ -389,10 +587,13 @@ class SikoScraper:
     
     def _extract_current_bid(self, soup: BeautifulSoup) -> str:
         """Extract current bid amount"""
+        return self._extract_current_bid_from_text(soup.get_text())
+    
+    def _extract_current_bid_from_text(self, text: str) -> str:
+        """Extract current bid amount from page text"""
         try:
             # Look for current bid in the text
             import re
-            text = soup.get_text()
             
             # Look for "Aktuellt bud: XXX kr" pattern
             match = re.search(r'Aktuellt bud:\s*(\d+(?:\s\d{3})*\s*kr)', text)
@@ -427,9 +628,12 @@ class SikoScraper:
     
     def _extract_time_left(self, soup: BeautifulSoup) -> str:
         """Extract time left for auction"""
+        return self._extract_time_left_from_text(soup.get_text())
+    
+    def _extract_time_left_from_text(self, text: str) -> str:
+        """Extract time left for auction from page text"""
         try:
             import re
-            text = soup.get_text()
             
             # Check if auction has ended
             if re.search(r'Avslutad', text, re.IGNORECASE):
@@ -485,6 +689,53 @@ class SikoScraper:
             logger.error(f"Error parsing time string '{time_str}': {e}")
             return None
     
+    def _parse_time_to_seconds(self, time_str: str) -> Optional[int]:
+        """Parse time string like '2d, 5h, 42m, 59s' to total seconds"""
+        minutes = self._parse_time_to_minutes(time_str)
+        if minutes is None:
+            return None
+        
+        import re
+        seconds_match = re.search(r'(\d+)s', time_str)
+        seconds = int(seconds_match.group(1)) if seconds_match else 0
+        return minutes * 60 + seconds
+    
+    def fetch_bid_status(self, auction_url: str) -> Optional[Dict]:
+        """Lightweight fetch of only the current bid and time left of an auction
+        
+        Skips the BeautifulSoup parse and image/description extraction done by
+        scrape_auction_details; the tags are stripped with a regex instead.
+        Used for high-frequency end-game tracking of watched auctions.
+        """
+        try:
+            import re
+            response = self._fetch(auction_url, 'bid_status')
+            response.encoding = 'utf-8'
+            
+            parse_start = time.perf_counter()
+            text = re.sub(r'<(script|style)[^>]*>.*?</\1>', ' ', response.text, flags=re.DOTALL | re.IGNORECASE)
+            text = html.unescape(re.sub(r'<[^>]+>', ' ', text))
+            
+            time_left = self._extract_time_left_from_text(text)
+            current_bid = self._extract_current_bid_from_text(text)
+            PARSE_DURATION.observe(time.perf_counter() - parse_start, page='bid_status')
+            seconds_remaining = self._parse_time_to_seconds(time_left)
+            checked_at = time.time()
+            return {
+                'id': self._extract_auction_id(auction_url),
+                'url': auction_url,
+                'current_bid': current_bid,
+                'time_left': time_left,
+                'minutes_remaining': self._parse_time_to_minutes(time_left),
+                'seconds_remaining': seconds_remaining,
+                'ends_at': checked_at + seconds_remaining if seconds_remaining is not None else None,
+                'ended': time_left == "Ended",
+                'checked_at': checked_at,
+            }
+        except Exception as e:
+            logger.error(f"Error fetching bid status for {auction_url}: {e}")
+            return None
+    
     def _extract_location(self, soup: BeautifulSoup) -> str:
         """Extract auction location"""
         try:
@@ -6,14 +6,19 @@ import json
 import os
 import logging
 import time
-from typing import List, Dict, Set, Optional
+import threading
+from typing import Callable, List, Dict, Set, Optional
 from .config import get_config
+from .search_matcher import SearchMatcher, get_exclusion_keywords, get_searchable_text, matches_text
 
 logger = logging.getLogger(__name__)
 
 class SearchManager:
     """Manage search words and filter auctions"""
     
+    # How often (seconds) the cached word set re-checks the version in MongoDB
+    VERSION_CHECK_INTERVAL = 5.0
+    
     def __init__(self):
         self.config = get_config()
         
@@ -21,35 +26,101 @@ class SearchManager:
         from .mongodb_client import MongoDBClient
         mongo_client = MongoDBClient()
         self.mongo_collection = mongo_client.get_collection('search_words', self.config.mongodb_database)
+        # Version counter shared by every process, bumped on each change to the word set
+        self.state_collection = mongo_client.get_collection('app_state', self.config.mongodb_database)
+        
+        # In-process cache of the word set, invalidated by version
+        self._lock = threading.RLock()
+        self._cached_words: Optional[Set[str]] = None
+        self._cached_version: Optional[int] = None
+        self._last_version_check = 0.0
+        self._matcher: Optional[SearchMatcher] = None
+        self._matcher_words: Optional[frozenset] = None
         logger.info("SearchManager using MongoDB storage")
     
-    def _load_search_words(self) -> Set[str]:
-        """Load search words from MongoDB"""
-        try:
-            search_docs = self.mongo_collection.find()
-            words = set(doc['word'].lower().strip() for doc in search_docs if doc.get('word'))
-            logger.debug(f"Loaded {len(words)} search words from MongoDB")
-            return words
-        except Exception as e:
-            logger.error(f"Error loading search words from MongoDB: {e}")
-            return set()
+    def _get_version(self) -> int:
+        """Get the current search word version from MongoDB"""
+        doc = self.state_collection.find_one({'_id': 'search_words'}, {'version': 1})
+        return doc.get('version', 0) if doc else 0
     
-    def _save_search_words(self, search_words: Set[str]):
-        """Save search words to MongoDB"""
+    def _bump_version(self) -> Optional[int]:
+        """Increment the search word version so other processes reload their cache"""
         try:
-            # Clear and re-save to MongoDB
-            self.mongo_collection.delete_many({})
-            if search_words:
-                docs = [{'word': word, 'added_at': time.time()} for word in search_words]
-                self.mongo_collection.insert_many(docs)
-            logger.info(f"Saved {len(search_words)} search words to MongoDB")
+            from pymongo import ReturnDocument
+            doc = self.state_collection.find_one_and_update(
+                {'_id': 'search_words'},
+                {'$inc': {'version': 1}, '$set': {'updated_at': time.time()}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+            return doc.get('version')
         except Exception as e:
-            logger.error(f"Error saving search words to MongoDB: {e}")
+            logger.error(f"Error bumping search word version: {e}")
+            return None
+    
+    def _apply_local_change(self, change: Callable[[Set[str]], None]):
+        """Bump the version after a write and update the cached word set
+        
+        The cached set is only trusted if no other process wrote in between
+        (our bump is the next version); otherwise the next read reloads it.
+        """
+        self._load_search_words()
+        with self._lock:
+            words = set(self._cached_words) if self._cached_words is not None else None
+            loaded_version = self._cached_version
+        version = self._bump_version()
+        if words is None or loaded_version is None or version != loaded_version + 1:
+            self.invalidate_cache()
+            return
+        change(words)
+        with self._lock:
+            self._cached_words = words
+            self._cached_version = version
+            self._last_version_check = time.time()
+    
+    def invalidate_cache(self):
+        """Force the next read to reload search words from MongoDB"""
+        with self._lock:
+            self._cached_words = None
+            self._cached_version = None
+    
+    def _load_search_words(self) -> Set[str]:
+        """Load search words (cached in-process, reloaded when the version changes)"""
+        with self._lock:
+            now = time.time()
+            if self._cached_words is not None and now - self._last_version_check < self.VERSION_CHECK_INTERVAL:
+                return set(self._cached_words)
+            
+            try:
+                version = self._get_version()
+                if self._cached_words is not None and version == self._cached_version:
+                    self._last_version_check = now
+                    return set(self._cached_words)
+                
+                search_docs = self.mongo_collection.find({}, {'word': 1})
+                words = set(doc['word'].lower().strip() for doc in search_docs if doc.get('word'))
+                logger.debug(f"Loaded {len(words)} search words from MongoDB (version {version})")
+                self._cached_words = words
+                self._cached_version = version
+                self._last_version_check = now
+                return set(words)
+            except Exception as e:
+                logger.error(f"Error loading search words from MongoDB: {e}")
+                return set(self._cached_words) if self._cached_words is not None else set()
     
     def get_search_words(self) -> List[str]:
         """Get all search words"""
         return sorted(list(self._load_search_words()))
     
+    def get_search_word_details(self) -> List[Dict]:
+        """Get all search words with their metadata (added_at, last_synced)"""
+        try:
+            docs = list(self.mongo_collection.find({}, {'_id': 0}).sort('word', 1))
+            return docs
+        except Exception as e:
+            logger.error(f"Error loading search word details: {e}")
+            return []
+    
     def add_search_word(self, word: str) -> bool:
         """Add a search word"""
         try:
@@ -57,13 +128,16 @@ class SearchManager:
             if not word:
                 return False
             
-            search_words = self._load_search_words()
-            if word in search_words:
+            result = self.mongo_collection.update_one(
+                {'word': word},
+                {'$setOnInsert': {'word': word, 'added_at': time.time(), 'last_synced': None}},
+                upsert=True
+            )
+            if result.upserted_id is None:
                 logger.info(f"Search word '{word}' already exists")
                 return True
             
-            search_words.add(word)
-            self._save_search_words(search_words)
+            self._apply_local_change(lambda words: words.add(word))
             
             logger.info(f"Added search word: '{word}'")
             return True
@@ -75,14 +149,13 @@ class SearchManager:
         """Remove a search word"""
         try:
             word = word.strip().lower()
-            search_words = self._load_search_words()
+            result = self.mongo_collection.delete_one({'word': word})
             
-            if word not in search_words:
+            if result.deleted_count == 0:
                 logger.warning(f"Search word '{word}' not found")
                 return False
             
-            search_words.remove(word)
-            self._save_search_words(search_words)
+            self._apply_local_change(lambda words: words.discard(word))
             
             logger.info(f"Removed search word: '{word}'")
             return True
@@ -93,108 +166,107 @@ class SearchManager:
     def clear_search_words(self) -> bool:
         """Clear all search words"""
         try:
-            self._save_search_words(set())
+            self.mongo_collection.delete_many({})
+            self._apply_local_change(lambda words: words.clear())
             logger.info("Cleared all search words")
             return True
         except Exception as e:
             logger.error(f"Error clearing search words: {e}")
             return False
     
+    def mark_synced(self, words: List[str], synced_at: float = None):
+        """Record when search words were last scraped (metadata only, no version bump)"""
+        try:
+            words = [w.strip().lower() for w in words if w and w.strip()]
+            if not words:
+                return
+            self.mongo_collection.update_many(
+                {'word': {'$in': words}},
+                {'$set': {'last_synced': synced_at or time.time()}}
+            )
+        except Exception as e:
+            logger.error(f"Error updating last_synced for search words: {e}")
+    
     def matches_search_word(self, auction: Dict, search_word: str) -> bool:
         """Check if an auction matches a search word
         
-        Search terms within parentheses are treated as exact phrases.
+        Search terms within quotes are treated as exact phrases.
         Example: "vintage tools" matches only "vintage tools" as a phrase
         
-        Search terms without parentheses match any of the words.
+        Search terms without quotes match any of the words.
         Example: vintage tools matches either "vintage" OR "tools"
+        
+        Words prefixed with a minus exclude auctions containing them.
+        Example: lego -duplo matches "lego" but not auctions mentioning "duplo"
         """
         try:
-            search_word = search_word.strip()
-            if not search_word:
-                return False
-            
-            # Check if search term is in parentheses for exact phrase matching
-            is_exact_phrase = search_word.startswith('"') and search_word.endswith('"')
-            
-            if is_exact_phrase:
-                # Extract phrase from quotes and search for exact match
-                exact_phrase = search_word[1:-1].lower().strip()
-                if not exact_phrase:
-                    return False
-                
-                # Fields to search in
-                searchable_fields = [
-                    auction.get('title', ''),
-                    auction.get('description', ''),
-                    auction.get('location', ''),
-                ]
-                
-                # Also search in items
-                for item in auction.get('items', []):
-                    searchable_fields.extend([
-                        item.get('title', ''),
-                        item.get('description', ''),
-                    ])
-                
-                # Search for exact phrase
-                for field_value in searchable_fields:
-                    if field_value and exact_phrase in field_value.lower():
-                        logger.debug(f"Found exact phrase match for '{exact_phrase}' in: {field_value[:100]}")
-                        return True
-                
-                return False
-            else:
-                # Split into individual words and match any of them
-                search_words = search_word.lower().split()
-                
-                # Fields to search in
-                searchable_fields = [
-                    auction.get('title', ''),
-                    auction.get('description', ''),
-                    auction.get('location', ''),
-                ]
-                
-                # Also search in items
-                for item in auction.get('items', []):
-                    searchable_fields.extend([
-                        item.get('title', ''),
-                        item.get('description', ''),
-                    ])
-                
-                # Search in all fields for any of the words
-                for field_value in searchable_fields:
-                    if not field_value:
-                        continue
-                    field_lower = field_value.lower()
-                    for word in search_words:
-                        if word in field_lower:
-                            logger.debug(f"Found match for '{word}' in: {field_value[:100]}")
-                            return True
-                
-                return False
-            
+            return matches_text(search_word, get_searchable_text(auction))
         except Exception as e:
             logger.error(f"Error checking match for search word '{search_word}': {e}")
             return False
     
+    def is_excluded(self, auction: Dict, search_word: str) -> bool:
+        """Check if an auction contains one of the search word's exclusion keywords"""
+        exclusions = get_exclusion_keywords(search_word)
+        if not exclusions:
+            return False
+        text = get_searchable_text(auction)
+        return any(keyword in text for keyword in exclusions)
+    
+    def check_listing(self, search_word: str, title: str, match_title: bool = True) -> Optional[str]:
+        """Evaluate a search result card before its detail page is fetched
+        
+        Args:
+            search_word: The search word the result was found with
+            title: Title shown on the result card
+            match_title: Also require the title to match the search word (drops
+                results the site matched on their description)
+            
+        Returns:
+            Reason the listing would be dropped, or None to keep it
+        """
+        if not title:
+            # Nothing to judge from, fetch the details
+            return None
+        
+        title_lower = title.lower()
+        if any(keyword in title_lower for keyword in get_exclusion_keywords(search_word)):
+            return 'excluded'
+        if match_title and not matches_text(search_word, title_lower):
+            return 'no_match'
+        return None
+    
+    def get_matcher(self) -> SearchMatcher:
+        """Get the compiled matcher for the current search words (rebuilt only when they change)"""
+        search_words = frozenset(self._load_search_words())
+        with self._lock:
+            if self._matcher is None or self._matcher_words != search_words:
+                self._matcher = SearchMatcher(search_words)
+                self._matcher_words = search_words
+                logger.debug(f"Rebuilt search matcher for {len(search_words)} search words")
+            return self._matcher
+    
     def filter_auctions(self, auctions: List[Dict]) -> List[Dict]:
-        """Filter auctions by search words"""
-        search_words = self._load_search_words()
-        if not search_words:
+        """Filter auctions by search words
+        
+        Not called by the app: syncs keep what the site search returned for
+        each word (found_via / search_terms). Kept for scripts and the benchmark.
+        """
+        matcher = self.get_matcher()
+        if not matcher.search_words:
             logger.info("No search words configured, returning empty list")
             return []
         
         matching_auctions = []
         
         for auction in auctions:
-            for search_word in search_words:
-                if self.matches_search_word(auction, search_word):
-                    # Add which search word matched
-                    auction_copy = auction.copy()
-                    auction_copy['matched_search_word'] = search_word
-                    matching_auctions.append(auction_copy)
-                    break  # Only add once per auction
+            matched_words = matcher.match(auction)
+            if matched_words:
+                # Add which search words matched
+                auction_copy = auction.copy()
+                auction_copy['matched_search_word'] = matched_words[0]
+                auction_copy['matched_search_words'] = matched_words
+                matching_auctions.append(auction_copy)
         
         logger.info(f"Filtered {len(auctions)} auctions to {len(matching_auctions)} matching auctions")
         return matching_auctions
@@ -0,0 +1,156 @@
+"""
+Compiled multi-pattern matcher for search words (Aho-Corasick)
+"""
+
+import logging
+from typing import Dict, Iterable, List, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Joins the searchable fields of an auction; never part of a search pattern,
+# so a pattern can't match across two fields
+FIELD_SEPARATOR = '\x00'
+
+
+def split_search_word(search_word: str) -> Tuple[str, List[str]]:
+    """Split a search word into its query part and exclusion keywords
+
+    Words prefixed with a minus are exclusions: lego -duplo matches "lego"
+    but never auctions mentioning "duplo".
+    """
+    query_words = []
+    exclusions = []
+    for word in search_word.strip().split():
+        if word.startswith('-') and len(word) > 1:
+            exclusions.append(word[1:].lower())
+        else:
+            query_words.append(word)
+    return ' '.join(query_words), exclusions
+
+
+def get_search_patterns(search_word: str) -> List[str]:
+    """Get the substrings that make a search word match
+
+    Quoted search words ("vintage tools") match the exact phrase.
+    Other search words match any of their words (vintage OR tools).
+    """
+    search_word, _ = split_search_word(search_word)
+    if not search_word:
+        return []
+
+    if search_word.startswith('"') and search_word.endswith('"'):
+        exact_phrase = search_word[1:-1].lower().strip()
+        return [exact_phrase] if exact_phrase else []
+
+    return search_word.lower().split()
+
+
+def get_exclusion_keywords(search_word: str) -> List[str]:
+    """Get the keywords that prevent a search word from matching"""
+    return split_search_word(search_word)[1]
+
+
+def matches_text(search_word: str, text: str) -> bool:
+    """Check a single search word against an already lower-cased text"""
+    if any(keyword in text for keyword in get_exclusion_keywords(search_word)):
+        return False
+    return any(pattern in text for pattern in get_search_patterns(search_word))
+
+
+def get_searchable_text(auction: Dict) -> str:
+    """Lower-cased text of all fields search words are matched against"""
+    fields = [
+        auction.get('title', ''),
+        auction.get('description', ''),
+        auction.get('location', ''),
+    ]
+    for item in auction.get('items', []):
+        fields.extend([
+            item.get('title', ''),
+            item.get('description', ''),
+        ])
+    return FIELD_SEPARATOR.join(field for field in fields if field).lower()
+
+
+class SearchMatcher:
+    """Match many search words against an auction in a single pass
+
+    All patterns of all search words are compiled into one Aho-Corasick
+    automaton, so each auction's text is scanned once regardless of how
+    many search words are configured.
+    """
+
+    def __init__(self, search_words: Iterable[str]):
+        self.search_words: Tuple[str, ...] = tuple(sorted(set(search_words)))
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        # Term indexes that match (or are excluded) when the automaton reaches a state
+        self._output: List[Tuple[int, ...]] = [()]
+        self._excluded: List[Tuple[int, ...]] = [()]
+        self._build()
+
+    def _build(self):
+        """Build the trie and failure links"""
+        outputs: List[Set[int]] = [set()]
+        exclusions: List[Set[int]] = [set()]
+
+        def add_pattern(pattern: str) -> int:
+            state = 0
+            for char in pattern:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    outputs.append(set())
+                    exclusions.append(set())
+                state = next_state
+            return state
+
+        for term_index, search_word in enumerate(self.search_words):
+            for pattern in get_search_patterns(search_word):
+                outputs[add_pattern(pattern)].add(term_index)
+            for keyword in get_exclusion_keywords(search_word):
+                exclusions[add_pattern(keyword)].add(term_index)
+
+        # Breadth-first pass to set failure links and merge outputs
+        queue = list(self._goto[0].values())
+        for state in queue:
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(char, 0)
+                outputs[next_state] |= outputs[self._fail[next_state]]
+                exclusions[next_state] |= exclusions[self._fail[next_state]]
+
+        self._output = [tuple(sorted(out)) for out in outputs]
+        self._excluded = [tuple(sorted(out)) for out in exclusions]
+        logger.debug(f"Compiled {len(self.search_words)} search words into {len(self._goto)} matcher states")
+
+    def match_text(self, text: str) -> List[str]:
+        """Get all search words matching an already lower-cased text"""
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+        excluded = self._excluded
+        matched: Set[int] = set()
+        rejected: Set[int] = set()
+        state = 0
+
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                matched.update(output[state])
+            if excluded[state]:
+                rejected.update(excluded[state])
+
+        return [self.search_words[i] for i in sorted(matched - rejected)]
+
+    def match(self, auction: Dict) -> List[str]:
+        """Get all search words matching an auction (sorted)"""
+        return self.match_text(get_searchable_text(auction))
@@ -0,0 +1,292 @@
+"""
+Structured reports of background sync runs (sync_runs collection)
+"""
+
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from bson import ObjectId
+from bson.errors import InvalidId
+from .mongodb_client import MongoDBClient
+from .config import get_config
+from .log_store import ensure_ttl_index
+from .memory_diagnostics import read_rss
+from .http_client import Tally
+
+logger = logging.getLogger(__name__)
+
+SYNC_TRIGGERS = ('startup', 'scheduled', 'manual', 'search_word')
+
+# Listing by trigger, newest first (plus the started_at TTL index)
+SYNC_RUN_INDEXES = [[('trigger', 1), ('_id', -1)]]
+
+
+def _object_id(run_id: str) -> ObjectId:
+    """Parse a run id (raises ValueError if malformed)"""
+    try:
+        return ObjectId(run_id)
+    except (InvalidId, TypeError):
+        raise ValueError(f"Invalid run id: {run_id}")
+
+
+class _ErrorCollector(logging.Handler):
+    """Collects ERROR records logged by one thread (the sync thread)"""
+
+    def __init__(self, limit: int):
+        super().__init__(level=logging.ERROR)
+        self.thread_id = threading.get_ident()
+        self.limit = limit
+        self.errors: List[Dict] = []
+        self.dropped = 0
+
+    def emit(self, record: logging.LogRecord):
+        if record.thread != self.thread_id:
+            return
+        if len(self.errors) >= self.limit:
+            self.dropped += 1
+            return
+        self.errors.append({
+            'logger': record.name,
+            'message': record.getMessage()[:1000],
+            'at': datetime.fromtimestamp(record.created),
+        })
+
+
+class SyncRun:
+    """Report of one sync, filled in while the sync runs
+
+    Errors logged by the syncing thread between start() and close() are
+    collected into the report, so errors the sync recovers from are kept too.
+    HTTP requests the thread sends in that window are totalled per operation.
+    """
+
+    MAX_ERRORS = 50
+
+    def __init__(self, trigger: str, search_words: List[str]):
+        self.report: Dict = {
+            'trigger': trigger,
+            'search_words': list(search_words),
+            'started_at': datetime.now(),
+            'finished_at': None,
+            'duration_seconds': None,
+            'status': 'running',
+            'terms': [],
+            'totals': {
+                'requests': 0, 'request_seconds': 0.0, 'request_errors': 0, 'request_retries': 0,
+                'response_bytes': 0, 'results': 0, 'detail_fetched': 0, 'skipped': 0, 'auctions': 0,
+            },
+            'writes': {},
+            'notifications': {},
+            'phases': {},
+            'http': {},
+            'errors': [],
+        }
+        self._collector: Optional[_ErrorCollector] = None
+        self._http: Optional[Tally] = None
+
+    def start(self) -> 'SyncRun':
+        self._collector = _ErrorCollector(self.MAX_ERRORS)
+        logging.getLogger().addHandler(self._collector)
+        self._http = Tally().start()
+        return self
+
+    def record_term(self, search_stats: Dict, kept: int):
+        """Add one search word's scrape stats
+
+        Args:
+            search_stats: SikoScraper.last_search_stats for the word
+            kept: Auctions kept for the word after exclusion keywords
+        """
+        skipped = sum((search_stats.get('skipped') or {}).values())
+        term = {
+            'search_term': search_stats.get('search_term'),
+            'requests': search_stats.get('requests', 0),
+            'request_seconds': round(search_stats.get('request_seconds', 0.0), 3),
+            'request_errors': search_stats.get('request_errors', 0),
+            'request_retries': search_stats.get('request_retries', 0),
+            'response_bytes': search_stats.get('response_bytes', 0),
+            'results': search_stats.get('results', 0),
+            'detail_fetched': search_stats.get('detail_fetched', 0),
+            'skipped': skipped,
+            'skipped_by_reason': search_stats.get('skipped') or {},
+            'auctions': kept,
+        }
+        if search_stats.get('error'):
+            term['error'] = search_stats['error']
+        self.report['terms'].append(term)
+
+        totals = self.report['totals']
+        for key in ('requests', 'request_seconds', 'request_errors', 'request_retries', 'response_bytes',
+                    'results', 'detail_fetched', 'skipped'):
+            totals[key] += term[key]
+        totals['request_seconds'] = round(totals['request_seconds'], 3)
+        totals['auctions'] += kept
+
+    def record_writes(self, write_stats: Dict, **extra):
+        """Add storage counts (MongoDBCache.last_write_stats plus e.g. closed_removed)"""
+        self.report['writes'].update(write_stats)
+        self.report['writes'].update(extra)
+
+    def record_notifications(self, counts: Dict):
+        self.report['notifications'].update(counts)
+
+    def fail(self, error: Exception):
+        self.report['status'] = 'failed'
+        self.report['failure'] = str(error)
+
+    def close(self, phases: Dict[str, float] = None, unique_auctions: int = None):
+        """Stop collecting errors and finish the report"""
+        if self._collector:
+            logging.getLogger().removeHandler(self._collector)
+            self.report['errors'] = self._collector.errors
+            if self._collector.dropped:
+                self.report['errors_dropped'] = self._collector.dropped
+            self._collector = None
+        if self._http:
+            self._http.stop()
+            self.report['http'] = self._http.summary()
+            self._http = None
+
+        finished_at = datetime.now()
+        self.report['finished_at'] = finished_at
+        self.report['duration_seconds'] = round((finished_at - self.report['started_at']).total_seconds(), 3)
+        if phases:
+            self.report['phases'] = {phase: round(seconds, 3) for phase, seconds in phases.items()}
+        if unique_auctions is not None:
+            self.report['unique_auctions'] = unique_auctions
+        self.report['rss_bytes'] = read_rss()['rss_bytes']  # Memory creep shows up across runs
+        if self.report['status'] == 'running':
+            self.report['status'] = 'completed_with_errors' if self.report['errors'] else 'completed'
+
+
+class SyncRunStore:
+    """Persist sync run reports and query them for comparison"""
+
+    MAX_LIMIT = 200
+
+    # Fields left out of run listings (available from get_run)
+    SUMMARY_PROJECTION = {'terms': 0, 'errors': 0}
+
+    def __init__(self):
+        self.config = get_config()
+        mongo_client = MongoDBClient()
+        self.collection = mongo_client.get_collection('sync_runs', self.config.mongodb_database)
+
+    def ensure_indexes(self):
+        """Apply indexes and retention (safe to call on every start)"""
+        try:
+            ensure_sync_run_indexes(self.collection, self.config.sync_run_retention_days)
+        except Exception as e:
+            logger.error(f"Error ensuring sync run indexes: {e}")
+
+    def save(self, run: SyncRun) -> Optional[str]:
+        """Store a finished run report
+
+        Returns:
+            The run id, or None if it could not be stored
+        """
+        try:
+            result = self.collection.insert_one(dict(run.report))
+            return str(result.inserted_id)
+        except Exception as e:
+            logger.error(f"Error saving sync run report: {e}")
+            return None
+
+    def list_runs(self, limit: int = 20, trigger: str = None, before: str = None) -> List[Dict]:
+        """Get run summaries, newest first
+
+        Args:
+            limit: Maximum number of runs
+            trigger: Only runs started by this trigger
+            before: Only runs older than this run id (pagination)
+        """
+        query: Dict = {}
+        if trigger:
+            query['trigger'] = trigger
+        if before:
+            query['_id'] = {'$lt': _object_id(before)}
+        limit = max(1, min(limit, self.MAX_LIMIT))
+        docs = self.collection.find(query, self.SUMMARY_PROJECTION).sort('_id', -1).limit(limit)
+        return [self.serialize(doc) for doc in docs]
+
+    def get_run(self, run_id: str) -> Optional[Dict]:
+        doc = self.collection.find_one({'_id': _object_id(run_id)})
+        return self.serialize(doc) if doc else None
+
+    def compare(self, base_id: str, other_id: str) -> Optional[Dict]:
+        """Differences between two runs (other minus base) for phases, totals and each term"""
+        base, other = self.get_run(base_id), self.get_run(other_id)
+        if not base or not other:
+            return None
+
+        def delta(a: Dict, b: Dict, keys) -> Dict:
+            return {key: round(b.get(key, 0) - a.get(key, 0), 3) for key in keys
+                    if isinstance(a.get(key, 0), (int, float)) and isinstance(b.get(key, 0), (int, float))}
+
+        base_terms = {term['search_term']: term for term in base['terms']}
+        other_terms = {term['search_term']: term for term in other['terms']}
+        term_keys = ('requests', 'request_seconds', 'request_errors', 'request_retries', 'response_bytes',
+                     'results', 'detail_fetched', 'skipped', 'auctions')
+        return {
+            'base': base['id'],
+            'other': other['id'],
+            'duration_seconds': round((other['duration_seconds'] or 0) - (base['duration_seconds'] or 0), 3),
+            'phases': delta(base['phases'], other['phases'], set(base['phases']) | set(other['phases'])),
+            'totals': delta(base['totals'], other['totals'], set(base['totals']) | set(other['totals'])),
+            'terms': {
+                term: delta(base_terms.get(term, {}), other_terms.get(term, {}), term_keys)
+                for term in sorted(set(base_terms) | set(other_terms))
+            },
+            'terms_added': sorted(set(other_terms) - set(base_terms)),
+            'terms_removed': sorted(set(base_terms) - set(other_terms)),
+        }
+
+    def term_trends(self, days: int = 30) -> List[Dict]:
+        """Per search word request latency and results over recent runs, slowest first"""
+        pipeline = [
+            {'$match': {'started_at': {'$gte': datetime.now() - timedelta(days=days)}}},
+            {'$unwind': '$terms'},
+            {'$group': {
+                '_id': '$terms.search_term',
+                'runs': {'$sum': 1},
+                'avg_request_seconds': {'$avg': '$terms.request_seconds'},
+                'max_request_seconds': {'$max': '$terms.request_seconds'},
+                'avg_requests': {'$avg': '$terms.requests'},
+                'avg_results': {'$avg': '$terms.results'},
+                'avg_detail_fetched': {'$avg': '$terms.detail_fetched'},
+                'request_errors': {'$sum': '$terms.request_errors'},
+                'request_retries': {'$sum': '$terms.request_retries'},
+                'last_run': {'$max': '$started_at'},
+            }},
+            {'$sort': {'avg_request_seconds': -1}},
+        ]
+        trends = []
+        for doc in self.collection.aggregate(pipeline):
+            doc['search_term'] = doc.pop('_id')
+            for key, value in doc.items():
+                if isinstance(value, float):
+                    doc[key] = round(value, 3)
+            doc['last_run'] = doc['last_run'].isoformat() if doc.get('last_run') else None
+            trends.append(doc)
+        return trends
+
+    @staticmethod
+    def serialize(doc: Dict) -> Dict:
+        """JSON-friendly copy of a run report"""
+        doc = dict(doc)
+        doc['id'] = str(doc.pop('_id'))
+        for key in ('started_at', 'finished_at'):
+            if isinstance(doc.get(key), datetime):
+                doc[key] = doc[key].isoformat()
+        for error in doc.get('errors', []):
+            if isinstance(error.get('at'), datetime):
+                error['at'] = error['at'].isoformat()
+        return doc
+
+
+def ensure_sync_run_indexes(collection, retention_days: int):
+    """Create the sync_runs indexes and apply the retention TTL"""
+    for keys in SYNC_RUN_INDEXES:
+        collection.create_index(keys)
+    ensure_ttl_index(collection, 'started_at', retention_days)
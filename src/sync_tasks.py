@@ -0,0 +1,326 @@
+"""
+Distributed scraping: per-term and per-auction sync tasks claimed by every sync worker
+"""
+
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterator, List, Optional
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
+from .mongodb_client import MongoDBClient
+from .config import get_config
+from .http_client import track
+from .metrics import SYNC_TASKS, SCRAPE_RATE_LIMIT_WAIT
+
+logger = logging.getLogger(__name__)
+
+TASK_KINDS = ('term', 'auction')
+
+# Claiming the oldest open task, and reading one cycle (plus the created_at TTL index)
+SYNC_TASK_INDEXES = [[('status', 1), ('created_at', 1)], [('cycle', 1), ('kind', 1)]]
+
+# Tasks of old cycles are removed after a day
+TASK_RETENTION_SECONDS = 24 * 3600
+
+# Claims per task before it is given up (a worker dying mid-task costs one attempt)
+MAX_ATTEMPTS = 3
+
+
+class SyncTaskQueue:
+    """Work queue of one sync cycle's tasks (sync_tasks collection)
+
+    The leader enqueues a 'term' task per search word. Running a term task
+    fetches the search page and enqueues an 'auction' task per result worth
+    a detail fetch - one per auction and cycle, however many terms found it.
+    Workers claim tasks with a lease; a task whose lease runs out is claimed
+    again by another worker. Only one cycle is live: queuing a new one
+    abandons what is left of the older ones (a leader that died mid-sync).
+    """
+
+    def __init__(self):
+        self.config = get_config()
+        self.lease_seconds = self.config.sync_task_lease_seconds
+        mongo_client = MongoDBClient()
+        self.collection = mongo_client.get_collection('sync_tasks', self.config.mongodb_database)
+
+    def ensure_indexes(self):
+        """Apply indexes and retention (safe to call on every start)"""
+        try:
+            for keys in SYNC_TASK_INDEXES:
+                self.collection.create_index(keys)
+            self.collection.create_index('created_at', expireAfterSeconds=TASK_RETENTION_SECONDS)
+        except Exception as e:
+            logger.error(f"Error ensuring sync task indexes: {e}")
+
+    def enqueue_terms(self, cycle: str, terms: List[str]) -> int:
+        """Start a cycle with a task per search word (unfinished tasks of older cycles are abandoned)"""
+        result = self.collection.update_many(
+            {'cycle': {'$ne': cycle}, 'status': {'$in': ['pending', 'claimed']}},
+            {'$set': {'status': 'abandoned', 'error': f"superseded by cycle {cycle}", 'finished_at': datetime.now(timezone.utc)}}
+        )
+        if result.modified_count:
+            logger.warning(f"Abandoned {result.modified_count} unfinished sync tasks of earlier cycles")
+        now = datetime.now(timezone.utc)
+        docs = [{
+            '_id': f"{cycle}:term:{term}",
+            'cycle': cycle,
+            'kind': 'term',
+            'term': term,
+            'status': 'pending',
+            'attempts': 0,
+            'created_at': now,
+        } for term in terms]
+        if docs:
+            self.collection.insert_many(docs)
+        return len(docs)
+
+    def enqueue_auctions(self, cycle: str, term: str, candidates: List[Dict]) -> int:
+        """Add detail fetches for a term's results (auctions already queued this cycle just gain the term)"""
+        term_task = self.collection.find_one({'_id': f"{cycle}:term:{term}"}, {'status': 1})
+        if term_task is not None and term_task.get('status') == 'abandoned':
+            # The cycle was given up while this search ran
+            return 0
+        if not candidates:
+            return 0
+        now = datetime.now(timezone.utc)
+        self.collection.bulk_write([
+            UpdateOne(
+                {'_id': f"{cycle}:auction:{candidate['id']}"},
+                {
+                    '$setOnInsert': {
+                        'cycle': cycle,
+                        'kind': 'auction',
+                        'auction_id': candidate['id'],
+                        'url': candidate['url'],
+                        'status': 'pending',
+                        'attempts': 0,
+                        'created_at': now,
+                    },
+                    '$addToSet': {'terms': term},
+                },
+                upsert=True
+            )
+            for candidate in candidates
+        ], ordered=False)
+        return len(candidates)
+
+    def claim(self, owner: str) -> Optional[Dict]:
+        """Take the oldest open task - pending, or claimed by a worker whose lease ran out"""
+        now = time.time()
+        return self.collection.find_one_and_update(
+            {
+                '$or': [{'status': 'pending'}, {'status': 'claimed', 'lease_expires_at': {'$lt': now}}],
+                'attempts': {'$lt': MAX_ATTEMPTS},
+            },
+            {
+                '$set': {'status': 'claimed', 'owner': owner, 'claimed_at': now, 'lease_expires_at': now + self.lease_seconds},
+                '$inc': {'attempts': 1},
+            },
+            sort=[('created_at', 1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    def complete(self, task: Dict, result, seconds: float):
+        self.collection.update_one(
+            {'_id': task['_id'], 'owner': task['owner'], 'status': 'claimed'},
+            {'$set': {'status': 'done', 'result': result, 'seconds': round(seconds, 3), 'finished_at': datetime.now(timezone.utc)}}
+        )
+
+    def fail(self, task: Dict, error: str):
+        """Put a task back for another attempt, or mark it failed after MAX_ATTEMPTS"""
+        final = task['attempts'] >= MAX_ATTEMPTS
+        update = {'status': 'failed', 'finished_at': datetime.now(timezone.utc)} if final else {'status': 'pending'}
+        # An abandoned task stays abandoned
+        self.collection.update_one(
+            {'_id': task['_id'], 'owner': task['owner'], 'status': 'claimed'},
+            {'$set': {**update, 'error': error}}
+        )
+
+    def progress(self, cycle: str) -> Dict[str, int]:
+        """Task counts of a cycle by status"""
+        # Tasks whose last allowed attempt died with its worker are never claimed again
+        self.collection.update_many(
+            {'cycle': cycle, 'status': 'claimed', 'attempts': {'$gte': MAX_ATTEMPTS}, 'lease_expires_at': {'$lt': time.time()}},
+            {'$set': {'status': 'failed', 'error': 'lease expired', 'finished_at': datetime.now(timezone.utc)}}
+        )
+        counts = {'pending': 0, 'claimed': 0, 'done': 0, 'failed': 0, 'abandoned': 0}
+        for doc in self.collection.aggregate([{'$match': {'cycle': cycle}}, {'$group': {'_id': '$status', 'count': {'$sum': 1}}}]):
+            counts[doc['_id']] = doc['count']
+        return counts
+
+    def abandon(self, cycle: str) -> int:
+        """Stop unfinished tasks of a cycle (the leader stopped waiting)"""
+        result = self.collection.update_many(
+            {'cycle': cycle, 'status': {'$in': ['pending', 'claimed']}},
+            {'$set': {'status': 'abandoned', 'finished_at': datetime.now(timezone.utc)}}
+        )
+        return result.modified_count
+
+    def tasks(self, cycle: str) -> Iterator[Dict]:
+        return self.collection.find({'cycle': cycle}).sort('created_at', 1)
+
+
+class GlobalRateLimiter:
+    """Request budget shared by every process through MongoDB (rate_limits collection)
+
+    Each request reserves the next free slot, spaced 1/rate seconds apart,
+    and sleeps until it comes. Slots are compared with each host's clock, so
+    hosts must keep their clocks in sync.
+    """
+
+    def __init__(self, name: str, rate_per_second: float):
+        config = get_config()
+        self.name = name
+        self.interval = 1.0 / rate_per_second
+        mongo_client = MongoDBClient()
+        self.collection = mongo_client.get_collection('rate_limits', config.mongodb_database)
+
+    def acquire(self) -> float:
+        """Wait for a request slot
+
+        Returns:
+            Seconds waited
+        """
+        while True:
+            now = time.time()
+            try:
+                doc = self.collection.find_one({'_id': self.name})
+                if doc is None:
+                    self.collection.insert_one({'_id': self.name, 'next_slot': now + self.interval})
+                    slot = now
+                else:
+                    slot = max(now, doc['next_slot'])
+                    # Compare-and-set: retry if another worker took the slot first
+                    result = self.collection.update_one(
+                        {'_id': self.name, 'next_slot': doc['next_slot']},
+                        {'$set': {'next_slot': slot + self.interval}}
+                    )
+                    if not result.modified_count:
+                        continue
+            except DuplicateKeyError:
+                continue
+            except Exception as e:
+                # Without MongoDB fall back to spacing this process's own requests
+                logger.error(f"Error reserving a request slot: {e}")
+                slot = now + self.interval
+            wait = max(0.0, slot - time.time())
+            if wait:
+                time.sleep(wait)
+            SCRAPE_RATE_LIMIT_WAIT.observe(wait)
+            return wait
+
+
+class SyncTaskWorker:
+    """Threads that claim and run sync tasks - started in every process running the updater"""
+
+    IDLE_POLL_SECONDS = 1
+
+    def __init__(self, queue: SyncTaskQueue, scraper, candidate_filter: Callable[[str], Callable], owner: str, threads: int,
+                 after_term: Callable[[], None] = None):
+        """
+        Args:
+            queue: Task queue
+            scraper: SikoScraper (shared; its requests go through the global rate limiter)
+            candidate_filter: Returns the result-card filter for a search word
+            owner: Name of this process in task leases
+            threads: Tasks run in parallel by this process
+            after_term: Called after each term task, run or failed (e.g. to write the
+                blacklist rule hits its candidate filter counted)
+        """
+        self.queue = queue
+        self.scraper = scraper
+        self.candidate_filter = candidate_filter
+        self.after_term = after_term
+        self.owner = owner
+        self.thread_count = threads
+        self.running = False
+        self.threads: List[threading.Thread] = []
+        self._stats_lock = threading.Lock()
+        self.completed = {kind: 0 for kind in TASK_KINDS}
+        self.failed = {kind: 0 for kind in TASK_KINDS}
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.threads = []
+        for index in range(self.thread_count):
+            thread = threading.Thread(target=self._loop, daemon=True, name=f"SyncTaskWorker-{index + 1}")
+            thread.start()
+            self.threads.append(thread)
+        logger.info(f"SyncTaskWorker started ({self.thread_count} threads)")
+
+    def stop(self):
+        """Stop claiming tasks (a task in progress finishes or its lease runs out)"""
+        self.running = False
+        for thread in self.threads:
+            thread.join(timeout=5)
+
+    def _loop(self):
+        owner = f"{self.owner}/{threading.current_thread().name}"
+        while self.running:
+            try:
+                task = self.queue.claim(owner)
+            except Exception as e:
+                logger.error(f"Error claiming sync task: {e}")
+                time.sleep(10)
+                continue
+            if task is None:
+                time.sleep(self.IDLE_POLL_SECONDS)
+                continue
+            self._run(task)
+
+    def _run(self, task: Dict):
+        kind = task['kind']
+        start = time.perf_counter()
+        try:
+            with track() as tally:
+                if kind == 'term':
+                    result = self._run_term(task)
+                else:
+                    result = self.scraper.scrape_auction_details(task['url'])
+                    if result is None:
+                        raise RuntimeError(f"Could not scrape {task['url']}")
+            requests = {'requests': tally.requests, 'request_seconds': tally.seconds, 'request_errors': tally.errors,
+                        'request_retries': tally.retries, 'response_bytes': tally.bytes}
+            if kind == 'term':
+                result.update(requests)
+            else:
+                result = {'auction': result, **requests}
+            self.queue.complete(task, result, time.perf_counter() - start)
+            SYNC_TASKS.inc(kind=kind, result='done')
+            with self._stats_lock:
+                self.completed[kind] += 1
+        except Exception as e:
+            logger.error(f"Error running {kind} task {task['_id']} (attempt {task['attempts']}): {e}")
+            SYNC_TASKS.inc(kind=kind, result='error')
+            with self._stats_lock:
+                self.failed[kind] += 1
+            try:
+                self.queue.fail(task, str(e))
+            except Exception as fail_error:
+                logger.error(f"Error releasing sync task {task['_id']}: {fail_error}")
+        finally:
+            if kind == 'term' and self.after_term is not None:
+                try:
+                    self.after_term()
+                except Exception as e:
+                    logger.error(f"Error after term task {task['_id']}: {e}")
+
+    def _run_term(self, task: Dict) -> Dict:
+        term = task['term']
+        stats = {'search_term': term, 'results': 0, 'detail_fetched': 0, 'skipped': {}}
+        candidates = self.scraper.search_candidates(term, self.candidate_filter(term), stats)
+        self.queue.enqueue_auctions(task['cycle'], term, candidates)
+        return stats
+
+    def get_status(self) -> Dict:
+        with self._stats_lock:
+            return {
+                'running': self.running,
+                'threads': self.thread_count,
+                'completed': dict(self.completed),
+                'failed': dict(self.failed),
+            }
@@ -0,0 +1,65 @@
+"""
+Standalone sync worker - runs the AuctionUpdater without the web server
+"""
+
+import logging
+import signal
+import threading
+from .auction_updater import AuctionUpdater
+from .config import get_config
+from .log_store import LogStore
+from .mongodb_client import MongoDBClient
+from .mongodb_logger import setup_mongodb_logging
+from .mongodb_monitor import check_indexes
+from .sync_runs import SyncRunStore
+from .updater_control import UpdaterCommandQueue
+from .sync_tasks import SyncTaskQueue
+
+logger = logging.getLogger(__name__)
+
+
+def run_sync_worker():
+    """Run the updater until SIGINT/SIGTERM
+
+    Scraping, notifications and the schedulers run here while web processes
+    (started with WEB_RUNS_UPDATER=false) serve requests. Several workers
+    can run at once: the leader lease lets one of them work and the others
+    take over when it stops. With SYNC_TASK_WORKERS set, all of them also
+    run the scraping tasks of the leader's syncs.
+    """
+    config = get_config()
+    setup_mongodb_logging(
+        level=config.log_level,
+        db_name=config.mongodb_database,
+        batch_size=config.log_batch_size,
+        flush_interval=config.log_flush_interval_seconds
+    )
+    LogStore().ensure_indexes()
+    SyncRunStore().ensure_indexes()
+    UpdaterCommandQueue().ensure_indexes()
+    SyncTaskQueue().ensure_indexes()
+    check_indexes(MongoDBClient().get_database(config.mongodb_database))
+
+    stopping = threading.Event()
+
+    def handle_signal(signum, frame):
+        logger.info(f"Received signal {signum}, stopping sync worker")
+        stopping.set()
+
+    signal.signal(signal.SIGINT, handle_signal)
+    signal.signal(signal.SIGTERM, handle_signal)
+
+    updater = AuctionUpdater()
+    updater.start()
+    logger.info("Sync worker started - waiting for the updater lease")
+    try:
+        while not stopping.wait(1):
+            pass
+    finally:
+        # Releases the lease so a standby worker takes over right away
+        updater.stop()
+        logger.info("Sync worker stopped")
+
+
+if __name__ == '__main__':
+    run_sync_worker()
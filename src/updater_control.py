@@ -0,0 +1,244 @@
+"""
+Coordination between web processes and the sync worker through MongoDB
+"""
+
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+from pymongo import ReturnDocument
+from .mongodb_client import MongoDBClient
+from .config import get_config
+
+logger = logging.getLogger(__name__)
+
+UPDATER_COMMANDS = ('sync', 'sync_search_word', 'detach_search_word', 'update_monitoring',
+                    'update_notification_hours', 'refresh_watchlist', 'report_index_usage')
+
+# Claiming the oldest pending command (plus the created_at TTL index)
+UPDATER_COMMAND_INDEXES = [[('status', 1), ('created_at', 1)]]
+
+# Commands are kept this long for /api/updater/commands
+COMMAND_RETENTION_SECONDS = 7 * 24 * 3600
+
+# A published status older than this means no worker is running
+STATUS_STALE_SECONDS = 120
+
+# A command still running after this long is taken over (its leader died)
+COMMAND_LEASE_SECONDS = 30 * 60
+
+# Claims per command before it is given up (a command that kills its leader isn't retried forever)
+MAX_COMMAND_ATTEMPTS = 2
+
+
+def _as_utc(value: datetime) -> datetime:
+    """MongoDB returns naive datetimes - they are UTC"""
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+
+class UpdaterCommandQueue:
+    """Commands for the process running the updater (updater_commands collection)
+
+    Web processes that don't run the updater send commands; the leader
+    claims them oldest first, with a lease, and stores the result. A
+    command left running by a leader that died is claimed again once its
+    lease runs out.
+    """
+
+    def __init__(self):
+        self.config = get_config()
+        mongo_client = MongoDBClient()
+        self.collection = mongo_client.get_collection('updater_commands', self.config.mongodb_database)
+
+    def ensure_indexes(self):
+        """Apply indexes and retention (safe to call on every start)"""
+        try:
+            for keys in UPDATER_COMMAND_INDEXES:
+                self.collection.create_index(keys)
+            self.collection.create_index('created_at', expireAfterSeconds=COMMAND_RETENTION_SECONDS)
+        except Exception as e:
+            logger.error(f"Error ensuring updater command indexes: {e}")
+
+    def send(self, command: str, **args) -> Optional[str]:
+        """Queue a command
+
+        Returns:
+            The command id, or None if it could not be queued
+        """
+        if command not in UPDATER_COMMANDS:
+            raise ValueError(f"Unknown updater command: {command}")
+        try:
+            result = self.collection.insert_one({
+                'command': command,
+                'args': args,
+                'status': 'pending',
+                'created_at': datetime.now(timezone.utc),
+            })
+            logger.info(f"Queued updater command '{command}' {args or ''}")
+            return str(result.inserted_id)
+        except Exception as e:
+            logger.error(f"Error queueing updater command '{command}': {e}")
+            return None
+
+    def claim(self, owner: str) -> Optional[Dict]:
+        """Take the oldest open command - pending, or running under a lease that ran out (None if there is none)"""
+        now = time.time()
+        # Commands whose last allowed attempt died with its leader are never claimed again
+        self.collection.update_many(
+            {'status': 'running', 'attempts': {'$gte': MAX_COMMAND_ATTEMPTS}, 'lease_expires_at': {'$lt': now}},
+            {'$set': {'status': 'failed', 'error': 'lease expired', 'finished_at': datetime.now(timezone.utc)}}
+        )
+        return self.collection.find_one_and_update(
+            {
+                '$or': [{'status': 'pending'}, {'status': 'running', 'lease_expires_at': {'$lt': now}}],
+                'attempts': {'$not': {'$gte': MAX_COMMAND_ATTEMPTS}},
+            },
+            {
+                '$set': {'status': 'running', 'owner': owner, 'started_at': datetime.now(timezone.utc),
+                         'lease_expires_at': now + COMMAND_LEASE_SECONDS},
+                '$inc': {'attempts': 1},
+            },
+            sort=[('created_at', 1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    def complete(self, command: Dict, result=None, error: str = None):
+        """Store a command's outcome (ignored if another leader took the command over)"""
+        update = {'status': 'failed' if error else 'done', 'finished_at': datetime.now(timezone.utc)}
+        if error:
+            update['error'] = error
+        else:
+            update['result'] = result
+        try:
+            self.collection.update_one({'_id': command['_id'], 'owner': command.get('owner')}, {'$set': update})
+        except Exception as e:
+            logger.error(f"Error completing updater command {command['_id']}: {e}")
+
+    def skip_pending(self, command: str, before: datetime) -> int:
+        """Mark pending duplicates of a command that just ran as skipped (e.g. repeated sync requests)"""
+        try:
+            result = self.collection.update_many(
+                {'status': 'pending', 'command': command, 'created_at': {'$lte': before}},
+                {'$set': {'status': 'skipped', 'finished_at': datetime.now(timezone.utc)}}
+            )
+            return result.modified_count
+        except Exception as e:
+            logger.error(f"Error skipping duplicate '{command}' commands: {e}")
+            return 0
+
+    def list_recent(self, limit: int = 50) -> List[Dict]:
+        """Recent commands, newest first"""
+        docs = self.collection.find().sort('created_at', -1).limit(max(1, min(limit, 500)))
+        commands = []
+        for doc in docs:
+            doc['id'] = str(doc.pop('_id'))
+            for key in ('created_at', 'started_at', 'finished_at'):
+                if isinstance(doc.get(key), datetime):
+                    doc[key] = _as_utc(doc[key]).isoformat()
+            commands.append(doc)
+        return commands
+
+
+class UpdaterStatusStore:
+    """Latest status published by the leader (updater_status collection, one document)"""
+
+    DOC_ID = 'auction_updater'
+
+    def __init__(self):
+        self.config = get_config()
+        mongo_client = MongoDBClient()
+        self.collection = mongo_client.get_collection('updater_status', self.config.mongodb_database)
+
+    def publish(self, status: Dict):
+        try:
+            self.collection.replace_one(
+                {'_id': self.DOC_ID},
+                {'status': status, 'published_at': datetime.now(timezone.utc)},
+                upsert=True
+            )
+        except Exception as e:
+            logger.error(f"Error publishing updater status: {e}")
+
+    def read(self) -> Optional[Dict]:
+        """Published status with its age, or None if nothing was published yet"""
+        try:
+            doc = self.collection.find_one({'_id': self.DOC_ID})
+        except Exception as e:
+            logger.error(f"Error reading updater status: {e}")
+            return None
+        if not doc:
+            return None
+        published_at = _as_utc(doc['published_at'])
+        age = (datetime.now(timezone.utc) - published_at).total_seconds()
+        return {
+            **doc['status'],
+            'published_at': published_at.isoformat(),
+            'stale': age > STATUS_STALE_SECONDS,
+        }
+
+
+class RemoteUpdater:
+    """Stands in for AuctionUpdater in a web process when the sync worker runs separately
+
+    Actions become commands for the worker and status is read from what the
+    worker publishes, so this process never scrapes or sends notifications.
+    Calls return right away; the work happens in the worker.
+    """
+
+    def __init__(self):
+        self.config = get_config()
+        self.commands = UpdaterCommandQueue()
+        self.status_store = UpdaterStatusStore()
+        self.is_leader = False
+
+    def start(self):
+        logger.info("Updater runs in a separate sync worker - this process serves web traffic only")
+
+    def stop(self):
+        pass
+
+    def force_sync(self):
+        self.commands.send('sync')
+
+    def sync_search_word(self, search_word: str):
+        self.commands.send('sync_search_word', word=search_word)
+
+    def detach_search_word(self, search_word: str):
+        self.commands.send('detach_search_word', word=search_word)
+
+    def update_interval_from_config(self, source_config=None):
+        source_config = source_config or self.config
+        self.commands.send(
+            'update_monitoring',
+            check_interval_minutes=source_config.check_interval_minutes,
+            urgent_notification_threshold_minutes=source_config.urgent_notification_threshold_minutes
+        )
+
+    def update_notification_hours(self, source_config):
+        self.commands.send('update_notification_hours', **{
+            field: getattr(source_config, field)
+            for field in ('weekday_notification_start_hour', 'weekday_notification_end_hour',
+                          'weekend_notification_start_hour', 'weekend_notification_end_hour')
+        })
+
+    def refresh_watchlist(self):
+        self.commands.send('refresh_watchlist')
+
+    def report_index_usage(self) -> Dict:
+        """Ask the worker for a report (it appears in last_index_report once published)"""
+        return {'queued': self.commands.send('report_index_usage')}
+
+    @property
+    def last_index_report(self) -> Optional[Dict]:
+        return (self.status_store.read() or {}).get('index_usage')
+
+    def get_counts(self) -> Dict:
+        return (self.status_store.read() or {}).get('counts', {})
+
+    def get_status(self) -> Dict:
+        status = self.status_store.read()
+        if status is None:
+            return {'running': False, 'remote': True, 'error': 'No sync worker has published its status yet'}
+        status.pop('index_usage', None)
+        return {**status, 'remote': True}
+
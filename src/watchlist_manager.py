@@ -3,14 +3,23 @@ Watchlist management for auctions you want notifications for
 """
 
 import logging
+import threading
 import time
-from typing import List, Set, Dict
+from typing import List, Set, Dict, Optional
 from .config import get_config
 
 logger = logging.getLogger(__name__)
 
 class WatchlistManager:
-    """Manage watchlist auctions stored in MongoDB"""
+    """Manage watchlist auctions stored in MongoDB
+    
+    Watched IDs are kept in an in-process set that is updated by this
+    manager's own add/remove methods and reconciled with MongoDB
+    periodically (to pick up changes made by other processes).
+    """
+    
+    # Seconds between full reloads of the watched IDs from MongoDB
+    RECONCILE_INTERVAL = 60.0
     
     def __init__(self):
         self.config = get_config()
@@ -19,8 +28,44 @@ class WatchlistManager:
         from .mongodb_client import MongoDBClient
         mongo_client = MongoDBClient()
         self.mongo_collection = mongo_client.get_collection('watchlist', self.config.mongodb_database)
+        
+        self._lock = threading.Lock()
+        self._watched_ids: Set[str] = set()
+        self._last_reconcile = 0.0
+        self.reconcile()
         logger.info("WatchlistManager using MongoDB storage")
     
+    def reconcile(self):
+        """Reload the watched IDs from MongoDB"""
+        try:
+            watchlist_docs = self.mongo_collection.find({}, {'auction_id': 1})
+            auction_ids = set(doc['auction_id'] for doc in watchlist_docs if 'auction_id' in doc)
+            with self._lock:
+                self._watched_ids = auction_ids
+                self._last_reconcile = time.time()
+            logger.debug(f"Reconciled watchlist ({len(auction_ids)} auctions)")
+        except Exception as e:
+            logger.error(f"Error reconciling watchlist: {e}")
+            # Don't retry on every call while MongoDB is unreachable
+            self._last_reconcile = time.time()
+    
+    def _ensure_fresh(self):
+        """Reconcile with MongoDB if the interval has passed"""
+        if time.time() - self._last_reconcile >= self.RECONCILE_INTERVAL:
+            self.reconcile()
+    
+    @staticmethod
+    def _make_entry_update(auction_id: str, auction_data: Dict = None) -> Dict:
+        """Build an idempotent upsert for a watchlist entry"""
+        update = {'$setOnInsert': {'auction_id': auction_id, 'added_at': time.time()}}
+        
+        # Add optional auction data if provided
+        if auction_data:
+            fields = {key: auction_data[key] for key in ('title', 'url', 'end_date') if key in auction_data}
+            if fields:
+                update['$set'] = fields
+        return update
+    
     def add_to_watchlist(self, auction_id: str, auction_data: Dict = None) -> bool:
         """Add an auction to the watchlist
         
@@ -33,41 +78,62 @@ class WatchlistManager:
             if not auction_id:
                 return False
             
-            # Check if already in watchlist
-            if self.is_watched(auction_id):
-                logger.info(f"Auction {auction_id} is already in watchlist")
-                return True
-            
-            # Create watchlist entry
-            watchlist_entry = {
-                'auction_id': auction_id,
-                'added_at': time.time(),
-            }
-            
-            # Add optional auction data if provided
-            if auction_data:
-                if 'title' in auction_data:
-                    watchlist_entry['title'] = auction_data['title']
-                if 'url' in auction_data:
-                    watchlist_entry['url'] = auction_data['url']
-                if 'end_date' in auction_data:
-                    watchlist_entry['end_date'] = auction_data['end_date']
+            # Upsert so adding an already watched auction is a no-op
+            result = self.mongo_collection.update_one(
+                {'auction_id': auction_id},
+                self._make_entry_update(auction_id, auction_data),
+                upsert=True
+            )
+            with self._lock:
+                self._watched_ids.add(auction_id)
             
-            # Insert into MongoDB
-            self.mongo_collection.insert_one(watchlist_entry)
-            logger.info(f"Added auction {auction_id} to watchlist")
+            if result.upserted_id is None:
+                logger.info(f"Auction {auction_id} is already in watchlist")
+            else:
+                logger.info(f"Added auction {auction_id} to watchlist")
             return True
             
         except Exception as e:
             logger.error(f"Error adding auction {auction_id} to watchlist: {e}")
             return False
     
+    def add_many_to_watchlist(self, auctions: Dict[str, Optional[Dict]]) -> int:
+        """Add many auctions to the watchlist in one round trip
+        
+        Args:
+            auctions: Mapping of auction ID to optional auction data
+            
+        Returns:
+            Number of auctions that were not watched before
+        """
+        try:
+            from pymongo import UpdateOne
+            entries = {str(auction_id).strip(): data for auction_id, data in auctions.items() if str(auction_id).strip()}
+            if not entries:
+                return 0
+            
+            result = self.mongo_collection.bulk_write([
+                UpdateOne({'auction_id': auction_id}, self._make_entry_update(auction_id, data), upsert=True)
+                for auction_id, data in entries.items()
+            ], ordered=False)
+            with self._lock:
+                self._watched_ids.update(entries)
+            
+            logger.info(f"Added {result.upserted_count} auctions to watchlist ({len(entries)} requested)")
+            return result.upserted_count
+            
+        except Exception as e:
+            logger.error(f"Error adding auctions to watchlist: {e}")
+            return 0
+    
     def remove_from_watchlist(self, auction_id: str) -> bool:
         """Remove an auction from the watchlist"""
         try:
             auction_id = str(auction_id).strip()
             
             result = self.mongo_collection.delete_one({'auction_id': auction_id})
+            with self._lock:
+                self._watched_ids.discard(auction_id)
             
             if result.deleted_count > 0:
                 logger.info(f"Removed auction {auction_id} from watchlist")
@@ -80,14 +146,32 @@ class WatchlistManager:
             logger.error(f"Error removing auction {auction_id} from watchlist: {e}")
             return False
     
-    def is_watched(self, auction_id: str) -> bool:
-        """Check if an auction is in the watchlist"""
+    def remove_many_from_watchlist(self, auction_ids: List[str]) -> int:
+        """Remove many auctions from the watchlist in one round trip
+        
+        Returns:
+            Number of auctions removed
+        """
         try:
-            auction_id = str(auction_id).strip()
-            return self.mongo_collection.count_documents({'auction_id': auction_id}) > 0
+            auction_ids = [str(auction_id).strip() for auction_id in auction_ids]
+            if not auction_ids:
+                return 0
+            
+            result = self.mongo_collection.delete_many({'auction_id': {'$in': auction_ids}})
+            with self._lock:
+                self._watched_ids.difference_update(auction_ids)
+            
+            logger.info(f"Removed {result.deleted_count} auctions from watchlist")
+            return result.deleted_count
+            
         except Exception as e:
-            logger.error(f"Error checking if auction {auction_id} is watched: {e}")
-            return False
+            logger.error(f"Error removing auctions from watchlist: {e}")
+            return 0
+    
+    def is_watched(self, auction_id: str) -> bool:
+        """Check if an auction is in the watchlist"""
+        self._ensure_fresh()
+        return str(auction_id).strip() in self._watched_ids
     
     def get_watchlist(self) -> List[Dict]:
         """Get all watched auctions"""
@@ -106,18 +190,16 @@ class WatchlistManager:
     
     def get_watched_auction_ids(self) -> Set[str]:
         """Get set of all watched auction IDs"""
-        try:
-            watchlist_docs = self.mongo_collection.find({}, {'auction_id': 1})
-            auction_ids = set(doc['auction_id'] for doc in watchlist_docs if 'auction_id' in doc)
-            return auction_ids
-        except Exception as e:
-            logger.error(f"Error getting watched auction IDs: {e}")
-            return set()
+        self._ensure_fresh()
+        with self._lock:
+            return set(self._watched_ids)
     
     def clear_watchlist(self) -> bool:
         """Clear all auctions from watchlist"""
         try:
             result = self.mongo_collection.delete_many({})
+            with self._lock:
+                self._watched_ids.clear()
             logger.info(f"Cleared watchlist ({result.deleted_count} entries removed)")
             return True
         except Exception as e:
@@ -126,15 +208,10 @@ class WatchlistManager:
     
     def get_statistics(self) -> Dict:
         """Get watchlist statistics"""
-        try:
-            total_watched = self.mongo_collection.count_documents({})
-            
-            return {
-                'total_watched_auctions': total_watched,
-                'storage': 'MongoDB',
-                'database': self.config.mongodb_database,
-                'collection': 'watchlist'
-            }
-        except Exception as e:
-            logger.error(f"Error getting watchlist statistics: {e}")
-            return {}
+        self._ensure_fresh()
+        return {
+            'total_watched_auctions': len(self._watched_ids),
+            'storage': 'MongoDB',
+            'database': self.config.mongodb_database,
+            'collection': 'watchlist'
+        }
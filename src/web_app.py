@@ -2,15 +2,18 @@
 Web interface for managing the Siko Auction Monitor
 """
 
-from flask import Flask, render_template, request, jsonify, redirect, url_for, flash, send_file, Response
+from flask import Flask, render_template, request, jsonify, redirect, url_for, flash, send_file, Response, stream_with_context, g
 from flask_cors import CORS
+import json
 import logging
 import os
+import time
+import threading
 from datetime import datetime
 from typing import Dict, List
 from io import BytesIO
 from .search_manager import SearchManager
-from .blacklist_manager import BlacklistManager
+from .blacklist_manager import BlacklistManager, RULE_TYPES
 from .watchlist_manager import WatchlistManager
 from .home_assistant import HomeAssistantNotifier
 from .scraper import SikoScraper
@@ -19,7 +22,16 @@ from .cache_factory import get_cache
 from .image_storage import ImageStorage
 from .mongodb_client import MongoDBClient
 from .auction_updater import AuctionUpdater
+from .updater_control import RemoteUpdater, UpdaterCommandQueue
+from .sync_tasks import SyncTaskQueue
 from .mongodb_logger import setup_mongodb_logging
+from .log_store import LogStore, LOG_LEVELS, decode_cursor, encode_cursor
+from .sync_runs import SyncRunStore, SYNC_TRIGGERS
+from .profiler import PROFILER
+from .memory_diagnostics import MEMORY, read_rss
+from .mongodb_monitor import COMMAND_MONITOR, check_indexes
+from .http_client import HTTP_STATS
+from . import metrics
 
 logger = logging.getLogger(__name__)
 
@@ -86,20 +98,88 @@ def create_app():
     config = get_config()
     
     # Setup MongoDB logging
-    setup_mongodb_logging(level=config.log_level, db_name=config.mongodb_database)
+    log_handler = setup_mongodb_logging(
+        level=config.log_level,
+        db_name=config.mongodb_database,
+        batch_size=config.log_batch_size,
+        flush_interval=config.log_flush_interval_seconds
+    )
     search_manager = SearchManager()
     blacklist_manager = BlacklistManager()
     watchlist_manager = WatchlistManager()
     auction_cache = get_cache()
+    log_store = LogStore()
+    log_store.ensure_indexes()
+    sync_run_store = SyncRunStore()
+    sync_run_store.ensure_indexes()
+    UpdaterCommandQueue().ensure_indexes()
+    SyncTaskQueue().ensure_indexes()
+    
+    # Warn early when indexes from init_mongodb.py are missing (queries would scan whole collections)
+    mongo_db = MongoDBClient().get_database(config.mongodb_database)
+    check_indexes(mongo_db)
     
     # Initialize image storage
     mongo_client = MongoDBClient()
     image_storage = ImageStorage(mongo_client, config.mongodb_database)
     
-    # Initialize and start background auction updater
-    auction_updater = AuctionUpdater()
+    # Initialize the background auction updater - it runs only while this process holds the leader lease.
+    # With WEB_RUNS_UPDATER=false it runs in `manage.py sync-worker` and this process only sends it commands.
+    if config.web_runs_updater:
+        auction_updater = AuctionUpdater()
+    else:
+        auction_updater = RemoteUpdater()
     auction_updater.start()
-    logger.info("Background auction updater started (syncs hourly)")
+    app.extensions['auction_updater'] = auction_updater
+    
+    # Gauges read when /metrics is scraped
+    metrics.gauge_callback('siko_cached_auctions', 'Auction documents in MongoDB',
+                           lambda: auction_cache.collection.estimated_document_count())
+    metrics.gauge_callback('siko_processed_auctions', 'Auctions already notified about',
+                           lambda: auction_updater.get_counts().get('processed_auctions'))
+    metrics.gauge_callback('siko_search_words', 'Configured search words', lambda: len(search_manager.get_search_words()))
+    metrics.gauge_callback('siko_watched_auctions', 'Auctions on the watchlist',
+                           lambda: len(watchlist_manager.get_watched_auction_ids()))
+    metrics.gauge_callback('siko_notification_queue_depth', 'Notification queue entries by status',
+                           lambda: {(status,): count for status, count
+                                    in auction_updater.get_counts().get('notification_queue', {}).items()},
+                           labelnames=('status',))
+    metrics.gauge_callback('siko_urgent_notifications_scheduled', 'Urgent notifications waiting for their threshold',
+                           lambda: auction_updater.get_counts().get('urgent_scheduled'))
+    metrics.gauge_callback('siko_log_buffer_size', 'Log records waiting to be written to MongoDB',
+                           lambda: log_handler.get_stats()['buffered'])
+    metrics.gauge_callback('siko_log_records_dropped_total', 'Log records dropped because the buffer was full',
+                           lambda: log_handler.dropped_count, type_name='counter')
+    metrics.gauge_callback('siko_process_resident_memory_bytes', 'Resident set size of the process',
+                           lambda: read_rss()['rss_bytes'])
+    metrics.gauge_callback('siko_last_sync_timestamp_seconds', 'Unix time of the last completed sync',
+                           lambda: auction_updater.get_counts().get('last_update') or None)
+    
+    # Structures reported by the memory diagnostics endpoint (the updater registers its own)
+    MEMORY.register('web.watched_ids', lambda: watchlist_manager._watched_ids, watchlist_manager._lock)
+    MEMORY.register('web.blacklisted_ids', lambda: blacklist_manager._blacklisted_ids)
+    MEMORY.register('logging.buffer', lambda: log_handler._buffer, log_handler._condition)
+    MEMORY.register('metrics.series', lambda: {name: dict(metric._values) for name, metric in metrics.REGISTRY._metrics.items()})
+    
+    @app.before_request
+    def start_request_timer():
+        g.request_started = time.perf_counter()
+        g.profile = PROFILER.start_request(request.url_rule.rule if request.url_rule else None, request.path)
+    
+    @app.after_request
+    def record_request_metrics(response):
+        PROFILER.finish_request(g.pop('profile', None))
+        started = getattr(g, 'request_started', None)
+        if started is not None:
+            route = request.url_rule.rule if request.url_rule else 'unmatched'
+            metrics.WEB_REQUEST_DURATION.observe(time.perf_counter() - started, route=route, method=request.method)
+            metrics.WEB_REQUESTS.inc(route=route, method=request.method, status=response.status_code)
+        return response
+    
+    @app.route('/metrics')
+    def prometheus_metrics():
+        """Prometheus metrics (text exposition format)"""
+        return Response(metrics.REGISTRY.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
     
     def get_current_auctions(include_hidden=False):
         """Shared function to get current auctions from MongoDB
@@ -211,8 +291,8 @@ def create_app():
             
             success = search_manager.add_search_word(word)
             if success:
-                # Trigger immediate sync with new search word
-                auction_updater.force_sync()
+                # Scrape only the new search word and merge it into storage (waits for a running sync)
+                threading.Thread(target=auction_updater.sync_search_word, args=(word,), daemon=True).start()
                 return jsonify({'message': f'Added search word: {word}', 'status': 'success'})
             else:
                 return jsonify({'error': 'Failed to add search word', 'status': 'error'}), 500
@@ -226,9 +306,8 @@ def create_app():
         try:
             success = search_manager.remove_search_word(word)
             if success:
-                # Trigger sync in background (non-blocking)
-                import threading
-                threading.Thread(target=auction_updater.force_sync, daemon=True).start()
+                # Detach the word from stored auctions (no scraping needed, but it waits for a running sync)
+                threading.Thread(target=auction_updater.detach_search_word, args=(word,), daemon=True).start()
                 return jsonify({'message': f'Removed search word: {word}', 'status': 'success'})
             else:
                 return jsonify({'error': 'Search word not found', 'status': 'error'}), 404
@@ -325,6 +404,62 @@ def create_app():
         except Exception as e:
             return jsonify({'error': str(e), 'status': 'error'}), 500
     
+    @app.route('/api/blacklist/rules', methods=['GET'])
+    def get_blacklist_rules():
+        """Get all rule-based blacklist entries with hit counters"""
+        try:
+            rules = blacklist_manager.get_rules()
+            return jsonify({
+                'rules': rules,
+                'count': len(rules),
+                'status': 'success'
+            })
+        except Exception as e:
+            return jsonify({'error': str(e), 'status': 'error'}), 500
+    
+    @app.route('/api/blacklist/rules', methods=['POST'])
+    def add_blacklist_rule():
+        """Add a rule-based blacklist entry (keyword, regex, location or max_price)"""
+        try:
+            data = request.get_json()
+            rule_type = data.get('type', '').strip()
+            value = data.get('value')
+            
+            if rule_type not in RULE_TYPES:
+                return jsonify({
+                    'error': f"Rule type must be one of: {', '.join(RULE_TYPES)}",
+                    'status': 'error'
+                }), 400
+            
+            rule = blacklist_manager.add_rule(rule_type, value, data.get('description'))
+            if rule:
+                return jsonify({
+                    'message': f'Added {rule_type} rule',
+                    'rule': rule,
+                    'status': 'success'
+                })
+            else:
+                return jsonify({'error': 'Invalid rule value', 'status': 'error'}), 400
+                
+        except Exception as e:
+            return jsonify({'error': str(e), 'status': 'error'}), 500
+    
+    @app.route('/api/blacklist/rules/<rule_id>', methods=['DELETE'])
+    def remove_blacklist_rule(rule_id):
+        """Remove a rule-based blacklist entry"""
+        try:
+            success = blacklist_manager.remove_rule(rule_id)
+            if success:
+                return jsonify({
+                    'message': f'Rule {rule_id} removed',
+                    'status': 'success'
+                })
+            else:
+                return jsonify({'error': 'Rule not found', 'status': 'error'}), 404
+                
+        except Exception as e:
+            return jsonify({'error': str(e), 'status': 'error'}), 500
+    
     @app.route('/api/watchlist', methods=['GET'])
     def get_watchlist():
         """Get all watched auctions"""
@@ -357,6 +492,7 @@ def create_app():
             
             success = watchlist_manager.add_to_watchlist(auction_id, auction_data)
             if success:
+                auction_updater.refresh_watchlist()
                 return jsonify({
                     'message': f'Auction {auction_id} added to watchlist',
                     'status': 'success'
@@ -370,12 +506,48 @@ def create_app():
         except Exception as e:
             return jsonify({'error': str(e), 'status': 'error'}), 500
     
+    @app.route('/api/watchlist/batch', methods=['POST'])
+    def batch_update_watchlist():
+        """Add and/or remove many auctions in one request
+        
+        Body: {"add": [{"auction_id": ..., "auction_title": ..., ...}], "remove": ["id", ...]}
+        """
+        try:
+            data = request.get_json() or {}
+            to_add = {}
+            for entry in data.get('add', []):
+                auction_id = str(entry.get('auction_id', '')).strip()
+                if auction_id:
+                    to_add[auction_id] = {
+                        'title': entry.get('auction_title', ''),
+                        'url': entry.get('auction_url', ''),
+                        'end_date': entry.get('end_date', '')
+                    }
+            to_remove = [str(auction_id).strip() for auction_id in data.get('remove', []) if str(auction_id).strip()]
+            
+            added = watchlist_manager.add_many_to_watchlist(to_add) if to_add else 0
+            removed = watchlist_manager.remove_many_from_watchlist(to_remove) if to_remove else 0
+            if added or removed:
+                auction_updater.refresh_watchlist()
+            
+            return jsonify({
+                'message': f'Added {added}, removed {removed} watchlist auctions',
+                'added': added,
+                'removed': removed,
+                'status': 'success'
+            })
+                
+        except Exception as e:
+            return jsonify({'error': str(e), 'status': 'error'}), 500
+    
     @app.route('/api/watchlist/<auction_id>', methods=['DELETE'])
     def remove_from_watchlist(auction_id):
         """Remove an auction from the watchlist"""
         try:
             success = watchlist_manager.remove_from_watchlist(auction_id)
             if success:
+                # Stop end-game polling and alerts for it right away
+                auction_updater.refresh_watchlist()
                 return jsonify({
                     'message': f'Auction {auction_id} removed from watchlist',
                     'status': 'success'
@@ -395,6 +567,7 @@ def create_app():
         try:
             success = watchlist_manager.clear_watchlist()
             if success:
+                auction_updater.refresh_watchlist()
                 return jsonify({
                     'message': 'Watchlist cleared successfully',
                     'status': 'success'
@@ -435,7 +608,7 @@ def create_app():
             config.urgent_notification_threshold_minutes = urgent_threshold
             
             # Update the AuctionUpdater interval immediately
-            auction_updater.update_interval_from_config()
+            auction_updater.update_interval_from_config(config)
             
             # Persist to .env file
             env_updates = {
@@ -486,6 +659,9 @@ def create_app():
             config.weekend_notification_start_hour = weekend_start
             config.weekend_notification_end_hour = weekend_end
             
+            # Apply to the notifier and reschedule the release of held notifications
+            auction_updater.update_notification_hours(config)
+            
             # Persist to .env file
             env_updates = {
                 'WEEKDAY_NOTIFICATION_START_HOUR': str(weekday_start),
@@ -499,7 +675,7 @@ def create_app():
             
             return jsonify({
                 'status': 'success',
-                'message': 'Time settings saved successfully! (These can be used for future notification features)'
+                'message': 'Time settings saved successfully!'
             })
             
         except Exception as e:
@@ -667,7 +843,8 @@ def create_app():
                 'mongodb': {
                     'database': config.mongodb_database,
                     'storage': 'MongoDB (exclusive)'
-                }
+                },
+                'logging': log_handler.get_stats()
             }
             
             return jsonify({'status': 'success', 'data': status})
@@ -675,6 +852,366 @@ def create_app():
         except Exception as e:
             return jsonify({'error': str(e), 'status': 'error'}), 500
     
+    def parse_log_filter() -> Dict:
+        """Build the log filter from the level/logger/since/until query parameters"""
+        levels = [level.strip().upper() for level in request.args.get('level', '').split(',') if level.strip()]
+        invalid = [level for level in levels if level not in LOG_LEVELS]
+        if invalid:
+            raise ValueError(f"Unknown log level(s): {', '.join(invalid)}")
+        since = request.args.get('since')
+        until = request.args.get('until')
+        return log_store.build_filter(
+            levels=levels,
+            logger_name=request.args.get('logger'),
+            since=datetime.fromisoformat(since) if since else None,
+            until=datetime.fromisoformat(until) if until else None
+        )
+    
+    @app.route('/api/logs')
+    def get_logs():
+        """Query logs (newest first)
+        
+        Query parameters: level (comma-separated), logger (name or prefix),
+        since/until (ISO time), limit (max 500), cursor (from next_cursor)
+        """
+        try:
+            query = parse_log_filter()
+            limit = int(request.args.get('limit', 100))
+            logs, next_cursor = log_store.query(query, cursor=request.args.get('cursor'), limit=limit)
+            return jsonify({
+                'status': 'success',
+                'logs': logs,
+                'count': len(logs),
+                'next_cursor': next_cursor
+            })
+        except ValueError as e:
+            return jsonify({'error': str(e), 'status': 'error'}), 400
+        except Exception as e:
+            logger.error(f"Error querying logs: {e}")
+            return jsonify({'error': str(e), 'status': 'error'}), 500
+    
+    @app.route('/api/logs/tail')
+    def tail_logs():
+        """Live tail of new log records as Server-Sent Events
+        
+        Takes the same filters as /api/logs, plus cursor (continue after a
+        record) and timeout (seconds before the stream closes, max 30).
+        Each stream holds a web server thread, so streams are short: every
+        event carries its cursor as the SSE id and EventSource reconnects
+        with it (Last-Event-ID), so no records are missed between streams.
+        """
+        try:
+            query = parse_log_filter()
+            cursor = request.args.get('cursor') or request.headers.get('Last-Event-ID')
+            position = decode_cursor(cursor) if cursor else log_store.latest_position(query)
+            timeout = max(1, min(int(request.args.get('timeout', 25)), 30))
+        except ValueError as e:
+            return jsonify({'error': str(e), 'status': 'error'}), 400
+        
+        def stream():
+            nonlocal position
+            deadline = time.time() + timeout
+            last_sent = time.time()
+            # Starting cursor, so a reconnect after a stream without records resumes from here
+            yield f"retry: 1000\nid: {encode_cursor({'timestamp': position[0], '_id': position[1]})}\n\n"
+            while time.time() < deadline:
+                try:
+                    docs = log_store.tail(query, position)
+                except Exception as e:
+                    logger.error(f"Error tailing logs: {e}")
+                    docs = []
+                for doc in docs:
+                    position = (doc['timestamp'], doc['_id'])
+                    yield f"id: {encode_cursor(doc)}\ndata: {json.dumps(LogStore.serialize(doc), default=str)}\n\n"
+                    last_sent = time.time()
+                if time.time() - last_sent >= 15:
+                    yield ": keep-alive\n\n"
+                    last_sent = time.time()
+                time.sleep(1)
+        
+        return Response(stream_with_context(stream()), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    
+    @app.route('/api/sync-runs')
+    def get_sync_runs():
+        """List sync run reports (newest first, without per-term details)
+        
+        Query parameters: trigger, limit (max 200), before (run id, for paging)
+        """
+        try:
+            trigger = request.args.get('trigger')
+            if trigger and trigger not in SYNC_TRIGGERS:
+                raise ValueError(f"Unknown trigger: {trigger}")
+            runs = sync_run_store.list_runs(
+                limit=int(request.args.get('limit', 20)),
+                trigger=trigger,
+                before=request.args.get('before')
+            )
+            return jsonify({
+                'status': 'success',
+                'runs': runs,
+                'count': len(runs),
+                'next_before': runs[-1]['id'] if runs else None
+            })
+        except ValueError as e:
+            return jsonify({'error': str(e), 'status': 'error'}), 400
+        except Exception as e:
+            logger.error(f"Error listing sync runs: {e}")
+            return jsonify({'error': str(e), 'status': 'error'}), 500
+    
+    @app.route('/api/sync-runs/compare')
+    def compare_sync_runs():
+        """Compare two runs: phase, total and per-term differences (other minus base)
+        
+        Query parameters: base, other (run ids; other defaults to the latest run)
+        """
+        try:
+            base = request.args.get('base')
+            other = request.args.get('other')
+            if not other:
+                latest = sync_run_store.list_runs(limit=1)
+                other = latest[0]['id'] if latest else None
+            if not base or not other:
+                raise ValueError("Both base and other run ids are required")
+            comparison = sync_run_store.compare(base, other)
+            if comparison is None:
+                return jsonify({'error': 'Sync run not found', 'status': 'error'}), 404
+            return jsonify({'status': 'success', 'comparison': comparison})
+        except ValueError as e:
+            return jsonify({'error': str(e), 'status': 'error'}), 400
+        except Exception as e:
+            logger.error(f"Error comparing sync runs: {e}")
+            return jsonify({'error': str(e), 'status': 'error'}), 500
+    
+    @app.route('/api/sync-runs/terms')
+    def get_sync_run_terms():
+        """Per search word latency and result counts over recent runs (slowest first)
+        
+        Query parameters: days (default 30)
+        """
+        try:
+            days = int(request.args.get('days', 30))
+            terms = sync_run_store.term_trends(days=days)
+            return jsonify({'status': 'success', 'days': days, 'terms': terms})
+        except ValueError as e:
+            return jsonify({'error': str(e), 'status': 'error'}), 400
+        except Exception as e:
+            logger.error(f"Error aggregating sync run terms: {e}")
+            return jsonify({'error': str(e), 'status': 'error'}), 500
+    
+    @app.route('/api/sync-runs/<run_id>')
+    def get_sync_run(run_id):
+        """Full report of one sync run (per-term stats, phases, errors)"""
+        try:
+            run = sync_run_store.get_run(run_id)
+            if run is None:
+                return jsonify({'error': 'Sync run not found', 'status': 'error'}), 404
+            return jsonify({'status': 'success', 'run': run})
+        except ValueError as e:
+            return jsonify({'error': str(e), 'status': 'error'}), 400
+        except Exception as e:
+            logger.error(f"Error loading sync run {run_id}: {e}")
+            return jsonify({'error': str(e), 'status': 'error'}), 500
+    
+    def diagnosed_process() -> Dict:
+        """Which process in-process diagnostics describe (syncs only run in the updater's leader)"""
+        return {
+            'pid': os.getpid(),
+            'runs_syncs': auction_updater.is_leader,
+            'updater': 'local' if config.web_runs_updater else 'sync worker',
+        }
+    
+    @app.route('/api/profiling')
+    def get_profiling():
+        """What is armed for profiling and the saved profiles (newest first)"""
+        try:
+            return jsonify({
+                'status': 'success',
+                'profiling': PROFILER.get_status(),
+                'profiles': PROFILER.list_profiles()
+            })
+        except Exception as e:
+            return jsonify({'error': str(e), 'status': 'error'}), 500
+    
+    @app.route('/api/profiling/sync', methods=['POST'])
+    def arm_sync_profiling():
+        """Profile the next syncs - JSON body: runs (default 1), mode ('cprofile' or 'sample')"""
+        try:
+            if not auction_updater.is_leader:
+                # Armed here it would never fire - syncs run in the sync worker or the lease holder
+                return jsonify({
+                    'error': 'Syncs run in another process - profile them there with `python manage.py profile-sync`',
+                    'status': 'error',
+                    'process': diagnosed_process()
+                }), 409
+            data = request.get_json(silent=True) or {}
+            runs = int(data.get('runs', 1))
+            PROFILER.arm_sync(runs, data.get('mode', 'cprofile'))
+            return jsonify({'message': f'Profiling the next {runs} sync(s)', 'status': 'success'})
+        except ValueError as e:
+            return jsonify({'error': str(e), 'status': 'error'}), 400
+        except Exception as e:
+            return jsonify({'error': str(e), 'status': 'error'}), 500
+    
+    @app.route('/api/profiling/requests', methods=['POST'])
+    def arm_request_profiling():
+        """Profile the next requests to a route - JSON body: route (rule or path pattern), count, mode"""
+        try:
+            data = request.get_json(silent=True) or {}
+            route = (data.get('route') or '').strip()
+            if not route:
+                raise ValueError("route is required (e.g. /api/auctions or /api/*)")
+            count = int(data.get('count', 1))
+            PROFILER.arm_route(route, count, data.get('mode', 'cprofile'))
+            return jsonify({'message': f'Profiling the next {count} request(s) to {route}', 'status': 'success'})
+        except ValueError as e:
+            return jsonify({'error': str(e), 'status': 'error'}), 400
+        except Exception as e:
+            return jsonify({'error': str(e), 'status': 'error'}), 500
+    
+    @app.route('/api/profiling', methods=['DELETE'])
+    def disarm_profiling():
+        """Cancel all armed profiling"""
+        PROFILER.disarm()
+        return jsonify({'message': 'Profiling disarmed', 'status': 'success'})
+    
+    @app.route('/api/profiling/<name>')
+    def get_profile(name):
+        """Top-functions summary of a saved profile"""
+        summary = PROFILER.get_summary(name)
+        if summary is None:
+            return jsonify({'error': 'Profile not found', 'status': 'error'}), 404
+        return jsonify({'status': 'success', 'profile': summary})
+    
+    @app.route('/api/profiling/<name>/download')
+    def download_profile(name):
+        """Download the profile data (.pstats for cProfile, .folded collapsed stacks for sampling)"""
+        summary = PROFILER.get_summary(name)
+        path = PROFILER.get_path(summary['file']) if summary else None
+        if path is None:
+            return jsonify({'error': 'Profile not found', 'status': 'error'}), 404
+        return send_file(os.path.abspath(path), as_attachment=True, download_name=summary['file'],
+                         mimetype='application/octet-stream' if summary['mode'] == 'cprofile' else 'text/plain')
+    
+    @app.route('/api/diagnostics/memory')
+    def get_memory_diagnostics():
+        """RSS, sizes of in-process structures and tracemalloc state
+        
+        Query parameters: structures (0 skips the structure sizes)
+        """
+        try:
+            include_structures = request.args.get('structures', '1') != '0'
+            return jsonify({'status': 'success', 'process': diagnosed_process(),
+                            'memory': MEMORY.get_report(include_structures)})
+        except Exception as e:
+            logger.error(f"Error building memory report: {e}")
+            return jsonify({'error': str(e), 'status': 'error'}), 500
+    
+    @app.route('/api/diagnostics/memory/diffs')
+    def get_memory_diffs():
+        """Recent tracemalloc snapshot diffs (one per sync), newest first"""
+        return jsonify({'status': 'success', 'process': diagnosed_process(), 'tracing': MEMORY.tracing,
+                        'diffs': list(reversed(MEMORY.diffs))})
+    
+    @app.route('/api/diagnostics/memory/top')
+    def get_memory_top():
+        """Largest live allocation sites (tracemalloc must be on)"""
+        try:
+            if not MEMORY.tracing:
+                return jsonify({'error': 'tracemalloc is not running', 'status': 'error'}), 400
+            limit = int(request.args.get('limit', 25))
+            return jsonify({'status': 'success', 'allocations': MEMORY.top_allocations(limit)})
+        except ValueError as e:
+            return jsonify({'error': str(e), 'status': 'error'}), 400
+        except Exception as e:
+            return jsonify({'error': str(e), 'status': 'error'}), 500
+    
+    @app.route('/api/diagnostics/memory/tracemalloc', methods=['POST'])
+    def set_tracemalloc():
+        """Start or stop tracemalloc - JSON body: enabled (bool), frames (optional)"""
+        try:
+            data = request.get_json(silent=True) or {}
+            if data.get('enabled'):
+                MEMORY.start_tracing(int(data['frames']) if data.get('frames') else None)
+            else:
+                MEMORY.stop_tracing()
+            return jsonify({'status': 'success', 'tracing': MEMORY.tracing})
+        except ValueError as e:
+            return jsonify({'error': str(e), 'status': 'error'}), 400
+        except Exception as e:
+            return jsonify({'error': str(e), 'status': 'error'}), 500
+    
+    @app.route('/api/diagnostics/memory/snapshot', methods=['POST'])
+    def take_memory_snapshot():
+        """Snapshot now and diff with the previous snapshot (e.g. between two page loads)"""
+        if not MEMORY.tracing:
+            return jsonify({'error': 'tracemalloc is not running', 'status': 'error'}), 400
+        data = request.get_json(silent=True) or {}
+        diff = MEMORY.snapshot(data.get('label', 'manual'))
+        return jsonify({'status': 'success', 'diff': diff})
+    
+    @app.route('/api/diagnostics/mongodb')
+    def get_mongodb_diagnostics():
+        """Slow MongoDB operations (by filter shape), missing indexes and the last index usage report"""
+        try:
+            missing = check_indexes(mongo_db, warn=False)
+            return jsonify({
+                'status': 'success',
+                'slow_operations': COMMAND_MONITOR.get_slow_ops(),
+                'missing_indexes': {name: [dict(keys) for keys in patterns] for name, patterns in missing.items()},
+                'index_usage': auction_updater.last_index_report
+            })
+        except Exception as e:
+            logger.error(f"Error building MongoDB diagnostics: {e}")
+            return jsonify({'error': str(e), 'status': 'error'}), 500
+    
+    @app.route('/api/diagnostics/mongodb/index-usage', methods=['POST'])
+    def report_index_usage():
+        """Run the $indexStats report now"""
+        try:
+            return jsonify({'status': 'success', 'index_usage': auction_updater.report_index_usage()})
+        except Exception as e:
+            logger.error(f"Error reporting index usage: {e}")
+            return jsonify({'error': str(e), 'status': 'error'}), 500
+    
+    @app.route('/api/updater/commands')
+    def get_updater_commands():
+        """Recent commands sent to the process running the updater, newest first"""
+        try:
+            limit = int(request.args.get('limit', 50))
+            commands = auction_updater.commands.list_recent(limit)
+            return jsonify({'status': 'success', 'commands': commands, 'count': len(commands)})
+        except ValueError as e:
+            return jsonify({'error': str(e), 'status': 'error'}), 400
+        except Exception as e:
+            logger.error(f"Error listing updater commands: {e}")
+            return jsonify({'error': str(e), 'status': 'error'}), 500
+    
+    @app.route('/api/diagnostics/http')
+    def get_http_diagnostics():
+        """Outbound request totals and timings per client, host and operation, plus recent slow requests"""
+        return jsonify({
+            'status': 'success',
+            'process': diagnosed_process(),
+            'debug_slow_ms': HTTP_STATS.debug_slow_ms,
+            'stats': HTTP_STATS.get_stats(),
+            'slow_requests': list(reversed(HTTP_STATS.slow_requests))
+        })
+    
+    @app.route('/api/diagnostics/http/debug', methods=['POST'])
+    def set_http_debug():
+        """Log and keep requests slower than slow_ms (0 turns debug mode off)"""
+        try:
+            data = request.get_json(silent=True) or {}
+            slow_ms = int(data.get('slow_ms', 0))
+            if slow_ms < 0:
+                raise ValueError("slow_ms must be 0 or positive")
+            HTTP_STATS.debug_slow_ms = slow_ms
+            logger.info(f"HTTP slow request debugging {'set to ' + str(slow_ms) + ' ms' if slow_ms else 'off'}")
+            return jsonify({'status': 'success', 'debug_slow_ms': slow_ms})
+        except (TypeError, ValueError) as e:
+            return jsonify({'error': str(e), 'status': 'error'}), 400
+    
     @app.route('/api/debug')
     def debug_endpoint():
         """Simple debug endpoint to test API functionality"""
@@ -852,11 +1389,14 @@ def run_web_app():
     try:
         # Use Waitress for production-ready serving
         from waitress import serve
-        serve(app, host=config.web_host, port=config.web_port, threads=4)
+        serve(app, host=config.web_host, port=config.web_port, threads=config.web_threads)
     except ImportError:
         # Fallback to Flask development server
         logger.warning("Waitress not available, using Flask development server")
         app.run(host=config.web_host, port=config.web_port, debug=config.web_debug)
+    finally:
+        # Release the leader lease so another process takes over right away
+        app.extensions['auction_updater'].stop()
 
 if __name__ == '__main__':
     run_web_app()
\ No newline at end of file